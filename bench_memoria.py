@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark da Memória Vetorial
+Compara recall e latência dos backends FAISS (flat, HNSW, IVF) e Chroma
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+# Adicionar src ao path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from langchain_core.embeddings import Embeddings
+
+from embeddings import HashingEmbeddings
+
+TEMPLATES = [
+    "qual a média da coluna {col}",
+    "mostre o histograma de {col}",
+    "existem outliers em {col}",
+    "qual a correlação entre {col} e {other}",
+    "compare a distribuição de {col} por {other}",
+    "quantos valores nulos tem {col}",
+    "qual o desvio padrão de {col}",
+    "faça um boxplot de {col}",
+]
+PARAPHRASES = [
+    "me diga a média de {col}",
+    "gere um histograma da coluna {col}",
+    "a coluna {col} tem outliers",
+    "correlação de {col} com {other}",
+    "distribuição de {col} separada por {other}",
+    "valores ausentes na coluna {col}",
+    "desvio padrão da coluna {col}",
+    "boxplot da coluna {col}",
+]
+COLUMNS = [f"V{i}" for i in range(1, 29)] + ["Amount", "Time", "Class"]
+
+
+def print_separator():
+    print("\n" + "="*80 + "\n")
+
+
+class PrecomputedEmbeddings(Embeddings):
+    """Embeddings calculados uma vez, para medir só o índice (não o encoder)."""
+
+    def __init__(self, base: Embeddings, texts):
+        texts = list(dict.fromkeys(texts))
+        self.base = base
+        self.vectors = dict(zip(texts, base.embed_documents(texts)))
+
+    def embed_documents(self, texts):
+        return [self.vectors.get(t) or self.base.embed_query(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def build_corpus(entries, datasets, sessions, seed=0):
+    """Perguntas sintéticas com fingerprint e sessão."""
+    rng = random.Random(seed)
+    texts, metadatas = [], []
+    for i in range(entries):
+        template = rng.randrange(len(TEMPLATES))
+        col, other = rng.sample(COLUMNS, 2)
+        texts.append(f"{TEMPLATES[template].format(col=col, other=other)} ({i})")
+        metadatas.append({"fingerprint": f"ds{rng.randrange(datasets)}",
+                          "session": f"s{rng.randrange(sessions)}", "created_at": float(i)})
+    return texts, metadatas
+
+
+def build_queries(count, metadatas, seed=1):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        meta = metadatas[rng.randrange(len(metadatas))]
+        template = rng.randrange(len(PARAPHRASES))
+        col, other = rng.sample(COLUMNS, 2)
+        text = PARAPHRASES[template].format(col=col, other=other)
+        mode = rng.choice(["none", "dataset", "dataset+session"])
+        if mode == "none":
+            filter = None
+        elif mode == "dataset":
+            filter = {"fingerprint": meta["fingerprint"]}
+        else:
+            filter = {"$and": [{"fingerprint": meta["fingerprint"]}, {"session": meta["session"]}]}
+        queries.append((text, filter, mode))
+    return queries
+
+
+def ground_truth(embeddings, texts, metadatas, queries, k):
+    """Top-k exato (cosseno) de cada consulta dentro do subconjunto filtrado."""
+    matrix = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    truth = []
+    for text, filter, mode in queries:
+        query = np.asarray(embeddings.embed_query(text), dtype=np.float32)
+        scores = matrix @ (query / max(np.linalg.norm(query), 1e-12))
+        if filter is not None:
+            clauses = filter.get("$and", [filter])
+            mask = np.ones(len(texts), dtype=bool)
+            for clause in clauses:
+                (key, value), = clause.items()
+                mask &= np.array([m[key] == value for m in metadatas])
+            scores = np.where(mask, scores, -np.inf)
+        top = np.argsort(-scores)[:k]
+        truth.append({texts[i] for i in top if np.isfinite(scores[i])})
+    return truth
+
+
+def open_store(backend, path, embeddings):
+    if backend == "chroma":
+        from langchain_community.vectorstores import Chroma
+        return Chroma(persist_directory=path, embedding_function=embeddings, collection_name="bench")
+    from faiss_store import FaissMemoryStore
+    kind = backend.split("-", 1)[1]
+    # hnsw/ivf desde o início; flat nunca troca de índice
+    return FaissMemoryStore(path, embeddings, index_kind=kind, upgrade_at=1 if kind != "flat" else 10**9)
+
+
+def run_backend(backend, embeddings, texts, metadatas, queries, truth, k, batch):
+    path = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+    try:
+        store = open_store(backend, path, embeddings)
+    except ImportError as e:
+        print(f"⚠️  {backend}: indisponível ({e})")
+        return None
+
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch):
+        store.add_texts(texts[i:i + batch], metadatas=metadatas[i:i + batch])
+    ingest = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reopened = open_store(backend, path, embeddings)
+    reopen = time.perf_counter() - start
+
+    latencies = {"none": [], "dataset": [], "dataset+session": []}
+    recalls = []
+    for (text, filter, mode), expected in zip(queries, truth):
+        start = time.perf_counter()
+        docs = reopened.similarity_search(text, k=k, filter=filter)
+        latencies[mode].append((time.perf_counter() - start) * 1000)
+        if expected:
+            recalls.append(len({d.page_content for d in docs} & expected) / len(expected))
+
+    return {
+        "ingest_s": ingest,
+        "reopen_s": reopen,
+        "recall": float(np.mean(recalls)),
+        "latency": {mode: (np.percentile(v, 50), np.percentile(v, 95)) for mode, v in latencies.items() if v},
+    }
+
+
+def bench_memoria():
+    """Mede recall@k e latência de cada backend com o mesmo corpus e consultas"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--datasets", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--backends", default="chroma,faiss-flat,faiss-hnsw,faiss-ivf")
+    args = parser.parse_args()
+
+    print("🧪 BENCHMARK DA MEMÓRIA VETORIAL")
+    print_separator()
+
+    print(f"📦 Gerando {args.entries} entradas ({args.datasets} datasets, {args.sessions} sessões)...")
+    texts, metadatas = build_corpus(args.entries, args.datasets, args.sessions)
+    queries = build_queries(args.queries, metadatas)
+    start = time.perf_counter()
+    embeddings = PrecomputedEmbeddings(HashingEmbeddings(), texts + [q for q, _, _ in queries])
+    print(f"✅ Embeddings calculados em {time.perf_counter() - start:.1f}s")
+    truth = ground_truth(embeddings, texts, metadatas, queries, args.k)
+
+    print_separator()
+
+    results = {}
+    for backend in args.backends.split(","):
+        print(f"⏱️  {backend}...")
+        result = run_backend(backend, embeddings, texts, metadatas, queries, truth, args.k, args.batch)
+        if result:
+            results[backend] = result
+            print(f"✅ {backend}: recall@{args.k}={result['recall']:.3f}")
+
+    print_separator()
+
+    # Resumo final
+    print("📊 RESUMO (latência em ms, p50 / p95)")
+    print(f"{'backend':<12} {'ingestão':>9} {'reabrir':>8} {'recall':>7} "
+          f"{'sem filtro':>14} {'dataset':>14} {'dataset+sessão':>15}")
+    for backend, r in results.items():
+        lat = [f"{p50:.2f} / {p95:.2f}" for p50, p95 in
+               (r["latency"].get(m, (float("nan"),) * 2) for m in ("none", "dataset", "dataset+session"))]
+        print(f"{backend:<12} {r['ingest_s']:>8.1f}s {r['reopen_s']:>7.2f}s {r['recall']:>7.3f} "
+              f"{lat[0]:>14} {lat[1]:>14} {lat[2]:>15}")
+
+    print_separator()
+
+
+if __name__ == "__main__":
+    bench_memoria()
@@ -1,6 +1,10 @@
 # src/agent.py
 import os
+import time
+import queue
 import logging
+import threading
+import contextvars
 import pandas as pd
 from langchain.agents import initialize_agent, AgentType
 from langchain_openai import ChatOpenAI
@@ -11,7 +15,7 @@ from langchain_core.prompts import MessagesPlaceholder
 # Importar tools base e set_dataframe de tools.py
 from tools import (
     schema_tool, dataset_info_tool, missing_tool, describe_tool, histogram_tool,
-    set_dataframe
+    set_dataframe, set_summary, get_dataframe, get_summary, get_fingerprint
 )
 
 # Importar tools adicionais de tools_refactored.py
@@ -22,7 +26,17 @@ from tools_refactored import (
     class_balance_tool, conclusion_tool
 )
 
-from memory_store import init_memory
+from agent_events import AgentEventHandler, notify_section
+from answer_cache import ToolResultCollector, get_answer_cache, is_cacheable_question
+from dataset_cache import dataset_cache
+from dataset_store import session_scope
+from llm_cache import get_llm_cache
+from streaming import should_stream, get_or_build_summary
+from memory_store import init_memory, memory_context
+from parallel_agent import ParallelToolAgent
+from router import ROUTER_PHRASE_WITH_LLM, route_question, format_tool_answer, phrase_prompt
+from observations import with_observation_encoder
+from tool_cache import with_result_cache
 from langsmith_setup import get_langsmith_client
 from utils import logger
 
@@ -36,12 +50,12 @@ TOOLS = [
     Tool(name="histogram", func=lambda q: histogram_tool(q), description="Cria histograma. Params: column=Nome ou apenas Nome"),
     Tool(name="boxplot", func=lambda q: boxplot_tool(q), description="Cria boxplot. Params: column=Nome ou columns=Col1|Col2"),
     Tool(name="scatter", func=lambda q: scatter_tool(q), description="Scatter plot. Params: x=Col1, y=Col2"),
-    Tool(name="correlation", func=lambda q: correlation_tool(""), description="Calcula matriz de correlação entre variáveis numéricas."),
-    Tool(name="outliers", func=lambda q: outliers_tool(q), description="Detecta outliers. Params: column=Nome, method=iqr ou zscore"),
-    Tool(name="clustering", func=lambda q: clustering_tool(q), description="K-means clustering. Params: n_clusters=3, columns=Col1|Col2"),
+    Tool(name="correlation", func=lambda q: correlation_tool(q), description="Correlação entre variáveis numéricas (pares mais fortes + mapa de calor). Params: columns=V1|V2|Amount (opcional), method=pearson ou spearman, top=10"),
+    Tool(name="outliers", func=lambda q: outliers_tool(q), description="Detecta outliers. Params: column=Nome (omita para resumir todas as colunas), method=iqr ou zscore, min_columns=2"),
+    Tool(name="clustering", func=lambda q: clustering_tool(q), description="K-means clustering (colunas padronizadas). Params: n_clusters=3 ou auto (escolhe k pelo silhouette), columns=Col1|Col2, method=auto|minibatch"),
     Tool(name="time_trend", func=lambda q: time_trend_tool(q), description="Análise temporal. Params: column=Time, target=Amount"),
     Tool(name="frequency", func=lambda q: frequency_tool(q), description="Valores mais frequentes. Params: column=Nome, top=10"),
-    Tool(name="crosstab", func=lambda q: crosstab_tool(q), description="Tabela cruzada. Params: col1=Class, col2=Amount"),
+    Tool(name="crosstab", func=lambda q: crosstab_tool(q), description="Tabela cruzada (colunas contínuas em faixas de quantis, saída limitada). Params: col1=Class, col2=Amount, bins=10"),
     Tool(name="central_tendency", func=lambda q: central_tendency_tool(q), description="Média, mediana, moda. Params: column=Nome"),
     Tool(name="variability", func=lambda q: variability_tool(q), description="Variância, desvio padrão, CV. Params: column=Nome"),
     Tool(name="range", func=lambda q: range_tool(q), description="Min e max de uma coluna. Params: column=Nome"),
@@ -49,14 +63,42 @@ TOOLS = [
     Tool(name="conclusion", func=lambda q: conclusion_tool(""), description="Gera conclusão baseada na memória."),
 ]
 
+# Tools que ignoram o Action Input: a chave do cache não inclui parâmetros
+_INPUTLESS_TOOLS = ("schema", "dataset_info", "missing", "describe", "class_balance", "conclusion")
 
-def load_csv(path: str):
-    """Carrega CSV e define como DataFrame global."""
+# Resultados memoizados por (fingerprint do dataset, tool, parâmetros normalizados)
+TOOLS = with_result_cache(TOOLS, ignore_input=_INPUTLESS_TOOLS)
+# O roteador formata o resultado completo; o agente recebe observações compactas
+TOOLS_BY_NAME = {t.name: t for t in TOOLS}
+AGENT_TOOLS = with_observation_encoder(TOOLS)
+
+
+def load_csv(path: str, session_id: str = None):
+    """Carrega CSV e define como DataFrame da sessão.
+
+    O parse é feito uma única vez por conteúdo de arquivo; chamadas
+    repetidas (ex.: a cada pergunta no Streamlit) reutilizam o DataFrame.
+    Após um restart, o sidecar colunar em data/ evita re-tokenizar o CSV.
+    Arquivos acima de STREAMING_THRESHOLD_MB são lidos em chunks e só os
+    resumos por coluna ficam em memória (retorna o StreamingSummary).
+
+    Args:
+        path: Caminho do CSV
+        session_id: Id da sessão dona do dataset (None usa a sessão corrente)
+    """
     try:
-        df = pd.read_csv(path)
-        set_dataframe(df)
-        logger.info(f"CSV loaded successfully: {path}")
-        return df
+        with session_scope(session_id):
+            if should_stream(path):
+                fingerprint = dataset_cache.fingerprint(path)
+                summary = get_or_build_summary(path, fingerprint)
+                set_summary(summary, fingerprint)
+                logger.info(f"CSV loaded in streaming mode: {path} [{fingerprint[:12]}]")
+                return summary
+
+            df, fingerprint = dataset_cache.get_or_load(path)
+            set_dataframe(df, fingerprint)
+            logger.info(f"CSV loaded successfully: {path} [{fingerprint[:12]}]")
+            return df
     except Exception as e:
         logger.error(f"Error loading CSV {path}: {e}")
         raise
@@ -64,14 +106,19 @@ def load_csv(path: str):
 
 def build_agent():
     """Constrói o agente com memória e LLM, suportando OpenAI, Gemini e Ollama.
+
+    AGENT_MODE=parallel usa tool calling nativo: o modelo pode pedir várias
+    tools em um passo e elas rodam em paralelo. O padrão (react) mantém o
+    agente ReAct legado, uma tool por chamada ao LLM.
     
     Returns:
         tuple: (agent, llm) - Retorna o agente e a instância do LLM
     """
     provider = os.getenv("LLM_PROVIDER", "openai")
     model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    agent_mode = os.getenv("AGENT_MODE", "react")
     
-    logger.info(f"Building agent with provider={provider}, model={model}")
+    logger.info(f"Building agent with provider={provider}, model={model}, mode={agent_mode}")
 
     if provider == "openai":
         api_key = os.getenv("OPENAI_API_KEY")
@@ -93,10 +140,21 @@ def build_agent():
     else:
         raise ValueError(f"Provedor {provider} não suportado.")
 
-    # Memória persistente
-    mems = init_memory()
+    # temperature=0: a mesma chamada (ReAct, conclusão, resumo) é servida do cache em disco
+    llm.cache = get_llm_cache(provider, model)
+
+    # Memória com orçamento de tokens (janela + resumo incremental pelo próprio LLM)
+    mems = init_memory(llm=llm)
     memory = mems.get("buffer")
 
+    if agent_mode == "parallel":
+        try:
+            agent = ParallelToolAgent(llm, AGENT_TOOLS, memory=memory, max_iterations=8, max_execution_time=120)
+            logger.info("Parallel tool-calling agent built successfully with memory")
+            return agent, llm
+        except NotImplementedError:
+            logger.warning(f"Provider {provider} has no native tool calling, falling back to ReAct agent")
+
     # Prompt customizado para FORÇAR uso de tools e evitar loops
     prefix = """Você é um Engenheiro de Dados especializado em Análise Exploratória (EDA).
 
@@ -126,7 +184,7 @@ Question: {input}
 Thought: {agent_scratchpad}"""
 
     agent = initialize_agent(
-        tools=TOOLS,
+        tools=AGENT_TOOLS,
         llm=llm,
         agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
         verbose=True,
@@ -146,28 +204,132 @@ Thought: {agent_scratchpad}"""
     return agent, llm
 
 
-def ask_agent(agent, question: str, csv_path: str = None, llm=None):
+def ask_agent(agent, question: str, csv_path: str = None, llm=None, session_id: str = None):
     """Executa uma pergunta ao agente.
     
     Args:
         agent: O agente executor
         question: Pergunta em linguagem natural
-        csv_path: Caminho opcional para CSV
+        csv_path: Caminho opcional para CSV (recarregado só se a sessão não tiver dataset)
+        llm: Instância do LLM (necessário para conclusões detalhadas)
+        session_id: Id da sessão cujo dataset as tools devem usar
+    """
+    with session_scope(session_id):
+        return _ask_agent(agent, question, csv_path=csv_path, llm=llm)
+
+
+def ask_agent_stream(agent, question: str, csv_path: str = None, llm=None, session_id: str = None):
+    """Executa uma pergunta ao agente emitindo eventos incrementais.
+
+    O agente roda em uma thread de fundo (com a sessão propagada) e os
+    callbacks alimentam uma fila; este gerador entrega os eventos conforme
+    chegam: tokens da resposta, início/fim de tools e gráficos gerados.
+    O último evento é sempre {"type": "final", "text": resposta}.
+
+    Args:
+        agent: O agente executor
+        question: Pergunta em linguagem natural
+        csv_path: Caminho opcional para CSV (recarregado só se a sessão não tiver dataset)
         llm: Instância do LLM (necessário para conclusões detalhadas)
+        session_id: Id da sessão cujo dataset as tools devem usar
+
+    Yields:
+        Eventos (dicts com a chave "type"); ver AgentEventHandler
     """
+    events = queue.Queue()
+    handler = AgentEventHandler(events, react=not isinstance(agent, ParallelToolAgent))
+
+    def worker():
+        answer = None
+        try:
+            with session_scope(session_id):
+                answer = _ask_agent(agent, question, csv_path=csv_path, llm=llm, callbacks=[handler])
+        finally:
+            events.put({"type": "final", "text": answer or ""})
+            events.put(None)
+
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(worker,), name="agent-stream", daemon=True).start()
+
+    while True:
+        event = events.get()
+        if event is None:
+            break
+        yield event
+
+
+def _dataset_columns():
+    """Colunas do dataset da sessão (DataFrame ou resumo do modo streaming)."""
+    df = get_dataframe()
+    if df is not None:
+        return list(df.columns)
+    summary = get_summary()
+    return list(summary.columns) if summary is not None else []
+
+
+def _answer_routed(agent, question: str, llm=None, callbacks=None):
+    """Responde pelo roteador determinístico, se a pergunta mapear para uma única tool.
+
+    Returns:
+        Resposta, ou None quando a pergunta deve seguir para o agente
+    """
+    route = route_question(question, _dataset_columns())
+    if route is None:
+        return None
+
+    start = time.perf_counter()
+    result = str(TOOLS_BY_NAME[route.tool].run(route.params, callbacks=callbacks))
+    # Erro da tool (ex.: {"error": ...}) vai para o agente, mesmo com frase pelo LLM
+    answer = format_tool_answer(route, result)
+    if answer is None:
+        logger.info(f"Router: {route.tool} failed, falling back to agent")
+        return None
+    if ROUTER_PHRASE_WITH_LLM and llm is not None:
+        answer = llm.predict(phrase_prompt(question, route, result), callbacks=callbacks)
+
+    logger.info(f"Router answered with {route.tool} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if getattr(agent, "memory", None) is not None:
+        agent.memory.save_context({"input": question}, {"output": answer})
+    return answer
+
+
+def _ask_agent(agent, question: str, csv_path: str = None, llm=None, callbacks=None):
     try:
-        if csv_path:
+        # O store mantém o dataset da sessão entre perguntas; o CSV só é
+        # recarregado se a sessão ainda não tiver um (ex.: após despejo)
+        if csv_path and get_dataframe() is None and get_summary() is None:
             load_csv(csv_path)
         
         logger.info(f"Processing question: {question[:100]}...")
         
+        # Perguntas simples vão direto para a tool, sem o loop do agente
+        routed = _answer_routed(agent, question, llm=llm, callbacks=callbacks)
+        if routed is not None:
+            return routed
+
+        # Pergunta equivalente já respondida sobre o mesmo dataset: resposta do cache semântico
+        fingerprint = get_fingerprint()
+        answer_cache = get_answer_cache() if fingerprint and is_cacheable_question(question) else None
+        if answer_cache is not None:
+            cached = answer_cache.lookup(question, fingerprint, _dataset_columns())
+            if cached is not None:
+                if getattr(agent, "memory", None) is not None:
+                    agent.memory.save_context({"input": question}, {"output": cached})
+                return cached
+
         # Executar pergunta com memória
-        response = agent.run(question)
+        collector = ToolResultCollector()
+        response = agent.run(question, callbacks=list(callbacks or []) + [collector])
+        if answer_cache is not None and not response.startswith("Agent stopped"):
+            answer_cache.store(question, response, fingerprint, collector.results)
+        if hasattr(agent.memory, "last_prompt_tokens"):
+            logger.info(f"Chat history sent this turn: {agent.memory.last_prompt_tokens} tokens")
+        if hasattr(getattr(llm, "cache", None), "stats"):
+            logger.info(f"LLM cache: {llm.cache.stats()}")
 
         # Se a pergunta for de conclusão, melhora o resumo com análise detalhada
         if "conclusão" in question.lower():
-            history = agent.memory.load_memory_variables({})
-            context = str(history.get("chat_history", ""))
+            context = memory_context(agent.memory)
             
             # Usa LLM passado como parâmetro ou tenta acessar do agente
             if llm is None:
@@ -198,7 +360,8 @@ Gere uma conclusão técnica profissional com:
 Formate em Markdown."""
 
             try:
-                enhanced_response = llm.predict(conclusion_prompt)
+                notify_section(callbacks, "Gerando conclusão detalhada...")
+                enhanced_response = llm.predict(conclusion_prompt, callbacks=callbacks)
                 return enhanced_response
             except Exception as e:
                 logger.error(f"Error generating enhanced conclusion: {e}")
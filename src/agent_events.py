@@ -0,0 +1,125 @@
+# src/agent_events.py
+# Eventos incrementais do agente (tokens, tools, gráficos) para a interface
+
+import json
+import queue
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Marcador da resposta final no formato ReAct
+FINAL_ANSWER_MARKER = "Final Answer:"
+_TOOL_OUTPUT_PREVIEW = 300
+
+
+class AgentEventHandler(BaseCallbackHandler):
+    """
+    Converte callbacks do LangChain em eventos (dicts) numa fila thread-safe.
+
+    Tipos de evento:
+        token      - trecho da resposta final ({"text"})
+        thought    - trecho do raciocínio ReAct antes de "Final Answer:" ({"text"})
+        tool_start - início de uma tool ({"tool", "input"})
+        tool_end   - fim de uma tool ({"tool", "output"})
+        plot       - gráfico gerado por uma tool ({"path"})
+        reset      - nova seção de resposta (ex.: conclusão detalhada) ({"text"})
+
+    Implementar `tap_output_iter`/`tap_output_aiter` faz o LangChain usar a
+    API de streaming do modelo quando este handler está presente, sem
+    precisar configurar `streaming=True` em cada provedor.
+    """
+
+    def __init__(self, events: "queue.Queue", react: bool = True):
+        self.events = events
+        self.react = react
+        self._buffers: Dict[UUID, str] = {}
+        self._in_final: Dict[UUID, bool] = {}
+        self._tool_names: Dict[UUID, str] = {}
+        self._stream_everything = False
+
+    def emit(self, event_type: str, **data: Any) -> None:
+        self.events.put({"type": event_type, **data})
+
+    def start_section(self, title: str) -> None:
+        """Inicia uma nova seção: as próximas chamadas ao LLM são a resposta em si."""
+        self._stream_everything = True
+        self.emit("reset", text=title)
+
+    # ---- LLM ---------------------------------------------------------------
+
+    def _start_llm_run(self, run_id: UUID) -> None:
+        self._buffers[run_id] = ""
+        self._in_final[run_id] = self._stream_everything or not self.react
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start_llm_run(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start_llm_run(run_id)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        if not token:
+            return
+        if self._in_final.get(run_id, True):
+            self.emit("token", text=token)
+            return
+
+        buffer = self._buffers.get(run_id, "") + token
+        self._buffers[run_id] = buffer
+        if FINAL_ANSWER_MARKER in buffer:
+            self._in_final[run_id] = True
+            rest = buffer.split(FINAL_ANSWER_MARKER, 1)[1].lstrip()
+            if rest:
+                self.emit("token", text=rest)
+        else:
+            self.emit("thought", text=token)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        self._buffers.pop(run_id, None)
+        self._in_final.pop(run_id, None)
+
+    # ---- Tools -------------------------------------------------------------
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name", "tool")
+        self._tool_names[run_id] = name
+        self.emit("tool_start", tool=name, input=input_str)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        name = self._tool_names.pop(run_id, "tool")
+        text = getattr(output, "content", output)
+        text = text if isinstance(text, str) else str(text)
+        self.emit("tool_end", tool=name, output=text[:_TOOL_OUTPUT_PREVIEW])
+        plot_path = _extract_plot_path(text)
+        if plot_path:
+            self.emit("plot", path=plot_path)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        name = self._tool_names.pop(run_id, "tool")
+        self.emit("tool_end", tool=name, output=f"Erro: {error}")
+
+    # ---- Opt-in de streaming (protocolo interno do LangChain) --------------
+
+    def tap_output_iter(self, run_id: UUID, output: Iterator) -> Iterator:
+        return output
+
+    def tap_output_aiter(self, run_id: UUID, output):
+        return output
+
+
+def _extract_plot_path(output: str) -> Optional[str]:
+    """Retorna o plot_path do JSON de uma tool, se houver."""
+    if '"plot_path"' not in output:
+        return None
+    try:
+        return json.loads(output).get("plot_path")
+    except (ValueError, AttributeError):
+        return None
+
+
+def notify_section(callbacks: Optional[List[Any]], title: str) -> None:
+    """Avisa os handlers de eventos que uma nova seção de resposta começou."""
+    for handler in callbacks or []:
+        if isinstance(handler, AgentEventHandler):
+            handler.start_section(title)
@@ -0,0 +1,241 @@
+# src/answer_cache.py
+# Cache semântico de respostas: perguntas parecidas sobre o mesmo dataset reutilizam a resposta
+
+import os
+import re
+import json
+import time
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from dataset_store import get_current_session
+from embeddings import resolve_backend
+from plot_renderer import is_pending
+from router import match_intents
+from utils import logger
+
+# auto (desligado com embeddings por hashing) | 1 | 0
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "auto")
+# Relevância mínima (0-1) para servir a resposta armazenada
+ANSWER_CACHE_MIN_SCORE = float(os.getenv("ANSWER_CACHE_MIN_SCORE", "0.92"))
+# Embeddings por hashing não separam paráfrases de perguntas diferentes: só quase idênticas
+ANSWER_CACHE_HASHING_MIN_SCORE = float(os.getenv("ANSWER_CACHE_HASHING_MIN_SCORE", "0.99"))
+# Tamanho máximo dos resultados de tools guardados como metadado
+ANSWER_CACHE_MAX_TOOL_CHARS = int(os.getenv("ANSWER_CACHE_MAX_TOOL_CHARS", "4000"))
+
+# Respostas que dependem do histórico da conversa não são cacheadas
+_HISTORY_DEPENDENT = ("conclusão", "conclusao", "anterior", "acima", "última", "ultima")
+# Candidatos avaliados por consulta (o mais parecido pode ter outros parâmetros)
+_LOOKUP_CANDIDATES = 4
+
+# Literais numéricos soltos (k=3, top 10, 0.5), não dígitos dentro de nomes como V1
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:[.,]\d+)?(?!\w)(?![.,]\d)")
+
+# Estatísticas que o roteador agrupa numa mesma tool (média x mediana) ou que ele não roteia
+_STATISTICS = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in [
+    ("mean", r"\bm[eé]dias?\b|\bmean\b|\baverage\b"),
+    ("median", r"\bmedianas?\b|\bmedian\b"),
+    ("mode", r"\bmodas?\b|\bmode\b"),
+    ("max", r"\bm[aá]x(?:im[oa]s?)?\b|\bmaior(?:es)?\b|\bmaximum\b"),
+    ("min", r"\bm[ií]n(?:im[oa]s?)?\b|\bmenor(?:es)?\b|\bminimum\b"),
+    ("std", r"\bdesvios?[- ]padr[aã]o\b|\bstd\b|\bstandard deviation\b"),
+    ("variance", r"\bvari[aâ]ncias?\b|\bvariance\b"),
+    ("clustering", r"\bclusters?\b|\bclustering\b|\bagrupamentos?\b|\bk-?means\b"),
+    ("time_trend", r"\btemporal\b|\bao longo do tempo\b|\btrend\b"),
+    ("crosstab", r"\btabelas? cruzadas?\b|\bcrosstab\b|\bconting[eê]ncia\b"),
+]]
+
+
+def _plot_path(output: str) -> Optional[str]:
+    if '"plot_path"' not in output:
+        return None
+    try:
+        return json.loads(output).get("plot_path")
+    except (ValueError, AttributeError):
+        return None
+
+
+class ToolResultCollector(BaseCallbackHandler):
+    """Guarda (tool, resultado) das tools executadas durante uma pergunta."""
+
+    def __init__(self):
+        self.results: List[Tuple[str, str]] = []
+        self._names: Dict[Any, str] = {}
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id=None, **kwargs) -> None:
+        self._names[run_id] = (serialized or {}).get("name", "tool")
+
+    def on_tool_end(self, output: Any, *, run_id=None, **kwargs) -> None:
+        content = getattr(output, "content", output)
+        self.results.append((self._names.pop(run_id, "tool"), str(content)))
+
+
+def question_params(question: str, columns: Sequence[str] = ()) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Parâmetros explícitos de uma pergunta: literais numéricos e colunas citadas.
+
+    Perguntas com parâmetros diferentes ("k=3" x "k=5", "V1" x "V2") ficam
+    muito parecidas para os embeddings, mas não têm a mesma resposta.
+
+    Args:
+        question: Pergunta em linguagem natural
+        columns: Colunas do dataset
+
+    Returns:
+        (números normalizados, colunas citadas), ambos ordenados
+    """
+    lowered = question.lower()
+    numbers = sorted(n.replace(",", ".") for n in _NUMBER.findall(lowered))
+    cited = sorted(str(c) for c in columns
+                   if re.search(rf"(?<!\w){re.escape(str(c).lower())}(?!\w)", lowered))
+    return tuple(numbers), tuple(cited)
+
+
+def question_intent(question: str) -> Tuple[str, ...]:
+    """
+    Assinatura da intenção de uma pergunta: o que ela pede, sem as colunas.
+
+    Junta as intenções do roteador (histograma, outliers, correlação, ...) com
+    estatísticas que ele agrupa numa só tool, já que "média de Amount" e
+    "mediana de Amount" são quase iguais para os embeddings.
+
+    Args:
+        question: Pergunta em linguagem natural
+
+    Returns:
+        Nomes das intenções reconhecidas, ordenados
+    """
+    intents = set(match_intents(question))
+    intents.update(name for name, pattern in _STATISTICS if pattern.search(question))
+    return tuple(sorted(intents))
+
+
+def is_cacheable_question(question: str) -> bool:
+    lowered = question.lower()
+    return not any(word in lowered for word in _HISTORY_DEPENDENT)
+
+
+class SemanticAnswerCache:
+    """
+    Triplas (pergunta, resultados das tools, resposta) num vectorstore.
+
+    A pergunta é o texto embutido; resposta, resultados e gráficos vão nos
+    metadados, junto com o fingerprint do dataset. Uma pergunta nova sobre o
+    mesmo dataset com relevância >= `min_score` em relação a uma já
+    respondida recebe a resposta armazenada sem rodar o agente, desde que peça
+    a mesma coisa (ver `question_intent`), cite as mesmas colunas e os mesmos
+    números (ver `question_params`) e os gráficos citados ainda existam.
+    """
+
+    def __init__(self, vectorstore, min_score: float = ANSWER_CACHE_MIN_SCORE, writer=None):
+        self.vectorstore = vectorstore
+        # Gravações assíncronas em lote (sem writer, grava direto)
+        self.writer = writer
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, question: str, fingerprint: str, columns: Sequence[str] = ()) -> Optional[str]:
+        """
+        Resposta armazenada para uma pergunta equivalente sobre o mesmo dataset.
+
+        Args:
+            question: Pergunta em linguagem natural
+            fingerprint: Fingerprint do dataset
+            columns: Colunas do dataset (para comparar as colunas citadas)
+
+        Returns:
+            Resposta, ou None (sem equivalente, relevância baixa, intenção ou
+            parâmetros diferentes ou gráfico removido)
+        """
+        start = time.perf_counter()
+        try:
+            results = self.vectorstore.similarity_search_with_relevance_scores(
+                question, k=_LOOKUP_CANDIDATES, filter={"fingerprint": fingerprint})
+        except Exception as e:
+            logger.error(f"Answer cache lookup failed: {e}")
+            results = []
+
+        answer = None
+        intent = question_intent(question)
+        params = question_params(question, columns)
+        for doc, score in results:
+            if score < self.min_score:
+                break
+            if question_intent(doc.page_content) != intent:
+                continue
+            if question_params(doc.page_content, columns) != params:
+                continue
+            plots = json.loads(doc.metadata.get("plots", "[]"))
+            if all(os.path.exists(p) or is_pending(p) for p in plots):
+                answer = doc.metadata.get("answer")
+                logger.info(f"Answer cache hit (score={score:.3f}) for '{question[:60]}' "
+                            f"~ '{doc.page_content[:60]}' in {(time.perf_counter() - start) * 1000:.1f} ms")
+                break
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def store(self, question: str, answer: str, fingerprint: str,
+              tool_results: List[Tuple[str, str]] = ()) -> None:
+        """Armazena a tripla pergunta/resultados/resposta do dataset."""
+        plots = [p for p in (_plot_path(out) for _, out in tool_results) if p]
+        tools = json.dumps([{"tool": name, "result": out} for name, out in tool_results], ensure_ascii=False)
+        metadata = {
+            "fingerprint": fingerprint,
+            "session": get_current_session(),
+            "answer": answer,
+            "tools": tools[:ANSWER_CACHE_MAX_TOOL_CHARS],
+            "plots": json.dumps(plots),
+            "created_at": time.time(),
+        }
+        if self.writer is not None:
+            self.writer.add(question, metadata)
+            return
+        try:
+            self.vectorstore.add_texts([question], metadatas=[metadata])
+        except Exception as e:
+            logger.error(f"Answer cache store failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_answer_cache: Optional[SemanticAnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """
+    Cache semântico do processo, sobre o vectorstore de memória.
+
+    Com ANSWER_CACHE=auto fica desligado quando os embeddings são por hashing
+    (sem OpenAI nem modelo local); com ANSWER_CACHE=1 e hashing usa
+    ANSWER_CACHE_HASHING_MIN_SCORE.
+
+    Returns:
+        SemanticAnswerCache, ou None se desativado/indisponível
+    """
+    global _answer_cache
+    if ANSWER_CACHE == "0":
+        return None
+    hashing = resolve_backend() == "hashing"
+    if hashing and ANSWER_CACHE == "auto":
+        return None
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            from memory_store import get_vectorstore, get_vectorstore_writer
+            vectorstore = get_vectorstore()
+            if vectorstore is None:
+                return None
+            min_score = ANSWER_CACHE_HASHING_MIN_SCORE if hashing else ANSWER_CACHE_MIN_SCORE
+            _answer_cache = SemanticAnswerCache(vectorstore, min_score=min_score,
+                                                writer=get_vectorstore_writer(vectorstore))
+        return _answer_cache
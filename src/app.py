@@ -1,8 +1,11 @@
 # src/app.py
 import os
 import streamlit as st
-from agent import build_agent, ask_agent, load_csv
-from glob import glob
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from agent import build_agent, ask_agent_stream, load_csv
+from plot_renderer import wait_for_plot
+from plot_store import plot_store
+from dataset_store import DEFAULT_SESSION
 from dotenv import load_dotenv
 import logging
 
@@ -23,6 +26,10 @@ if 'llm' not in st.session_state:
     st.session_state.llm = None
 if 'current_file' not in st.session_state:
     st.session_state.current_file = None
+
+# Id da sessão do Streamlit: chave do dataset no store compartilhado do processo
+ctx = get_script_run_ctx()
+session_id = ctx.session_id if ctx else None
     
 # Configuração no sidebar
 st.sidebar.header("⚙️ Configurações do Agente")
@@ -59,6 +66,45 @@ elif provider == "Ollama (local)":
     os.environ["LLM_PROVIDER"] = "ollama"
     os.environ["LLM_MODEL"] = model_input
 
+# Tool calling nativo: várias tools por passo, executadas em paralelo
+parallel_tools = st.sidebar.checkbox(
+    "⚡ Executar tools em paralelo",
+    value=os.getenv("AGENT_MODE", "react") == "parallel",
+    help="Aplicado ao carregar o CSV. Não disponível para Ollama."
+)
+os.environ["AGENT_MODE"] = "parallel" if parallel_tools else "react"
+
+
+
+def render_agent_stream(events, status_label: str):
+    """Renderiza tokens, passos das tools e gráficos conforme o agente os produz.
+
+    Returns:
+        Tupla (resposta final, lista de gráficos exibidos)
+    """
+    status = st.status(status_label, expanded=False)
+    answer_box = st.empty()
+    text, answer, shown_plots = "", "", []
+    for event in events:
+        kind = event["type"]
+        if kind == "token":
+            text += event["text"]
+            answer_box.markdown(text + "▌")
+        elif kind == "reset":
+            text = ""
+            status.update(label=event["text"])
+        elif kind == "tool_start":
+            status.write(f"🔧 `{event['tool']}` {event['input']}")
+        elif kind == "tool_end":
+            status.write(f"✅ `{event['tool']}` concluída")
+        elif kind == "plot" and event["path"] not in shown_plots and wait_for_plot(event["path"]):
+            shown_plots.append(event["path"])
+            st.image(event["path"], caption=os.path.basename(event["path"]))
+        elif kind == "final":
+            answer = event["text"]
+    status.update(label="Análise concluída", state="complete")
+    answer_box.markdown(answer or text)
+    return answer, shown_plots
 
 
 # Upload do CSV
@@ -73,7 +119,7 @@ if uploaded:
         with open(csv_path, "wb") as f:
             f.write(uploaded.getbuffer())
         st.success(f"Arquivo CSV salvo em: `{csv_path}`")
-        load_csv(csv_path)
+        load_csv(csv_path, session_id=session_id)
         # build_agent() agora retorna (agent, llm)
         agent, llm = build_agent()
         st.session_state.agent = agent
@@ -98,14 +144,13 @@ with col1:
         if not agent:
             st.warning("Envie um CSV antes de perguntar.")
         else:
-            with st.spinner("Agente analisando..."):
-                ans = ask_agent(agent, query, csv_path=csv_path, llm=llm)
             st.subheader("📥 Resposta do agente")
-            st.write(ans)
+            events = ask_agent_stream(agent, query, csv_path=csv_path, llm=llm, session_id=session_id)
+            ans, shown_plots = render_agent_stream(events, "Agente analisando...")
 
-            # Mostrar último gráfico
-            plots = sorted(glob("plots/*.png"), reverse=True)
-            if plots:
+            # Mostrar último gráfico da sessão (se nenhum foi exibido durante o streaming)
+            plots = [p for p in plot_store.session_plots(session_id or DEFAULT_SESSION, limit=1) if wait_for_plot(p)]
+            if plots and not shown_plots:
                 st.image(plots[0], caption=os.path.basename(plots[0]))
 
 with col2:
@@ -113,12 +158,12 @@ with col2:
         if not agent:
             st.warning("Envie um CSV antes de gerar conclusões.")
         else:
-            with st.spinner("Gerando conclusão a partir das análises..."):
-                ans = ask_agent(agent, "Quais conclusões você obteve?", csv_path=csv_path, llm=llm)
             st.subheader("📊 Conclusão Final")
-            st.write(ans)
+            events = ask_agent_stream(agent, "Quais conclusões você obteve?", csv_path=csv_path, llm=llm,
+                                      session_id=session_id)
+            ans, shown_plots = render_agent_stream(events, "Gerando conclusão a partir das análises...")
 
-            # Se houver gráficos, mostrar todos
-            plots = sorted(glob("plots/*.png"), reverse=True)[:3]
-            if plots:
+            # Se houver gráficos da sessão, mostrar os mais recentes
+            plots = [p for p in plot_store.session_plots(session_id or DEFAULT_SESSION, limit=3) if wait_for_plot(p)]
+            if plots and not shown_plots:
                 st.image(plots, caption=[os.path.basename(p) for p in plots])
\ No newline at end of file
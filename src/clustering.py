@@ -0,0 +1,212 @@
+# src/clustering.py
+# Motor de clustering escalável: amostragem, MiniBatchKMeans, padronização, cache e seleção de k
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+from utils import logger
+
+# Acima disso, o modelo é ajustado numa amostra e as demais linhas só são atribuídas
+CLUSTER_SAMPLE_ROWS = int(os.getenv("CLUSTER_SAMPLE_ROWS", "50000"))
+# Orçamento (s) da seleção automática de k: valores de k que não começaram no prazo são
+# descartados (ajustes já em andamento não são interrompidos, só ignorados); no modo auto,
+# com o prazo esgotado, o ajuste final usa MiniBatchKMeans em vez do KMeans completo
+CLUSTER_LATENCY_BUDGET = float(os.getenv("CLUSTER_LATENCY_BUDGET", "10"))
+CLUSTER_K_MIN = int(os.getenv("CLUSTER_K_MIN", "2"))
+CLUSTER_K_MAX = int(os.getenv("CLUSTER_K_MAX", "8"))
+CLUSTER_SILHOUETTE_SAMPLE = int(os.getenv("CLUSTER_SILHOUETTE_SAMPLE", "5000"))
+CLUSTER_SWEEP_WORKERS = int(os.getenv("CLUSTER_SWEEP_WORKERS", str(os.cpu_count() or 2)))
+CLUSTER_MAX_MODELS = int(os.getenv("CLUSTER_MAX_MODELS", "16"))
+
+MODES = ("auto", "full", "sample", "minibatch")
+_SEED = 42
+# Linhas da amostra usada na varredura de k
+_SWEEP_ROWS = 20000
+
+
+@dataclass
+class ClusterModel:
+    """Modelo ajustado e o resumo que a tool devolve."""
+    k: int
+    mode: str
+    columns: List[str]
+    model: Any
+    mean: np.ndarray
+    scale: np.ndarray
+    counts: Dict[int, int]
+    inertia: float
+    fit_rows: int
+    silhouette: Optional[float] = None
+    sweep: List[Dict[str, float]] = field(default_factory=list)
+
+    def centers(self) -> List[List[float]]:
+        """Centros nas unidades originais das colunas."""
+        return (self.model.cluster_centers_ * self.scale + self.mean).tolist()
+
+
+def prepare_matrix(df: pd.DataFrame, columns: Sequence[str], standardize: bool = True):
+    """
+    Matriz float32 das colunas (linhas com NaN removidas), opcionalmente padronizada.
+
+    Returns:
+        Tupla (X, média, escala); com standardize=False, média 0 e escala 1
+    """
+    X = df[list(columns)].dropna().to_numpy(dtype=np.float32)
+    if not standardize:
+        return X, np.zeros(X.shape[1], dtype=np.float32), np.ones(X.shape[1], dtype=np.float32)
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    return (X - mean) / scale, mean, scale
+
+
+def _sample(X: np.ndarray, n: int) -> np.ndarray:
+    if X.shape[0] <= n:
+        return X
+    idx = np.random.default_rng(_SEED).choice(X.shape[0], size=n, replace=False)
+    return X[idx]
+
+
+def _resolve_mode(mode: str, rows: int) -> str:
+    if mode in ("full", "sample", "minibatch"):
+        return mode
+    return "full" if rows <= CLUSTER_SAMPLE_ROWS else "sample"
+
+
+def _fit(X: np.ndarray, k: int, mode: str):
+    """Ajusta o modelo e retorna (modelo, linhas usadas no ajuste)."""
+    if mode == "minibatch":
+        model = MiniBatchKMeans(n_clusters=k, random_state=_SEED, batch_size=4096, n_init=3)
+        return model.fit(X), X.shape[0]
+    fit_data = X if mode == "full" else _sample(X, CLUSTER_SAMPLE_ROWS)
+    model = KMeans(n_clusters=k, random_state=_SEED, n_init=3)
+    return model.fit(fit_data), fit_data.shape[0]
+
+
+def _score_k(sample: np.ndarray, k: int, deadline: float) -> Optional[Dict[str, float]]:
+    # Tarefa que só saiu da fila depois do prazo não começa o ajuste
+    if time.monotonic() >= deadline:
+        return None
+    model = KMeans(n_clusters=k, random_state=_SEED, n_init=1).fit(sample)
+    silhouette = silhouette_score(sample, model.labels_,
+                                  sample_size=min(CLUSTER_SILHOUETTE_SAMPLE, sample.shape[0]),
+                                  random_state=_SEED)
+    return {"k": k, "inertia": float(model.inertia_), "silhouette": float(silhouette)}
+
+
+class ClusteringEngine:
+    """
+    Clustering K-means com custo limitado e modelos reutilizáveis.
+
+    Modos: `full` (todas as linhas), `sample` (ajuste numa amostra de
+    CLUSTER_SAMPLE_ROWS linhas e atribuição das demais), `minibatch`
+    (MiniBatchKMeans em todas as linhas) e `auto` (full em datasets pequenos,
+    sample nos grandes). Modelos ajustados ficam em cache LRU por conteúdo
+    das colunas, k, modo e padronização.
+    """
+
+    def __init__(self, max_models: int = CLUSTER_MAX_MODELS, workers: int = CLUSTER_SWEEP_WORKERS):
+        self.max_models = max_models
+        self._models: "OrderedDict[tuple, ClusterModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cluster-sweep")
+
+    def sweep(self, X: np.ndarray, ks: Sequence[int], budget: float = CLUSTER_LATENCY_BUDGET) -> List[Dict[str, float]]:
+        """
+        Avalia vários k em paralelo (inércia para o cotovelo + silhouette) numa amostra.
+
+        Valores de k que não terminam dentro de `budget` segundos são descartados;
+        os que ainda não começaram não chegam a rodar.
+
+        Returns:
+            Lista de {"k", "inertia", "silhouette"} ordenada por k
+        """
+        deadline = time.monotonic() + budget
+        sample = _sample(X, min(CLUSTER_SAMPLE_ROWS, _SWEEP_ROWS))
+        ks = [k for k in ks if 2 <= k < sample.shape[0]]
+        futures = {self._pool.submit(_score_k, sample, k, deadline): k for k in ks}
+        done, not_done = wait(futures, timeout=budget)
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            logger.warning(f"Cluster sweep budget exceeded, skipped k={sorted(futures[f] for f in not_done)}")
+        results = [f.result() for f in done if f.exception() is None and f.result() is not None]
+        return sorted(results, key=lambda r: r["k"])
+
+    def cluster(self, df: pd.DataFrame, columns: Sequence[str], k: Optional[int] = None,
+                mode: str = "auto", standardize: bool = True, data_key: Tuple = (),
+                budget: float = CLUSTER_LATENCY_BUDGET) -> Tuple[ClusterModel, bool]:
+        """
+        Agrupa as linhas do DataFrame pelas colunas dadas.
+
+        Args:
+            df: DataFrame
+            columns: Colunas numéricas
+            k: Número de clusters; None escolhe pelo maior silhouette
+            mode: auto, full, sample ou minibatch
+            standardize: Padroniza as colunas (média 0, desvio 1) antes do ajuste
+            data_key: Identificação do conteúdo das colunas (ex.: hashes), para o cache
+            budget: Orçamento de tempo em segundos para a seleção de k (no modo
+                auto, esgotado o prazo o ajuste final passa para minibatch)
+
+        Returns:
+            Tupla (modelo, veio_do_cache)
+        """
+        cache_key = (data_key or (id(df),), tuple(columns), k, mode, standardize)
+        with self._lock:
+            cached = self._models.get(cache_key)
+            if cached is not None:
+                self._models.move_to_end(cache_key)
+                return cached, True
+
+        start = time.monotonic()
+        X, mean, scale = prepare_matrix(df, columns, standardize)
+        if X.shape[0] < 2:
+            raise ValueError("not enough rows for clustering")
+        resolved = _resolve_mode(mode, X.shape[0])
+
+        sweep: List[Dict[str, float]] = []
+        if k is None:
+            sweep = self.sweep(X, range(CLUSTER_K_MIN, CLUSTER_K_MAX + 1), budget=budget)
+            k = max(sweep, key=lambda r: r["silhouette"])["k"] if sweep else 3
+        k = min(k, X.shape[0])
+        # Resultado degradado pelo prazo não vai para o cache (a próxima chamada tenta de novo)
+        degraded = mode == "auto" and X.shape[0] > _SWEEP_ROWS and time.monotonic() - start >= budget
+        if degraded:
+            logger.warning(f"Cluster latency budget exhausted, final fit uses minibatch instead of {resolved}")
+            resolved = "minibatch"
+
+        model, fit_rows = _fit(X, k, resolved)
+        labels = model.labels_ if fit_rows == X.shape[0] else model.predict(X)
+        counts = np.bincount(labels, minlength=k)
+        chosen = next((r for r in sweep if r["k"] == k), None)
+        result = ClusterModel(
+            k=k, mode=resolved, columns=list(columns), model=model, mean=mean, scale=scale,
+            counts={i: int(c) for i, c in enumerate(counts)},
+            inertia=float(model.inertia_), fit_rows=fit_rows,
+            silhouette=chosen["silhouette"] if chosen else None, sweep=sweep,
+        )
+        logger.info(f"Clustering k={k} mode={resolved} on {X.shape[0]} rows "
+                    f"(fit on {fit_rows}) in {time.monotonic() - start:.2f}s")
+
+        if degraded:
+            return result, False
+        with self._lock:
+            self._models[cache_key] = result
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return result, False
+
+
+# Instância compartilhada (cache de modelos e pool da varredura de k)
+clustering_engine = ClusteringEngine()
@@ -0,0 +1,124 @@
+# src/correlation.py
+# Motor de correlação: matriz padronizada float32 em cache e covariância por blocos via BLAS
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils import logger
+
+METHODS = ("pearson", "spearman")
+# Pares mais fortes devolvidos por padrão
+CORR_TOP_PAIRS = int(os.getenv("CORR_TOP_PAIRS", "10"))
+# Acima disso, a matriz completa não vai para o contexto do LLM (só os pares mais fortes)
+CORR_MATRIX_MAX_COLUMNS = int(os.getenv("CORR_MATRIX_MAX_COLUMNS", "12"))
+
+
+@dataclass
+class _Standardized:
+    """Colunas padronizadas (ausentes = 0) e o denominador de cada par."""
+    z: np.ndarray
+    denom: np.ndarray
+    constant: np.ndarray
+    corr: np.ndarray
+    known: np.ndarray
+
+
+class CorrelationEngine:
+    """
+    Correlações de um dataset, calculadas sob demanda e reaproveitadas.
+
+    Na primeira consulta de cada método as colunas numéricas são padronizadas
+    uma única vez numa matriz float32 (Spearman usa os postos); cada bloco de
+    correlações pedido é então um único produto Zᵀ·Z (BLAS). Os valores já
+    calculados ficam numa matriz compartilhada: subconjuntos, pares mais
+    fortes e o coeficiente do scatter só calculam o que ainda falta.
+
+    Com valores ausentes, cada par é normalizado pelo número de linhas em que
+    ambas as colunas existem (aproximação do `corr()` pairwise do pandas).
+    """
+
+    def __init__(self, columns: Sequence[str], load: Callable[[], pd.DataFrame]):
+        """
+        Args:
+            columns: Colunas numéricas do dataset
+            load: Função que devolve essas colunas (chamada só ao padronizar)
+        """
+        self.columns: List[str] = list(columns)
+        self._position = {col: i for i, col in enumerate(self.columns)}
+        self._load = load
+        self._states: Dict[str, _Standardized] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, method: str) -> _Standardized:
+        state = self._states.get(method)
+        if state is not None:
+            return state
+        frame = self._load()
+        frame = frame.rank() if method == "spearman" else frame
+        X = frame.to_numpy(dtype=np.float32, na_value=np.nan)
+        valid = ~np.isnan(X)
+        n = valid.sum(axis=0)
+        mean = np.nansum(X, axis=0) / np.maximum(n, 1)
+        std = np.sqrt(np.nansum((X - mean) ** 2, axis=0) / np.maximum(n - 1, 1))
+        constant = (std == 0) | (n < 2)
+        z = np.where(valid, (X - mean) / np.where(constant, 1, std), 0).astype(np.float32)
+        if valid.all():
+            denom = np.full((X.shape[1], X.shape[1]), X.shape[0] - 1, dtype=np.float64)
+        else:
+            mask = valid.astype(np.float32)
+            denom = np.maximum(mask.T @ mask - 1, 1).astype(np.float64)
+        c = len(self.columns)
+        state = _Standardized(z=z, denom=denom, constant=constant,
+                              corr=np.full((c, c), np.nan), known=np.zeros((c, c), dtype=bool))
+        self._states[method] = state
+        logger.info(f"Correlation matrix standardized ({method}): {X.shape[0]} rows x {c} columns")
+        return state
+
+    def _indices(self, columns: Optional[Sequence[str]]) -> np.ndarray:
+        if not columns:
+            return np.arange(len(self.columns))
+        missing = [col for col in columns if col not in self._position]
+        if missing:
+            raise KeyError(f"columns not numeric or not found: {missing}")
+        return np.array([self._position[col] for col in columns])
+
+    def _block(self, idx: np.ndarray, method: str) -> np.ndarray:
+        with self._lock:
+            state = self._state(method)
+            block = np.ix_(idx, idx)
+            if not state.known[block].all():
+                zs = state.z[:, idx]
+                corr = np.clip((zs.T @ zs).astype(np.float64) / state.denom[block], -1.0, 1.0)
+                corr[state.constant[idx], :] = np.nan
+                corr[:, state.constant[idx]] = np.nan
+                state.corr[block] = corr
+                state.known[block] = True
+            return state.corr[block]
+
+    def matrix(self, columns: Optional[Sequence[str]] = None, method: str = "pearson") -> pd.DataFrame:
+        """Matriz de correlação das colunas (todas as numéricas por padrão)."""
+        idx = self._indices(columns)
+        names = [self.columns[i] for i in idx]
+        return pd.DataFrame(self._block(idx, method), index=names, columns=names)
+
+    def top_pairs(self, columns: Optional[Sequence[str]] = None, method: str = "pearson",
+                  k: int = CORR_TOP_PAIRS) -> List[Dict[str, float]]:
+        """Os `k` pares de colunas distintas com maior |correlação|."""
+        idx = self._indices(columns)
+        corr = self._block(idx, method)
+        rows, cols = np.triu_indices(len(idx), k=1)
+        values = corr[rows, cols]
+        finite = np.flatnonzero(~np.isnan(values))
+        order = finite[np.argsort(-np.abs(values[finite]), kind="stable")][:k]
+        return [{"a": self.columns[idx[rows[i]]], "b": self.columns[idx[cols[i]]],
+                 "corr": round(float(values[i]), 4)} for i in order]
+
+    def pair(self, x: str, y: str, method: str = "pearson") -> Optional[float]:
+        """Correlação entre duas colunas (None se alguma é constante)."""
+        value = self._block(self._indices([x, y]), method)[0, 1]
+        return None if np.isnan(value) else float(value)
@@ -0,0 +1,272 @@
+# src/dataset_cache.py
+# Registro de datasets endereçado por conteúdo: cada CSV é parseado uma única vez
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from ingest import INGEST_OPTIMIZE, optimize_dtypes
+from utils import logger
+
+DATASET_CACHE_MAX_ENTRIES = int(os.getenv("DATASET_CACHE_MAX_ENTRIES", "4"))
+DATASET_CACHE_MAX_MB = float(os.getenv("DATASET_CACHE_MAX_MB", "2048"))
+DATASET_SIDECAR = os.getenv("DATASET_SIDECAR", "1").lower() in ("1", "true", "yes", "sim")
+
+_HASH_CHUNK_SIZE = 4 * 1024 * 1024
+_SIDECAR_SUFFIX = ".arrow"
+_SIDECAR_META_KEY = b"source_fingerprint"
+_REPORT_META_KEY = b"memory_report"
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    """Estima a memória residente de um DataFrame (inclui strings)."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def sidecar_path(path: str) -> str:
+    """Caminho do sidecar colunar (Arrow IPC / Feather v2) ao lado do CSV."""
+    return path + _SIDECAR_SUFFIX
+
+
+def read_sidecar(path: str, fingerprint: str) -> Optional[pd.DataFrame]:
+    """
+    Carrega o sidecar colunar via memory mapping, se for válido para o CSV.
+
+    O arquivo é gravado sem compressão, então colunas numéricas sem nulos
+    apontam direto para as páginas mapeadas (zero-copy): várias sessões
+    abrindo o mesmo arquivo compartilham o page cache do sistema operacional.
+
+    Args:
+        path: Caminho do CSV original
+        fingerprint: Fingerprint atual do CSV
+
+    Returns:
+        DataFrame ou None se o sidecar não existir, estiver desatualizado
+        ou o pyarrow não estiver disponível
+    """
+    sidecar = sidecar_path(path)
+    if not os.path.exists(sidecar):
+        return None
+
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+
+    try:
+        table = feather.read_table(sidecar, memory_map=True)
+        metadata = table.schema.metadata or {}
+        if metadata.get(_SIDECAR_META_KEY, b"").decode() != fingerprint:
+            logger.info(f"Stale sidecar ignored: {sidecar}")
+            return None
+        df = table.to_pandas(split_blocks=True)
+        if _REPORT_META_KEY in metadata:
+            df.attrs["memory_report"] = json.loads(metadata[_REPORT_META_KEY])
+        logger.info(f"Sidecar loaded (memory-mapped): {sidecar}")
+        return df
+    except Exception as e:
+        logger.warning(f"Failed to read sidecar {sidecar}: {e}")
+        return None
+
+
+def write_sidecar(df: pd.DataFrame, path: str, fingerprint: str) -> Optional[str]:
+    """
+    Grava o sidecar colunar do DataFrame, sem compressão (mmap-friendly).
+
+    Args:
+        df: DataFrame já parseado
+        path: Caminho do CSV original
+        fingerprint: Fingerprint do CSV, gravado nos metadados do schema
+
+    Returns:
+        Caminho do sidecar ou None em caso de falha
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        logger.warning("pyarrow not available, skipping columnar sidecar")
+        return None
+
+    sidecar = sidecar_path(path)
+    tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[_SIDECAR_META_KEY] = fingerprint.encode()
+        if "memory_report" in df.attrs:
+            metadata[_REPORT_META_KEY] = json.dumps(df.attrs["memory_report"]).encode()
+        table = table.replace_schema_metadata(metadata)
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        # Troca atômica para não expor sidecar parcial a outras sessões
+        os.replace(tmp_path, sidecar)
+        logger.info(f"Sidecar written: {sidecar}")
+        return sidecar
+    except Exception as e:
+        logger.warning(f"Failed to write sidecar {sidecar}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+
+def read_csv_cached(path: str, fingerprint: str) -> pd.DataFrame:
+    """
+    Carrega o CSV preferindo o sidecar colunar; no primeiro parse otimiza
+    os tipos e grava o sidecar já otimizado.
+
+    Args:
+        path: Caminho do CSV
+        fingerprint: Fingerprint atual do CSV
+
+    Returns:
+        DataFrame carregado
+    """
+    if DATASET_SIDECAR:
+        df = read_sidecar(path, fingerprint)
+        if df is not None:
+            return df
+
+    df = pd.read_csv(path)
+    if INGEST_OPTIMIZE:
+        df, report = optimize_dtypes(df)
+        df.attrs["memory_report"] = report
+    if DATASET_SIDECAR:
+        write_sidecar(df, path, fingerprint)
+    return df
+
+
+class DatasetCache:
+    """
+    Cache LRU de DataFrames indexado pelo hash do conteúdo do arquivo.
+
+    O hash é memoizado por (caminho, tamanho, mtime), então recargas do mesmo
+    arquivo não releem o disco. Arquivos regravados com o mesmo conteúdo
+    (ex.: novo upload no Streamlit) reaproveitam o DataFrame já parseado.
+    """
+
+    def __init__(self, max_entries: int = DATASET_CACHE_MAX_ENTRIES,
+                 max_mb: float = DATASET_CACHE_MAX_MB):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024**2)
+        self._entries: "OrderedDict[str, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def fingerprint(self, path: str) -> str:
+        """
+        Retorna o fingerprint do arquivo: hash do conteúdo + tamanho.
+
+        Args:
+            path: Caminho do arquivo
+
+        Returns:
+            String no formato '<sha1>-<tamanho>'
+        """
+        st = os.stat(path)
+        stat_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._hashes.get(stat_key)
+        if cached:
+            return cached
+
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        fingerprint = f"{digest.hexdigest()}-{st.st_size}"
+
+        with self._lock:
+            # Descarta hashes antigos do mesmo caminho
+            for key in [k for k in self._hashes if k[0] == stat_key[0]]:
+                del self._hashes[key]
+            self._hashes[stat_key] = fingerprint
+        return fingerprint
+
+    def get_or_load(self, path: str,
+                    loader: Callable[[str, str], pd.DataFrame] = read_csv_cached) -> Tuple[pd.DataFrame, str]:
+        """
+        Retorna o DataFrame do arquivo, parseando apenas em caso de miss.
+
+        Args:
+            path: Caminho do arquivo
+            loader: Função (path, fingerprint) que carrega o arquivo em DataFrame
+
+        Returns:
+            Tupla (DataFrame, fingerprint)
+        """
+        fingerprint = self.fingerprint(path)
+
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                self._entries.move_to_end(fingerprint)
+                self.hits += 1
+                logger.info(f"Dataset cache hit: {path} (hits={self.hits}, misses={self.misses})")
+                return entry[0], fingerprint
+            self.misses += 1
+
+        logger.info(f"Dataset cache miss: {path} (hits={self.hits}, misses={self.misses})")
+        df = loader(path, fingerprint)
+        self.put(fingerprint, df)
+        return df, fingerprint
+
+    def put(self, fingerprint: str, df: pd.DataFrame) -> None:
+        """Insere um DataFrame no cache e aplica o limite de entradas/memória."""
+        nbytes = _frame_nbytes(df)
+        if nbytes > self.max_bytes:
+            logger.warning(
+                f"Dataset {fingerprint[:12]} ({nbytes / 1024**2:.1f} MB) exceeds cache budget, not cached"
+            )
+            return
+
+        with self._lock:
+            self._entries[fingerprint] = (df, nbytes)
+            self._entries.move_to_end(fingerprint)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove entradas menos usadas até respeitar os limites."""
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            fingerprint, (_, nbytes) = self._entries.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"Dataset cache evicted {fingerprint[:12]} ({nbytes / 1024**2:.1f} MB)")
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._entries.values())
+
+    def get(self, fingerprint: str) -> Optional[pd.DataFrame]:
+        """Retorna o DataFrame em cache para um fingerprint, se existir."""
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            return entry[0] if entry is not None else None
+
+    def stats(self) -> Dict[str, float]:
+        """Retorna contadores de hit/miss e uso de memória do cache."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_mb": round(self.total_bytes / 1024**2, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hashes.clear()
+
+
+# Instância compartilhada pelo processo (todas as sessões do Streamlit)
+dataset_cache = DatasetCache()
@@ -0,0 +1,279 @@
+# src/dataset_profile.py
+# Perfil estatístico memoizado por dataset, compartilhado por todas as tools de EDA
+
+import os
+import hashlib
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from correlation import CorrelationEngine
+from outliers import METHODS as OUTLIER_METHODS, ZSCORE_THRESHOLD, OutlierIndex, build_outlier_index
+from streaming import QuantileSketch
+from utils import logger
+
+# Quantis usados por describe/boxplot/outliers/conclusão
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+
+# exact | sketch | auto (sketch a partir de PROFILE_SKETCH_MIN_ROWS linhas)
+PROFILE_QUANTILE_MODE = os.getenv("PROFILE_QUANTILE_MODE", "auto")
+PROFILE_SKETCH_MIN_ROWS = int(os.getenv("PROFILE_SKETCH_MIN_ROWS", "5000000"))
+_SKETCH_BATCH = 1_000_000
+
+
+class DatasetProfile:
+    """
+    Estatísticas de um DataFrame calculadas sob demanda e memoizadas.
+
+    Cada estatística é calculada uma única vez, vetorizada sobre todas as
+    colunas numéricas; chamadas seguintes são consultas a dicionário. O
+    DataFrame é tratado como imutável: um novo frame gera um novo perfil.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self._df_ref = weakref.ref(df)
+        self.rows = int(df.shape[0])
+        self._memo: Dict[Any, Any] = {}
+        self._quantiles: Dict[float, pd.Series] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def df(self) -> pd.DataFrame:
+        df = self._df_ref()
+        if df is None:
+            raise RuntimeError("DataFrame of this profile was released")
+        return df
+
+    def memo(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Retorna o valor memoizado para `key`, calculando na primeira chamada.
+
+        Args:
+            key: Chave da estatística
+            compute: Função sem argumentos que calcula o valor
+
+        Returns:
+            Valor memoizado
+        """
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+            value = compute()
+            self._memo[key] = value
+            return value
+
+    # ---- Estrutura -------------------------------------------------------
+
+    def numeric_columns(self) -> List[str]:
+        return self.memo("numeric_columns",
+                         lambda: self.df.select_dtypes(include=[np.number]).columns.tolist())
+
+    def numeric(self) -> pd.DataFrame:
+        """Subconjunto numérico do DataFrame (sem cópia dos dados)."""
+        return self.df[self.numeric_columns()]
+
+    def column_types(self) -> Dict[str, List[str]]:
+        def compute():
+            df = self.df
+            return {
+                "numeric": self.numeric_columns(),
+                "categorical": df.select_dtypes(include=["object", "category"]).columns.tolist(),
+                "datetime": df.select_dtypes(include=["datetime64"]).columns.tolist(),
+            }
+        return self.memo("column_types", compute)
+
+    def column_hash(self, column: str) -> str:
+        """Hash do conteúdo de uma coluna (chave do cache de gráficos)."""
+        def compute():
+            values = pd.util.hash_pandas_object(self.df[column], index=False).values
+            return hashlib.sha1(values.tobytes()).hexdigest()
+        return self.memo(("column_hash", column), compute)
+
+    def memory_usage_mb(self) -> float:
+        return self.memo("memory_usage_mb",
+                         lambda: round(self.df.memory_usage(deep=True).sum() / 1024**2, 2))
+
+    # ---- Contagens -------------------------------------------------------
+
+    def null_counts(self) -> pd.Series:
+        return self.memo("null_counts", lambda: self.df.isna().sum())
+
+    def missing(self) -> Dict[str, int]:
+        """Colunas com valores ausentes e suas contagens."""
+        def compute():
+            nulls = self.null_counts()
+            return {col: int(n) for col, n in nulls[nulls > 0].items()}
+        return self.memo("missing", compute)
+
+    def duplicates(self) -> int:
+        return self.memo("duplicates", lambda: int(self.df.duplicated().sum()))
+
+    # ---- Momentos e extremos (todas as colunas numéricas de uma vez) -----
+
+    def counts(self) -> pd.Series:
+        return self.memo("counts", lambda: self.numeric().count())
+
+    def means(self) -> pd.Series:
+        return self.memo("means", lambda: self.numeric().mean())
+
+    def stds(self) -> pd.Series:
+        return self.memo("stds", lambda: self.numeric().std())
+
+    def variances(self) -> pd.Series:
+        return self.memo("variances", lambda: self.stds() ** 2)
+
+    def mins(self) -> pd.Series:
+        return self.memo("mins", lambda: self.numeric().min())
+
+    def maxs(self) -> pd.Series:
+        return self.memo("maxs", lambda: self.numeric().max())
+
+    # ---- Quantis -----------------------------------------------------------
+
+    def quantile_mode(self) -> str:
+        """'exact' (ordenação parcial) ou 'sketch' (KLL mergeável, erro limitado)."""
+        def compute():
+            if PROFILE_QUANTILE_MODE in ("exact", "sketch"):
+                return PROFILE_QUANTILE_MODE
+            return "sketch" if self.rows >= PROFILE_SKETCH_MIN_ROWS else "exact"
+        return self.memo("quantile_mode", compute)
+
+    def sketches(self) -> Dict[str, QuantileSketch]:
+        """Sketches de quantis por coluna numérica (mergeáveis com os do modo streaming)."""
+        def compute():
+            result = {}
+            for col in self.numeric_columns():
+                values = self.df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                sketch = QuantileSketch()
+                for start in range(0, values.size, _SKETCH_BATCH):
+                    batch = values[start:start + _SKETCH_BATCH]
+                    sketch.update(batch[~np.isnan(batch)])
+                result[col] = sketch
+            logger.info(f"Quantile sketches built for {len(result)} columns ({self.rows} rows)")
+            return result
+        return self.memo("sketches", compute)
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> pd.DataFrame:
+        """
+        Quantis de todas as colunas numéricas (linhas = quantis).
+
+        Os quantis já calculados ficam numa tabela compartilhada; só os que
+        faltam são calculados, todos de uma vez para todas as colunas.
+
+        Args:
+            qs: Probabilidades desejadas
+
+        Returns:
+            DataFrame indexado pelos quantis, com uma coluna por variável
+        """
+        qs = tuple(sorted(float(q) for q in qs))
+        with self._lock:
+            missing = [q for q in qs if q not in self._quantiles]
+            if missing:
+                if self.quantile_mode() == "sketch":
+                    sketches = self.sketches()
+                    table = pd.DataFrame(
+                        {col: sketches[col].quantiles(missing) for col in self.numeric_columns()},
+                        index=missing,
+                    )
+                else:
+                    table = self.numeric().quantile(missing)
+                for q in missing:
+                    self._quantiles[q] = table.loc[q]
+            return pd.DataFrame([self._quantiles[q] for q in qs], index=list(qs))
+
+    def iqr_bounds(self, k: float = 1.5) -> pd.DataFrame:
+        """
+        Limites de Tukey de todas as colunas numéricas.
+
+        Returns:
+            DataFrame com linhas q1, q3, iqr, lower, upper e uma coluna por variável
+        """
+        def compute():
+            quantiles = self.quantiles()
+            q1, q3 = quantiles.loc[0.25], quantiles.loc[0.75]
+            iqr = q3 - q1
+            return pd.DataFrame({"q1": q1, "q3": q3, "iqr": iqr,
+                                 "lower": q1 - k * iqr, "upper": q3 + k * iqr}).T
+        return self.memo(("iqr_bounds", k), compute)
+
+    def outlier_index(self, method: str = "iqr") -> OutlierIndex:
+        """
+        Índice de outliers de todas as colunas numéricas (calculado uma vez por método).
+
+        Args:
+            method: "iqr" (limites de Tukey) ou "zscore" (|z| > 3)
+
+        Returns:
+            OutlierIndex
+        """
+        if method not in OUTLIER_METHODS:
+            raise ValueError(f"unknown outlier method: {method}")
+
+        def compute():
+            if method == "iqr":
+                bounds = self.iqr_bounds()
+                lower, upper = bounds.loc["lower"], bounds.loc["upper"]
+            else:
+                lower = self.means() - ZSCORE_THRESHOLD * self.stds()
+                upper = self.means() + ZSCORE_THRESHOLD * self.stds()
+            return build_outlier_index(self.numeric(), lower, upper, method)
+        return self.memo(("outlier_index", method), compute)
+
+    def correlations(self) -> CorrelationEngine:
+        """Motor de correlação do dataset (matrizes padronizadas e blocos já calculados)."""
+        return self.memo("correlations", lambda: CorrelationEngine(self.numeric_columns(), self.numeric))
+
+    def median(self, column: str) -> float:
+        return float(self.quantiles().loc[0.5, column])
+
+    def mode(self, column: str) -> Optional[Any]:
+        """Moda de uma coluna (calculada sob demanda, por coluna)."""
+        def compute():
+            modes = self.df[column].mode()
+            return modes.iloc[0] if not modes.empty else None
+        return self.memo(("mode", column), compute)
+
+    def describe(self) -> Dict[str, Dict[str, float]]:
+        """Equivalente a df.describe().to_dict(), montado a partir do perfil."""
+        def compute():
+            quantiles = self.quantiles()
+            stats = pd.DataFrame({
+                "count": self.counts(),
+                "mean": self.means(),
+                "std": self.stds(),
+                "min": self.mins(),
+                "25%": quantiles.loc[0.25],
+                "50%": quantiles.loc[0.5],
+                "75%": quantiles.loc[0.75],
+                "max": self.maxs(),
+            })
+            return stats.astype(float).T.to_dict()
+        return self.memo("describe", compute)
+
+
+# Perfis indexados pelo id do DataFrame; removidos quando o frame é coletado
+_profiles: Dict[int, DatasetProfile] = {}
+_profiles_lock = threading.Lock()
+
+
+def get_profile(df: pd.DataFrame) -> DatasetProfile:
+    """
+    Retorna o perfil do DataFrame, criando-o na primeira vez.
+
+    O mesmo frame (ex.: vindo do cache de datasets) compartilha o mesmo
+    perfil entre perguntas, threads e sessões.
+    """
+    key = id(df)
+    with _profiles_lock:
+        profile = _profiles.get(key)
+        if profile is not None and profile._df_ref() is df:
+            return profile
+        profile = DatasetProfile(df)
+        _profiles[key] = profile
+        weakref.finalize(df, _profiles.pop, key, None)
+        logger.info(f"Dataset profile created: {df.shape[0]} rows, {df.shape[1]} columns")
+        return profile
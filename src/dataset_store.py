@@ -0,0 +1,197 @@
+# src/dataset_store.py
+# Store de datasets por sessão, compartilhado pelo processo (substitui o ThreadLocal)
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from dataset_profile import DatasetProfile, get_profile
+from utils import logger
+
+DATASET_STORE_MAX_MB = float(os.getenv("DATASET_STORE_MAX_MB", "4096"))
+DATASET_SESSION_TTL = float(os.getenv("DATASET_SESSION_TTL", "3600"))
+
+DEFAULT_SESSION = "default"
+
+# Sessão corrente: propagada para threads de executores via contextvars
+_current_session: ContextVar[str] = ContextVar("dataset_session", default=DEFAULT_SESSION)
+
+
+def get_current_session() -> str:
+    """Retorna o id da sessão corrente (ou 'default' fora de uma sessão)."""
+    return _current_session.get()
+
+
+@contextmanager
+def session_scope(session_id: Optional[str]):
+    """
+    Define a sessão corrente dentro do bloco.
+
+    Args:
+        session_id: Id da sessão (ex.: session_id do Streamlit); None mantém a atual
+    """
+    if session_id is None:
+        yield get_current_session()
+        return
+    token = _current_session.set(session_id)
+    try:
+        yield session_id
+    finally:
+        _current_session.reset(token)
+
+
+@dataclass
+class DatasetEntry:
+    """Dataset imutável compartilhado por todas as sessões que abriram o mesmo arquivo."""
+    key: str
+    fingerprint: Optional[str]
+    df: Optional[pd.DataFrame] = None
+    summary: Any = None
+    profile: Optional[DatasetProfile] = None
+    nbytes: int = 0
+    refcount: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class DatasetStore:
+    """
+    Mapeia sessões para datasets, com contagem de referências e orçamento de memória.
+
+    Sessões que carregam o mesmo conteúdo (mesmo fingerprint) compartilham uma
+    única entrada. Entradas sem referências ficam disponíveis para reuso até
+    que o orçamento exija despejo (LRU); sessões ociosas além do TTL perdem a
+    referência e recarregam o CSV na próxima pergunta.
+    """
+
+    def __init__(self, max_mb: float = DATASET_STORE_MAX_MB, session_ttl: float = DATASET_SESSION_TTL):
+        self.max_bytes = int(max_mb * 1024**2)
+        self.session_ttl = session_ttl
+        self._entries: "OrderedDict[str, DatasetEntry]" = OrderedDict()
+        self._sessions: Dict[str, str] = {}
+        self._session_seen: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def attach(self, session_id: str, df: Optional[pd.DataFrame] = None, summary: Any = None,
+               fingerprint: Optional[str] = None) -> DatasetEntry:
+        """
+        Associa um dataset (DataFrame ou resumo em streaming) a uma sessão.
+
+        Args:
+            session_id: Id da sessão
+            df: DataFrame carregado
+            summary: StreamingSummary (modo streaming)
+            fingerprint: Fingerprint do conteúdo; sem ele a entrada não é compartilhada
+
+        Returns:
+            Entrada associada à sessão
+        """
+        obj = df if df is not None else summary
+        key = fingerprint or f"anon-{id(obj)}"
+        with self._lock:
+            entry = self._entries.get(key)
+            same = entry is not None and (entry.df is df if df is not None else entry.summary is summary)
+            if not same:
+                profile = get_profile(df) if df is not None else None
+                entry = DatasetEntry(
+                    key=key,
+                    fingerprint=fingerprint,
+                    df=df,
+                    summary=summary,
+                    profile=profile,
+                    nbytes=int(profile.memory_usage_mb() * 1024**2) if profile is not None else 0,
+                )
+                self._replace_entry(key, entry)
+
+            previous = self._sessions.get(session_id)
+            if previous != key:
+                self._detach(session_id)
+                self._sessions[session_id] = key
+                entry.refcount += 1
+            self._touch(session_id, entry)
+            self._evict()
+            return entry
+
+    def _replace_entry(self, key: str, entry: DatasetEntry) -> None:
+        old = self._entries.get(key)
+        if old is not None:
+            entry.refcount = old.refcount
+        self._entries[key] = entry
+
+    def _touch(self, session_id: str, entry: DatasetEntry) -> None:
+        now = time.monotonic()
+        entry.last_used = now
+        self._session_seen[session_id] = now
+        self._entries.move_to_end(entry.key)
+
+    def get(self, session_id: str) -> Optional[DatasetEntry]:
+        """Retorna a entrada associada à sessão (None se não houver)."""
+        with self._lock:
+            key = self._sessions.get(session_id)
+            entry = self._entries.get(key) if key else None
+            if entry is not None:
+                self._touch(session_id, entry)
+            return entry
+
+    def release(self, session_id: str) -> None:
+        """Remove a referência da sessão ao seu dataset."""
+        with self._lock:
+            self._detach(session_id)
+            self._evict()
+
+    def _detach(self, session_id: str) -> None:
+        key = self._sessions.pop(session_id, None)
+        self._session_seen.pop(session_id, None)
+        entry = self._entries.get(key) if key else None
+        if entry is not None:
+            entry.refcount = max(0, entry.refcount - 1)
+
+    def _evict(self) -> None:
+        """Despeja sessões ociosas e entradas sem referência até caber no orçamento."""
+        now = time.monotonic()
+        for session_id, seen in list(self._session_seen.items()):
+            if now - seen > self.session_ttl:
+                logger.info(f"Dataset store: session {session_id[:8]} idle, releasing dataset")
+                self._detach(session_id)
+
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refcount == 0:
+                del self._entries[key]
+                logger.info(f"Dataset store evicted {key[:12]} ({entry.nbytes / 1024**2:.1f} MB)")
+
+        # Ainda acima do orçamento: libera as sessões menos recentes (recarregam sob demanda)
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes or len(self._entries) <= 1:
+                break
+            entry = self._entries[key]
+            for session_id in [s for s, k in self._sessions.items() if k == key]:
+                self._detach(session_id)
+            del self._entries[key]
+            logger.warning(f"Dataset store over budget, evicted in-use dataset {key[:12]}")
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna número de sessões, entradas e memória ocupada."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "entries": len(self._entries),
+                "memory_mb": round(self.total_bytes / 1024**2, 2),
+                "refcounts": {key[:12]: entry.refcount for key, entry in self._entries.items()},
+            }
+
+
+# Instância compartilhada pelo processo (todas as sessões/threads do Streamlit)
+dataset_store = DatasetStore()
@@ -0,0 +1,127 @@
+# src/embeddings.py
+# Backends de embeddings plugáveis (OpenAI, modelo local, hashing offline) com cache por hash do texto
+
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils import logger
+
+# auto | openai | local | hashing | none
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "auto")
+EMBEDDINGS_LOCAL_MODEL = os.getenv("EMBEDDINGS_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDINGS_HASHING_DIM = int(os.getenv("EMBEDDINGS_HASHING_DIM", "1024"))
+EMBEDDINGS_BATCH_SIZE = int(os.getenv("EMBEDDINGS_BATCH_SIZE", "64"))
+EMBEDDINGS_CACHE_DIR = os.getenv("EMBEDDINGS_CACHE_DIR", "embedding_cache")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings sem rede nem modelo: n-gramas de palavras e de caracteres
+    projetados por hashing num vetor de dimensão fixa (normalizado L2).
+
+    Não captura sinônimos como um modelo treinado, mas perguntas com as
+    mesmas palavras (ou variações de flexão) ficam próximas, o que basta
+    para o cache semântico em ambientes sem acesso à internet.
+    """
+
+    def __init__(self, n_features: int = EMBEDDINGS_HASHING_DIM):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.n_features = n_features
+        common = dict(n_features=n_features, alternate_sign=False, norm=None, lowercase=True, strip_accents="unicode")
+        self._words = HashingVectorizer(analyzer="word", ngram_range=(1, 2), **common)
+        self._chars = HashingVectorizer(analyzer="char_wb", ngram_range=(3, 5), **common)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        matrix = (self._words.transform(texts) + 0.5 * self._chars.transform(texts)).toarray()
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return (matrix / np.where(norms == 0, 1, norms)).astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class LocalEmbeddings(Embeddings):
+    """Modelo sentence-transformers local (carregado uma vez, inferência em lotes)."""
+
+    def __init__(self, model_name: str = EMBEDDINGS_LOCAL_MODEL, batch_size: int = EMBEDDINGS_BATCH_SIZE):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size,
+                                    normalize_embeddings=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def resolve_backend(backend: str = EMBEDDINGS_BACKEND) -> str:
+    """Backend efetivo: `auto` usa OpenAI com chave, senão o modelo local se instalado, senão hashing."""
+    if backend != "auto":
+        return backend
+    if os.getenv("OPENAI_API_KEY"):
+        return "openai"
+    try:
+        import sentence_transformers  # noqa: F401
+        return "local"
+    except ImportError:
+        return "hashing"
+
+
+def backend_id(backend: str) -> str:
+    """Identificador do espaço vetorial (namespace do cache, nome da coleção)."""
+    if backend == "local":
+        return "local-" + EMBEDDINGS_LOCAL_MODEL.split("/")[-1]
+    if backend == "hashing":
+        return f"hashing-{EMBEDDINGS_HASHING_DIM}"
+    return backend
+
+
+def _build(backend: str) -> Embeddings:
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"), chunk_size=EMBEDDINGS_BATCH_SIZE)
+    if backend == "local":
+        return LocalEmbeddings()
+    if backend == "hashing":
+        return HashingEmbeddings()
+    raise ValueError(f"unknown embeddings backend: {backend}")
+
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(backend: str = EMBEDDINGS_BACKEND) -> Optional[Embeddings]:
+    """
+    Embeddings do backend configurado, com cache em disco por hash do texto.
+
+    Documentos e consultas já vistos não são embutidos de novo (nem após
+    restart); os que faltam são enviados ao backend em lotes de
+    EMBEDDINGS_BATCH_SIZE.
+
+    Returns:
+        Embeddings, ou None com EMBEDDINGS_BACKEND=none
+    """
+    backend = resolve_backend(backend)
+    if backend == "none":
+        return None
+    with _embeddings_lock:
+        if backend not in _embeddings:
+            from langchain.embeddings import CacheBackedEmbeddings
+            from langchain.storage import LocalFileStore
+            store = LocalFileStore(EMBEDDINGS_CACHE_DIR)
+            _embeddings[backend] = CacheBackedEmbeddings.from_bytes_store(
+                _build(backend), store, namespace=backend_id(backend),
+                batch_size=EMBEDDINGS_BATCH_SIZE, query_embedding_cache=True, key_encoder="sha256",
+            )
+            logger.info(f"Embeddings backend: {backend_id(backend)} (cache in {EMBEDDINGS_CACHE_DIR}/)")
+        return _embeddings[backend]
@@ -0,0 +1,337 @@
+# src/faiss_store.py
+# Vectorstore FAISS para a memória de longo prazo: índice flat que vira HNSW/IVF ao crescer, persistido em disco
+
+import os
+import json
+import math
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from utils import logger
+
+# Índice usado quando a memória cresce: hnsw | ivf | flat (flat = sempre busca exata)
+MEMORY_FAISS_INDEX = os.getenv("MEMORY_FAISS_INDEX", "hnsw")
+# Entradas a partir das quais o índice flat é trocado pelo MEMORY_FAISS_INDEX
+MEMORY_FAISS_UPGRADE_AT = int(os.getenv("MEMORY_FAISS_UPGRADE_AT", "20000"))
+MEMORY_FAISS_HNSW_M = int(os.getenv("MEMORY_FAISS_HNSW_M", "32"))
+MEMORY_FAISS_EF_SEARCH = int(os.getenv("MEMORY_FAISS_EF_SEARCH", "128"))
+MEMORY_FAISS_NPROBE = int(os.getenv("MEMORY_FAISS_NPROBE", "16"))
+# Subconjuntos filtrados até esse tamanho são buscados de forma exata
+MEMORY_FAISS_EXACT_FILTER = int(os.getenv("MEMORY_FAISS_EXACT_FILTER", "5000"))
+# Metadados com lista invertida (filtro sem varrer todas as entradas)
+MEMORY_FAISS_FILTER_KEYS = tuple(os.getenv("MEMORY_FAISS_FILTER_KEYS", "fingerprint,session").split(","))
+
+_VECTORS_FILE = "vectors.f32"
+_DOCS_FILE = "docs.jsonl"
+_META_FILE = "meta.json"
+_INDEX_FILE = "index.faiss"
+_INDEX_META_FILE = "index.json"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _filter_terms(filter: Optional[Dict[str, Any]]) -> List[Tuple[str, Any]]:
+    """Filtro de igualdade (aceita também o formato {"$and": [...]} do Chroma)."""
+    if not filter:
+        return []
+    terms = []
+    for key, value in filter.items():
+        if key == "$and":
+            for clause in value:
+                terms.extend(_filter_terms(clause))
+        elif isinstance(value, dict) and set(value) == {"$eq"}:
+            terms.append((key, value["$eq"]))
+        elif isinstance(value, dict):
+            raise ValueError(f"unsupported filter operator: {value}")
+        else:
+            terms.append((key, value))
+    return terms
+
+
+class FaissMemoryStore(VectorStore):
+    """
+    Vectorstore FAISS com persistência incremental e filtro por metadados.
+
+    Vetores (normalizados, similaridade de cosseno) e documentos ficam em
+    arquivos só de acréscimo em `path`: gravar N entradas escreve só essas N.
+    O índice começa flat (exato) e, a partir de `upgrade_at` entradas, é
+    reconstruído como HNSW ou IVF; o snapshot do índice é salvo de tempos em
+    tempos e, ao abrir, só as entradas posteriores a ele são reindexadas.
+
+    Filtros por igualdade usam listas invertidas para as chaves em
+    MEMORY_FAISS_FILTER_KEYS (dataset e sessão). Subconjuntos pequenos são
+    buscados de forma exata; os grandes, no índice com seletor de ids. A
+    relevância segue a escala do Chroma (distância L2), então
+    ANSWER_CACHE_MIN_SCORE vale igual para os dois backends.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings, index_kind: str = MEMORY_FAISS_INDEX,
+                 upgrade_at: int = MEMORY_FAISS_UPGRADE_AT):
+        import faiss
+        self._faiss = faiss
+        self.path = path
+        self._embedding = embedding
+        self.index_kind = index_kind
+        self.upgrade_at = upgrade_at
+        os.makedirs(path, exist_ok=True)
+
+        # _lock protege leitura/troca do índice; _write_lock serializa gravações
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._postings: Dict[Tuple[str, Any], List[int]] = defaultdict(list)
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._index = None
+        self._kind: Optional[str] = None
+        self._trained_at = 0
+        self._snapshot_at = 0
+        self._load()
+
+    # ---- Persistência ----------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _map_vectors(self, count: int) -> None:
+        self._vectors = (np.memmap(self._file(_VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, self._dim))
+                         if count else np.empty((0, self._dim or 0), dtype=np.float32))
+
+    def _load(self) -> None:
+        if not os.path.exists(self._file(_META_FILE)):
+            return
+        with open(self._file(_META_FILE)) as f:
+            self._dim = json.load(f)["dim"]
+
+        docs = []
+        with open(self._file(_DOCS_FILE), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    docs.append(json.loads(line))
+                except ValueError:
+                    break
+        row_bytes = self._dim * 4
+        count = min(len(docs), os.path.getsize(self._file(_VECTORS_FILE)) // row_bytes)
+        if count < len(docs) or count * row_bytes < os.path.getsize(self._file(_VECTORS_FILE)):
+            # Gravação interrompida: descarta a entrada incompleta nos dois arquivos
+            logger.warning(f"FAISS store {self.path}: truncating to {count} consistent entries")
+            os.truncate(self._file(_VECTORS_FILE), count * row_bytes)
+            with open(self._file(_DOCS_FILE), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(doc, ensure_ascii=False) + "\n" for doc in docs[:count])
+        for doc in docs[:count]:
+            self._register(doc["id"], doc["text"], doc["metadata"])
+        self._map_vectors(count)
+
+        kind = self._target_kind(count)
+        index_meta = self._file(_INDEX_META_FILE)
+        if kind != "flat" and os.path.exists(index_meta):
+            with open(index_meta) as f:
+                snapshot = json.load(f)
+            if snapshot["kind"] == kind and snapshot["ntotal"] <= count:
+                self._index = self._faiss.read_index(self._file(_INDEX_FILE))
+                self._kind, self._trained_at = kind, snapshot.get("trained_at", 0)
+                self._snapshot_at = snapshot["ntotal"]
+                self._configure(self._index, kind)
+                if count > snapshot["ntotal"]:
+                    self._index.add(np.ascontiguousarray(self._vectors[snapshot["ntotal"]:]))
+        if self._index is None and count:
+            self._index, self._kind, self._trained_at = self._build_index(kind, count)
+            self._save_snapshot()
+        logger.info(f"FAISS store {self.path}: {count} entries ({self._kind or 'empty'} index)")
+
+    def _save_snapshot(self) -> None:
+        if self._kind == "flat":
+            return
+        self._faiss.write_index(self._index, self._file(_INDEX_FILE) + ".tmp")
+        os.replace(self._file(_INDEX_FILE) + ".tmp", self._file(_INDEX_FILE))
+        _write_json(self._file(_INDEX_META_FILE),
+                    {"kind": self._kind, "ntotal": self._index.ntotal, "trained_at": self._trained_at})
+        self._snapshot_at = self._index.ntotal
+
+    # ---- Índice ----------------------------------------------------------
+
+    def _target_kind(self, count: int) -> str:
+        if self.index_kind == "flat" or count < self.upgrade_at:
+            return "flat"
+        return self.index_kind
+
+    def _configure(self, index, kind: str) -> None:
+        if kind == "hnsw":
+            index.hnsw.efSearch = MEMORY_FAISS_EF_SEARCH
+        elif kind == "ivf":
+            index.nprobe = MEMORY_FAISS_NPROBE
+
+    def _build_index(self, kind: str, count: int):
+        """Índice novo com as `count` primeiras entradas."""
+        faiss = self._faiss
+        vectors = self._vectors[:count]
+        if kind == "hnsw":
+            index = faiss.IndexHNSWFlat(self._dim, MEMORY_FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 80
+        elif kind == "ivf":
+            nlist = max(1, int(math.sqrt(count)))
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(self._dim), self._dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            sample = np.random.default_rng(0).choice(count, size=min(count, 256 * nlist), replace=False)
+            index.train(np.ascontiguousarray(vectors[np.sort(sample)]))
+        elif kind == "flat":
+            index = faiss.IndexFlatIP(self._dim)
+        else:
+            raise ValueError(f"unknown FAISS index kind: {kind}")
+        self._configure(index, kind)
+        for start in range(0, count, 50000):
+            index.add(np.ascontiguousarray(vectors[start:start + 50000]))
+        return index, kind, count
+
+    def _needs_rebuild(self, count: int) -> bool:
+        kind = self._target_kind(count)
+        # IVF é retreinado quando a memória quadruplica desde o último treino
+        return kind != self._kind or (kind == "ivf" and count >= 4 * self._trained_at)
+
+    # ---- Escrita ---------------------------------------------------------
+
+    def _register(self, doc_id: str, text: str, metadata: Dict[str, Any]) -> None:
+        position = len(self._texts)
+        self._ids.append(doc_id)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        for key in MEMORY_FAISS_FILTER_KEYS:
+            if key in metadata:
+                self._postings[(key, metadata[key])].append(position)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = _normalize(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32))
+
+        with self._write_lock:
+            start = len(self._texts)
+            ids = ids or [str(start + i) for i in range(len(texts))]
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                _write_json(self._file(_META_FILE), {"dim": self._dim, "metric": "cosine"})
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"embedding dimension {vectors.shape[1]} != store dimension {self._dim}")
+
+            with open(self._file(_DOCS_FILE), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps({"id": i, "text": t, "metadata": m}, ensure_ascii=False) + "\n"
+                             for i, t, m in zip(ids, texts, metadatas))
+            with open(self._file(_VECTORS_FILE), "ab") as f:
+                f.write(vectors.tobytes())
+            count = start + len(texts)
+
+            with self._lock:
+                self._map_vectors(count)
+                rebuild = self._needs_rebuild(count)
+                if not rebuild:
+                    self._index.add(vectors)
+                    for doc_id, text, metadata in zip(ids, texts, metadatas):
+                        self._register(doc_id, text, metadata)
+
+            if rebuild:
+                # Reconstrução fora do lock de leitura: buscas seguem no índice antigo
+                index, kind, trained_at = self._build_index(self._target_kind(count), count)
+                logger.info(f"FAISS store {self.path}: {kind} index built with {count} entries")
+                with self._lock:
+                    self._index, self._kind, self._trained_at = index, kind, trained_at
+                    for doc_id, text, metadata in zip(ids, texts, metadatas):
+                        self._register(doc_id, text, metadata)
+            if rebuild or count - self._snapshot_at >= max(1000, self._snapshot_at // 10):
+                self._save_snapshot()
+        return ids
+
+    # ---- Busca -----------------------------------------------------------
+
+    def _filter_positions(self, filter: Optional[Dict[str, Any]], count: int) -> Optional[np.ndarray]:
+        """Posições que satisfazem o filtro (None = sem filtro)."""
+        terms = _filter_terms(filter)
+        if not terms:
+            return None
+        positions = None
+        for key, value in terms:
+            if key in MEMORY_FAISS_FILTER_KEYS:
+                matched = np.asarray(self._postings.get((key, value), ()), dtype=np.int64)
+            else:
+                matched = np.asarray([i for i, m in enumerate(self._metadatas[:count]) if m.get(key) == value],
+                                     dtype=np.int64)
+            positions = matched if positions is None else np.intersect1d(positions, matched, assume_unique=True)
+        return positions[positions < count]
+
+    def _search(self, query: np.ndarray, k: int, filter: Optional[Dict[str, Any]]) -> List[Tuple[int, float]]:
+        with self._lock:
+            count = len(self._texts)
+            if not count:
+                return []
+            positions = self._filter_positions(filter, count)
+            k = min(k, count if positions is None else len(positions))
+            if k <= 0:
+                return []
+
+            if positions is not None and (len(positions) <= MEMORY_FAISS_EXACT_FILTER or self._kind == "flat"):
+                scores = self._vectors[positions] @ query
+                top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+                top = top[np.argsort(-scores[top])]
+                return [(int(positions[i]), float(scores[i])) for i in top]
+
+            params = None
+            if positions is not None:
+                selector = self._faiss.IDSelectorBatch(positions)
+                if self._kind == "hnsw":
+                    params = self._faiss.SearchParametersHNSW(sel=selector, efSearch=max(MEMORY_FAISS_EF_SEARCH, k))
+                else:
+                    params = self._faiss.SearchParametersIVF(sel=selector, nprobe=MEMORY_FAISS_NPROBE)
+            scores, found = self._index.search(query[None, :], k, params=params)
+            return [(int(i), float(s)) for i, s in zip(found[0], scores[0]) if i >= 0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Documentos mais parecidos com a consulta e seu cosseno."""
+        vector = _normalize(np.asarray([self._embedding.embed_query(query)], dtype=np.float32))[0]
+        return [
+            (Document(page_content=self._texts[i], metadata=self._metadatas[i], id=self._ids[i]), score)
+            for i, score in self._search(vector, k, filter)
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Cosseno -> escala de relevância do Chroma (1 - distância L2² / √2)
+        return lambda cosine: min(1.0, max(0.0, 1.0 - (2.0 - 2.0 * cosine) / math.sqrt(2)))
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   *, persist_directory: str, **kwargs: Any) -> "FaissMemoryStore":
+        store = cls(persist_directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._texts), "index": self._kind, "dim": self._dim,
+                    "snapshot_entries": self._snapshot_at}
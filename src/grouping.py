@@ -0,0 +1,224 @@
+# src/grouping.py
+# Agrupamentos com saída limitada: binning automático de chaves contínuas e agregação em chunks
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from utils import logger
+
+# Máximo de grupos de uma série temporal (pontos do gráfico)
+GROUP_TIME_POINTS = int(os.getenv("GROUP_TIME_POINTS", "500"))
+# Máximo de categorias por eixo de uma tabela cruzada
+GROUP_CROSSTAB_MAX_KEYS = int(os.getenv("GROUP_CROSSTAB_MAX_KEYS", "20"))
+# Máximo de células devolvidas numa tabela cruzada densa; acima disso, só os pares mais frequentes
+GROUP_MAX_CELLS = int(os.getenv("GROUP_MAX_CELLS", "400"))
+GROUP_TOP_PAIRS = int(os.getenv("GROUP_TOP_PAIRS", "50"))
+GROUP_CHUNK_ROWS = int(os.getenv("GROUP_CHUNK_ROWS", "1000000"))
+
+OTHER_LABEL = "outros"
+# Frequências fixas (aceitas por Series.dt.floor), da mais fina à mais grossa
+_TIME_FREQS = ["1s", "1min", "5min", "15min", "1h", "6h", "1D", "7D", "30D", "90D", "365D"]
+# Pares (a, b) acima disso usam contagem por hash (np.unique) em vez de bincount denso
+_DENSE_PAIR_LIMIT = 10_000_000
+
+
+@dataclass
+class BinnedKey:
+    """Chave de agrupamento discretizada: código por linha (-1 = ausente) e rótulos."""
+    codes: np.ndarray
+    labels: List[Any]
+    how: str
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.labels)
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.4g}"
+
+
+def bin_key(series: pd.Series, max_groups: int, method: str = "width",
+            quantiles: Optional[np.ndarray] = None) -> BinnedKey:
+    """
+    Discretiza uma coluna em no máximo `max_groups` grupos.
+
+    - Poucos valores distintos: grupos exatos (sem perda).
+    - Datas: reamostragem na menor frequência fixa que caiba no limite.
+    - Numéricas: bins de largura igual (`width`, bom para eixos de tempo) ou
+      por quantis (`quantile`, grupos de tamanho parecido).
+    - Categóricas: as `max_groups - 1` mais frequentes + "outros".
+
+    Args:
+        series: Coluna a discretizar
+        max_groups: Número máximo de grupos
+        method: "width" ou "quantile" (só para numéricas de alta cardinalidade)
+        quantiles: Bordas de quantis já calculadas (ex.: do perfil), opcional
+
+    Returns:
+        BinnedKey
+    """
+    nunique = series.nunique(dropna=True)
+    if nunique <= max_groups:
+        codes, uniques = pd.factorize(series, sort=True)
+        return BinnedKey(codes=codes.astype(np.int64), labels=list(uniques), how="exact")
+
+    if is_datetime64_any_dtype(series):
+        span = series.max() - series.min()
+        freq = next((f for f in _TIME_FREQS if span / pd.Timedelta(f) < max_groups), _TIME_FREQS[-1])
+        codes, uniques = pd.factorize(series.dt.floor(freq), sort=True)
+        return BinnedKey(codes=codes.astype(np.int64), labels=list(uniques), how=f"resample:{freq}")
+
+    if is_numeric_dtype(series):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(values)
+        if method == "quantile":
+            edges = quantiles if quantiles is not None else np.nanquantile(values, np.linspace(0, 1, max_groups + 1))
+            edges = np.unique(edges)
+            codes = np.searchsorted(edges[1:-1], values, side="right").astype(np.int64)
+            labels = [f"[{_fmt(lo)}, {_fmt(hi)}{']' if i == len(edges) - 2 else ')'}"
+                      for i, (lo, hi) in enumerate(zip(edges[:-1], edges[1:]))]
+            how = f"quantile:{len(labels)}"
+        else:
+            vmin, vmax = np.nanmin(values), np.nanmax(values)
+            width = (vmax - vmin) / max_groups or 1.0
+            codes = np.minimum(((values - vmin) / width).astype(np.int64, copy=False), max_groups - 1)
+            labels = [float(vmin + (i + 0.5) * width) for i in range(max_groups)]
+            how = f"width:{_fmt(width)}"
+        codes[~valid] = -1
+        return BinnedKey(codes=codes, labels=labels, how=how)
+
+    # Categóricas de alta cardinalidade: top-N + "outros"
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Categorical não aceita o rótulo "outros" (dtype criado por optimize_dtypes)
+        series = series.astype(object)
+    top = series.value_counts().index[:max_groups - 1]
+    codes, uniques = pd.factorize(series.where(series.isin(top), OTHER_LABEL).where(series.notna()), sort=True)
+    return BinnedKey(codes=codes.astype(np.int64), labels=list(uniques), how=f"top:{len(top)}")
+
+
+def aggregate(key: BinnedKey, values: pd.Series, agg: str = "mean",
+              chunk_rows: int = GROUP_CHUNK_ROWS) -> pd.Series:
+    """
+    Agrega `values` pelos grupos de `key`, processando as linhas em chunks.
+
+    mean/sum/count/std/min/max são acumulados por chunk (bincount), sem
+    materializar o groupby; outras agregações usam groupby sobre os códigos.
+
+    Returns:
+        Série indexada pelos rótulos dos grupos não vazios
+    """
+    n = key.n_groups
+    if agg not in ("mean", "sum", "count", "std", "var", "min", "max"):
+        grouped = values.groupby(key.codes).agg(agg)
+        grouped = grouped[grouped.index >= 0]
+        return pd.Series(grouped.to_numpy(), index=[key.labels[i] for i in grouped.index])
+
+    data = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    counts = np.zeros(n)
+    sums = np.zeros(n)
+    sumsq = np.zeros(n)
+    mins = np.full(n, np.inf)
+    maxs = np.full(n, -np.inf)
+    for start in range(0, data.size, chunk_rows):
+        codes = key.codes[start:start + chunk_rows]
+        chunk = data[start:start + chunk_rows]
+        mask = (codes >= 0) & ~np.isnan(chunk)
+        codes, chunk = codes[mask], chunk[mask]
+        counts += np.bincount(codes, minlength=n)
+        if agg in ("mean", "sum", "std", "var"):
+            sums += np.bincount(codes, weights=chunk, minlength=n)
+        if agg in ("std", "var"):
+            sumsq += np.bincount(codes, weights=chunk * chunk, minlength=n)
+        if agg == "min":
+            np.minimum.at(mins, codes, chunk)
+        if agg == "max":
+            np.maximum.at(maxs, codes, chunk)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if agg == "mean":
+            result = sums / counts
+        elif agg == "sum":
+            result = sums
+        elif agg == "count":
+            result = counts
+        elif agg in ("std", "var"):
+            result = np.maximum(sumsq - sums ** 2 / counts, 0) / (counts - 1)
+            result = np.sqrt(result) if agg == "std" else result
+        elif agg == "min":
+            result = mins
+        else:
+            result = maxs
+    present = counts > 0
+    return pd.Series(result[present], index=[label for label, p in zip(key.labels, present) if p])
+
+
+def group_counts(key: BinnedKey) -> pd.Series:
+    """Número de linhas por grupo (grupos não vazios)."""
+    counts = np.bincount(key.codes[key.codes >= 0], minlength=key.n_groups)
+    present = counts > 0
+    return pd.Series(counts[present], index=[label for label, p in zip(key.labels, present) if p])
+
+
+def crosstab(a: BinnedKey, b: BinnedKey, max_cells: int = GROUP_MAX_CELLS,
+             top_pairs: int = GROUP_TOP_PAIRS, chunk_rows: int = GROUP_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Tabela cruzada com tamanho de saída limitado.
+
+    Conta apenas pares presentes: bincount sobre o id do par quando o espaço
+    de pares é pequeno, contagem por hash (np.unique por chunk) quando é grande.
+    Se a tabela densa tiver até `max_cells` células, ela é devolvida no
+    formato de pd.crosstab(...).to_json(); senão, só os pares mais frequentes.
+
+    Returns:
+        Dict com "table" ou "top_pairs", além de "cells" e "truncated"
+    """
+    na, nb = a.n_groups, b.n_groups
+    pair_totals: Dict[int, int] = {}
+    dense = np.zeros(na * nb, dtype=np.int64) if na * nb <= _DENSE_PAIR_LIMIT else None
+    for start in range(0, a.codes.size, chunk_rows):
+        ca = a.codes[start:start + chunk_rows]
+        cb = b.codes[start:start + chunk_rows]
+        mask = (ca >= 0) & (cb >= 0)
+        pair_ids = ca[mask] * nb + cb[mask]
+        if dense is not None:
+            dense += np.bincount(pair_ids, minlength=na * nb)
+        else:
+            ids, counts = np.unique(pair_ids, return_counts=True)
+            for pair_id, count in zip(ids.tolist(), counts.tolist()):
+                pair_totals[pair_id] = pair_totals.get(pair_id, 0) + count
+
+    if dense is not None:
+        nonzero = np.flatnonzero(dense)
+        pair_ids, pair_counts = nonzero, dense[nonzero]
+    else:
+        pair_ids = np.fromiter(pair_totals.keys(), dtype=np.int64, count=len(pair_totals))
+        pair_counts = np.fromiter(pair_totals.values(), dtype=np.int64, count=len(pair_totals))
+
+    rows_present = np.unique(pair_ids // nb)
+    cols_present = np.unique(pair_ids % nb)
+    cells = int(rows_present.size * cols_present.size)
+    result: Dict[str, Any] = {"cells": cells, "nonzero_cells": int(pair_ids.size), "truncated": cells > max_cells}
+
+    if cells <= max_cells:
+        # Só linhas/colunas presentes: a matriz cabe no limite de células
+        values = np.zeros((rows_present.size, cols_present.size), dtype=np.int64)
+        values[np.searchsorted(rows_present, pair_ids // nb),
+               np.searchsorted(cols_present, pair_ids % nb)] = pair_counts
+        result["table"] = {
+            str(b.labels[col]): {str(a.labels[row]): int(values[i, j]) for i, row in enumerate(rows_present)}
+            for j, col in enumerate(cols_present)
+        }
+    else:
+        order = np.argsort(pair_counts)[::-1][:top_pairs]
+        result["top_pairs"] = [
+            {"a": str(a.labels[pair_ids[i] // nb]), "b": str(b.labels[pair_ids[i] % nb]), "count": int(pair_counts[i])}
+            for i in order
+        ]
+        logger.info(f"Crosstab truncated: {cells} cells > {max_cells}, returning top {len(order)} pairs")
+    return result
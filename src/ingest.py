@@ -0,0 +1,137 @@
+# src/ingest.py
+# Otimização de tipos na ingestão: downcast numérico, categorias e datas
+
+import os
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_integer_dtype, is_object_dtype
+
+from utils import logger
+
+INGEST_OPTIMIZE = os.getenv("INGEST_OPTIMIZE", "1").lower() in ("1", "true", "yes", "sim")
+INGEST_FLOAT32 = os.getenv("INGEST_FLOAT32", "1").lower() in ("1", "true", "yes", "sim")
+INGEST_CATEGORY_MAX_RATIO = float(os.getenv("INGEST_CATEGORY_MAX_RATIO", "0.5"))
+
+# Inteiros acima de 2**24 não são representados exatamente em float32
+_FLOAT32_EXACT_INT = 2**24
+_FLOAT32_MAX = float(np.finfo(np.float32).max)
+_DATE_SAMPLE_SIZE = 100
+
+
+def _downcast_integer(series: pd.Series) -> pd.Series:
+    """Converte para o menor inteiro (com ou sem sinal) que comporta os valores."""
+    if series.empty:
+        return series
+    kind = "unsigned" if series.min() >= 0 else "integer"
+    return pd.to_numeric(series, downcast=kind)
+
+
+def _downcast_float(series: pd.Series) -> pd.Series:
+    """
+    Converte float64 para float32 quando seguro.
+
+    Mantém float64 se houver valores fora do range de float32 ou se a coluna
+    for inteira (ex.: IDs com NaN) com magnitude acima de 2**24.
+    """
+    if not INGEST_FLOAT32 or series.dtype != np.float64:
+        return series
+
+    values = series.to_numpy()
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return series.astype(np.float32)
+
+    max_abs = float(np.abs(finite).max())
+    if max_abs > _FLOAT32_MAX:
+        return series
+    if max_abs >= _FLOAT32_EXACT_INT and np.all(np.mod(finite, 1) == 0):
+        return series
+    return series.astype(np.float32)
+
+
+def _looks_like_dates(series: pd.Series) -> bool:
+    """Testa uma amostra de valores de texto para decidir se a coluna é de datas."""
+    sample = series.dropna().head(_DATE_SAMPLE_SIZE).astype(str)
+    if sample.empty:
+        return False
+    # Datas têm dígitos e separadores; evita converter textos curtos/códigos
+    if not sample.str.contains(r"\d").all() or not sample.str.contains(r"[-/:]").all():
+        return False
+    parsed = pd.to_datetime(sample, errors="coerce", format="mixed")
+    return parsed.notna().mean() >= 0.9
+
+
+def _parse_dates(series: pd.Series) -> Optional[pd.Series]:
+    """Converte a coluna inteira para datetime, ou None se algum valor não nulo não for data."""
+    parsed = pd.to_datetime(series, errors="coerce", format="mixed")
+    lost = int(parsed.isna().sum() - series.isna().sum())
+    if lost > 0:
+        logger.info(f"Column {series.name} kept as text: {lost} values are not dates")
+        return None
+    return parsed
+
+
+def optimize_dtypes(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Reduz a memória de um DataFrame recém-carregado.
+
+    - Inteiros: menor tipo com ou sem sinal (int8, uint16, ...)
+    - Floats: float32 quando não há perda de range/inteiros exatos
+    - Textos com datas: datetime64, só se todos os valores não nulos forem datas
+    - Textos de baixa cardinalidade: category
+
+    Args:
+        df: DataFrame com os tipos padrão do pandas
+
+    Returns:
+        Tupla (DataFrame otimizado, relatório de memória antes/depois)
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    converted: Counter = Counter()
+    columns = {}
+
+    for col in df.columns:
+        series = df[col]
+        old_dtype = str(series.dtype)
+        try:
+            if is_integer_dtype(series.dtype):
+                new = _downcast_integer(series)
+            elif is_float_dtype(series.dtype):
+                new = _downcast_float(series)
+            elif is_object_dtype(series.dtype):
+                dates = _parse_dates(series) if _looks_like_dates(series) else None
+                if dates is not None:
+                    new = dates
+                elif len(series) and series.nunique(dropna=True) / len(series) <= INGEST_CATEGORY_MAX_RATIO:
+                    new = series.astype("category")
+                else:
+                    new = series
+            else:
+                new = series
+        except Exception as e:
+            logger.warning(f"Could not optimize column {col}: {e}")
+            new = series
+
+        new_dtype = str(new.dtype)
+        if new_dtype != old_dtype:
+            columns[col] = new
+            converted[f"{old_dtype}->{new_dtype}"] += 1
+
+    if columns:
+        df = df.assign(**columns)
+
+    after = int(df.memory_usage(deep=True).sum())
+    report = {
+        "before_mb": round(before / 1024**2, 2),
+        "after_mb": round(after / 1024**2, 2),
+        "reduction_pct": round((1 - after / before) * 100, 1) if before else 0.0,
+        "converted": dict(converted),
+    }
+    logger.info(
+        f"Ingest optimized: {report['before_mb']} MB -> {report['after_mb']} MB "
+        f"({report['reduction_pct']}% less), {sum(converted.values())} columns converted"
+    )
+    return df, report
@@ -0,0 +1,209 @@
+# src/llm_cache.py
+# Cache de respostas do LLM em SQLite: mesma chamada (provedor, modelo, prompt) com temperature=0 não vai à API
+
+import os
+import time
+import sqlite3
+import hashlib
+import warnings
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from observations import count_tokens
+from utils import logger
+
+LLM_CACHE = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite")
+# Validade das respostas em segundos (0 = sem expiração)
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Tamanho máximo das respostas armazenadas; acima disso as menos usadas saem
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used);
+"""
+
+
+def _usage_tokens(generations: Sequence[Any], prompt: str) -> int:
+    """Tokens da chamada: usage reportado pelo provedor ou estimativa pelo texto."""
+    total = 0
+    for generation in generations:
+        usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+        if usage:
+            total += usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    return total or count_tokens(prompt) + sum(count_tokens(g.text) for g in generations)
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Cache de respostas do LLM em disco, para um provedor/modelo.
+
+    A chave é o hash de (provedor, modelo, parâmetros da chamada, prompt):
+    com temperature=0 a mesma chamada devolve a mesma resposta, então perguntas
+    repetidas, passos ReAct idênticos e a conclusão final de um histórico já
+    visto não chamam a API. Entradas expiram após `ttl` segundos e, acima de
+    `max_mb`, as usadas há mais tempo são removidas. Cada acerto soma a
+    latência e os tokens da chamada original aos contadores de economia.
+    """
+
+    def __init__(self, provider: str, model: str, path: str = LLM_CACHE_PATH,
+                 ttl: float = LLM_CACHE_TTL, max_mb: float = LLM_CACHE_MAX_MB):
+        self.provider = provider
+        self.model = model
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024**2)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        # Início de cada chamada que não acertou o cache, para medir sua latência
+        self._pending: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{self.provider}\0{self.model}\0{llm_string}\0{prompt}".encode()).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        start = time.perf_counter()
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, tokens, latency, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[3] > self.ttl:
+                self._delete(key)
+                row = None
+            if row is None:
+                self.misses += 1
+                self._pending[key] = start
+                if len(self._pending) > 1024:
+                    # Chamadas que falharam nunca chegam ao update
+                    self._pending.pop(next(iter(self._pending)))
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        try:
+            with warnings.catch_warnings():
+                # langchain_core.load.loads ainda é marcado como beta
+                warnings.simplefilter("ignore")
+                generations = loads(row[0])
+        except Exception as e:
+            logger.warning(f"LLM cache entry unreadable, ignoring: {e}")
+            return None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.hits += 1
+            self.hit_seconds += elapsed
+            self.saved_seconds += row[2]
+            self.saved_tokens += row[1]
+        logger.info(f"LLM cache hit ({self.provider}/{self.model}) in {elapsed * 1000:.1f} ms, "
+                    f"saved {row[2]:.2f} s and {row[1]} tokens")
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        try:
+            response = dumps(list(return_val))
+        except Exception as e:
+            logger.warning(f"LLM response not cacheable: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            started = self._pending.pop(key, None)
+            latency = time.perf_counter() - started if started is not None else 0.0
+            tokens = _usage_tokens(return_val, prompt)
+            self._delete(key)
+            self._conn.execute(
+                "INSERT INTO llm_cache (key, provider, model, response, size, tokens, latency, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, self.provider, self.model, response, len(response), tokens, latency, now, now))
+            self._size += len(response)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _delete(self, key: str) -> None:
+        row = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._size -= row[0]
+
+    def _evict(self) -> None:
+        """Remove expiradas e, se preciso, as menos usadas até 90% do limite."""
+        if self.ttl:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        target = int(self.max_bytes * 0.9)
+        size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        evicted = 0
+        for key, entry_size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used").fetchall():
+            if size <= target:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            size -= entry_size
+            evicted += 1
+        self._size = size
+        logger.info(f"LLM cache evicted {evicted} entries ({size / 1024**2:.1f} MB kept)")
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE provider = ? AND model = ?", (self.provider, self.model))
+            self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            self._conn.commit()
+            self._pending.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Acertos, latência média de um acerto e latência/tokens economizados."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "size_mb": round(self._size / 1024**2, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "avg_hit_ms": round(self.hit_seconds / self.hits * 1000, 2) if self.hits else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2),
+                "saved_tokens": self.saved_tokens,
+            }
+
+
+_llm_caches: Dict[tuple, SQLiteLLMCache] = {}
+_llm_caches_lock = threading.Lock()
+
+
+def get_llm_cache(provider: str, model: str) -> Optional[SQLiteLLMCache]:
+    """Cache do provedor/modelo, compartilhado pelo processo (None com LLM_CACHE=0)."""
+    if not LLM_CACHE:
+        return None
+    with _llm_caches_lock:
+        cache = _llm_caches.get((provider, model))
+        if cache is None:
+            try:
+                cache = _llm_caches[(provider, model)] = SQLiteLLMCache(provider, model)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache unavailable: {e}")
+                return None
+        return cache
@@ -1,19 +1,234 @@
 # src/memory_store.py
 import os
-from langchain.memory import ConversationBufferMemory
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-
-def init_memory(chroma_persist_dir="chroma_store"):
-    # Conversation buffer for short-term
-    buffer = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-
-    # Vectorstore for long-term memory (requires embeddings)
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        # fallback: no embeddings available; return only buffer
-        return {"buffer": buffer, "vectorstore": None}
-    embeddings = OpenAIEmbeddings(openai_api_key=api_key)
-    vect = Chroma(persist_directory=chroma_persist_dir, embedding_function=embeddings)
-    return {"buffer": buffer, "vectorstore": vect}
+import re
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
+from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryBufferMemory
+from langchain_core.messages import BaseMessage, get_buffer_string
+from pydantic import PrivateAttr
+
+from embeddings import EMBEDDINGS_BATCH_SIZE, backend_id, get_embeddings, resolve_backend
+from observations import ReferenceStore, count_tokens, observation_encoder
+from utils import logger
+
+CHROMA_PERSIST_DIR = "chroma_store"
+
+# chroma | faiss (índice FAISS persistido em <persist_dir>/faiss-<coleção>)
+MEMORY_VECTOR_BACKEND = os.getenv("MEMORY_VECTOR_BACKEND", "chroma")
+
+# Orçamento de tokens das mensagens mantidas na íntegra; as mais antigas viram resumo
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "1500"))
+# Sem LLM para resumir: janela das últimas N trocas
+MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", "6"))
+# Blocos JSON maiores que isso são guardados por referência (handle), não por valor
+MEMORY_INLINE_CHARS = int(os.getenv("MEMORY_INLINE_CHARS", "300"))
+MEMORY_SUMMARY_ASYNC = os.getenv("MEMORY_SUMMARY_ASYNC", "1") == "1"
+# Espera máxima (s) para juntar gravações no vectorstore num único lote
+MEMORY_WRITE_INTERVAL = float(os.getenv("MEMORY_WRITE_INTERVAL", "0.5"))
+
+_JSON_BLOCK = re.compile(r"```json\s*(.*?)```", re.DOTALL)
+
+# Resumos rodam em série (cada um parte do anterior), fora do caminho da resposta
+_summary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+
+_vectorstores = {}
+_vectorstores_lock = threading.Lock()
+
+
+def get_vectorstore(persist_dir=CHROMA_PERSIST_DIR):
+    """Vectorstore de memória de longo prazo (um por diretório, compartilhado pelo processo).
+
+    Cada espaço de embeddings usa sua própria coleção (dimensões diferentes
+    não se misturam); OpenAI mantém a coleção padrão já persistida.
+    MEMORY_VECTOR_BACKEND escolhe entre Chroma e FAISS.
+
+    Returns:
+        Chroma ou FaissMemoryStore, ou None se não houver embeddings ou o backend não estiver instalado
+    """
+    with _vectorstores_lock:
+        if persist_dir in _vectorstores:
+            return _vectorstores[persist_dir]
+
+        embeddings = get_embeddings()
+        vect = None
+        if embeddings is not None:
+            backend = resolve_backend()
+            collection = "langchain" if backend == "openai" else f"memory-{backend_id(backend)}"
+            try:
+                if MEMORY_VECTOR_BACKEND == "faiss":
+                    from faiss_store import FaissMemoryStore
+                    vect = FaissMemoryStore(os.path.join(persist_dir, f"faiss-{collection}"), embeddings)
+                else:
+                    from langchain_community.vectorstores import Chroma
+                    vect = Chroma(persist_directory=persist_dir, embedding_function=embeddings,
+                                  collection_name=collection)
+            except ImportError as e:
+                logger.warning(f"Vectorstore unavailable: {e}")
+        _vectorstores[persist_dir] = vect
+        return vect
+
+
+class VectorstoreWriter:
+    """
+    Gravações no vectorstore em lote, numa thread de fundo.
+
+    `add` só enfileira; o worker junta até `batch_size` textos (ou o que
+    chegar em `flush_interval` segundos) e grava tudo com um único
+    `add_texts`, ou seja, um único lote de embeddings.
+    """
+
+    def __init__(self, vectorstore, batch_size: int = EMBEDDINGS_BATCH_SIZE,
+                 flush_interval: float = MEMORY_WRITE_INTERVAL):
+        self.vectorstore = vectorstore
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._worker.start()
+
+    def add(self, text: str, metadata: Dict[str, Any]) -> None:
+        self._queue.put((text, metadata))
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Espera as gravações pendentes."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size or waiters:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                start = time.perf_counter()
+                try:
+                    self.vectorstore.add_texts([text for text, _ in batch],
+                                               metadatas=[metadata for _, metadata in batch])
+                    logger.info(f"Memory writer stored {len(batch)} entries "
+                                f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+                except Exception as e:
+                    logger.error(f"Memory write failed ({len(batch)} entries): {e}")
+            for waiter in waiters:
+                waiter.set()
+
+
+_writers: Dict[int, VectorstoreWriter] = {}
+
+
+def get_vectorstore_writer(vectorstore) -> VectorstoreWriter:
+    """Writer em lote do vectorstore (um por instância)."""
+    with _vectorstores_lock:
+        writer = _writers.get(id(vectorstore))
+        if writer is None:
+            writer = _writers[id(vectorstore)] = VectorstoreWriter(vectorstore)
+        return writer
+
+
+def compact_output(text: str, store: ReferenceStore) -> str:
+    """Troca blocos JSON grandes (resultados de tools) por uma referência buscável guardada em `store`."""
+    def replace(match):
+        block = match.group(1).strip()
+        if len(block) <= MEMORY_INLINE_CHARS:
+            return match.group(0)
+        handle = observation_encoder.stash("memory", block, store)
+        return f"[resultado omitido ({len(block)} caracteres): fetch_observation handle={handle}]"
+    return _JSON_BLOCK.sub(replace, text) if isinstance(text, str) else text
+
+
+def history_tokens(messages: List[BaseMessage]) -> int:
+    return count_tokens(get_buffer_string(messages))
+
+
+class BoundedSummaryMemory(ConversationSummaryBufferMemory):
+    """
+    Histórico com orçamento de tokens: janela recente + resumo incremental.
+
+    As mensagens mais recentes ficam na íntegra até `max_token_limit`; as que
+    saem da janela são resumidas pelo LLM (numa thread de fundo, sem atrasar
+    a resposta) e o resumo entra como primeira mensagem do histórico.
+    Resultados de tools nas respostas são guardados por referência num
+    `ReferenceStore` da própria memória (não expiram enquanto ela existir).
+    `last_prompt_tokens` registra o tamanho do histórico enviado no último turno.
+    """
+
+    last_prompt_tokens: int = 0
+    _references: ReferenceStore = PrivateAttr(default_factory=ReferenceStore)
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        variables = super().load_memory_variables(inputs)
+        history = variables[self.memory_key]
+        self.last_prompt_tokens = (history_tokens(history) if isinstance(history, list)
+                                   else count_tokens(history))
+        return variables
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        outputs = {key: compact_output(value, self._references) for key, value in outputs.items()}
+        super().save_context(inputs, outputs)
+
+    def prune(self) -> None:
+        """Tira da janela as mensagens acima do orçamento e agenda o resumo delas."""
+        buffer = self.chat_memory.messages
+        pruned = []
+        while len(buffer) > 1 and history_tokens(buffer) > self.max_token_limit:
+            pruned.append(buffer.pop(0))
+        # A janela começa sempre numa pergunta (sem resposta órfã)
+        while pruned and len(buffer) > 1 and buffer[0].type == "ai":
+            pruned.append(buffer.pop(0))
+        if not pruned:
+            return
+        logger.info(f"Memory pruned {len(pruned)} messages ({len(buffer)} kept in window)")
+        if MEMORY_SUMMARY_ASYNC:
+            _summary_pool.submit(self._summarize, pruned)
+        else:
+            self._summarize(pruned)
+
+    def _summarize(self, messages: List[BaseMessage]) -> None:
+        try:
+            self.moving_summary_buffer = self.predict_new_summary(messages, self.moving_summary_buffer)
+        except Exception as e:
+            # Sem resumo, o histórico perde essas mensagens mas continua limitado
+            logger.error(f"Memory summarization failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "messages": len(self.chat_memory.messages),
+            "window_tokens": history_tokens(self.chat_memory.messages),
+            "summary_tokens": count_tokens(self.moving_summary_buffer),
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "references": len(self._references),
+        }
+
+
+def memory_context(memory) -> str:
+    """Histórico (resumo + janela) como texto, para prompts fora do agente."""
+    history = memory.load_memory_variables({}).get(memory.memory_key, "")
+    return get_buffer_string(history) if isinstance(history, list) else str(history)
+
+
+def init_memory(chroma_persist_dir=CHROMA_PERSIST_DIR, llm=None):
+    # Short-term memory with a token budget (summary + window) or a plain turn window without an LLM
+    if llm is not None:
+        buffer = BoundedSummaryMemory(llm=llm, memory_key="chat_history", return_messages=True,
+                                      max_token_limit=MEMORY_MAX_TOKENS)
+    else:
+        buffer = ConversationBufferWindowMemory(memory_key="chat_history", return_messages=True,
+                                                k=MEMORY_WINDOW_TURNS)
+
+    # Vectorstore for long-term memory (requires embeddings); None means buffer only
+    return {"buffer": buffer, "vectorstore": get_vectorstore(chroma_persist_dir)}
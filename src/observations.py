@@ -0,0 +1,345 @@
+# src/observations.py
+# Codificador de observações: resultados das tools compactados antes de entrarem no prompt do agente
+
+import os
+import json
+import math
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.tools import Tool
+
+from dataset_store import get_current_session
+from utils import parse_tool_params, get_param, logger
+
+OBSERVATION_ENCODER = os.getenv("OBSERVATION_ENCODER", "1") == "1"
+# Orçamento de tokens de cada observação
+OBSERVATION_MAX_TOKENS = int(os.getenv("OBSERVATION_MAX_TOKENS", "600"))
+# Casas decimais mantidas nos floats (inteiros e magnitudes nunca mudam)
+OBSERVATION_FLOAT_DIGITS = int(os.getenv("OBSERVATION_FLOAT_DIGITS", "4"))
+# Itens mantidos por lista/dicionário; o resto fica acessível por handle
+OBSERVATION_TOP_K = int(os.getenv("OBSERVATION_TOP_K", "10"))
+OBSERVATION_MAX_STASHES = int(os.getenv("OBSERVATION_MAX_STASHES", "128"))
+# approx (~4 caracteres por token) ou tiktoken
+OBSERVATION_TOKENIZER = os.getenv("OBSERVATION_TOKENIZER", "approx")
+
+FETCH_TOOL_NAME = "fetch_observation"
+# Schema do dataset: listas/dicionários por coluna nunca são truncados (estão em ordem de coluna, não de relevância)
+_UNTRUNCATED_KEYS = frozenset({"columns", "dtypes", "column_types", "missing_values"})
+_UNTRUNCATED_TOOLS = frozenset({"schema", "describe"})
+_TEXT_CHUNK_CHARS = 1000
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens de um texto (tiktoken se configurado e disponível; senão ~4 caracteres por token)."""
+    global _encoding
+    if OBSERVATION_TOKENIZER == "tiktoken":
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"tiktoken unavailable, using approximate token counts: {e}")
+                _encoding = False
+        if _encoding:
+            return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _round(value: float, digits: int) -> float:
+    """Arredonda só a parte fracionária; valores menores que 10^-digits mantêm `digits` dígitos significativos."""
+    if not math.isfinite(value) or value.is_integer():
+        return value
+    rounded = round(value, digits)
+    return rounded if rounded != 0 else float(f"{value:.{digits}g}")
+
+
+class ReferenceStore:
+    """
+    Textos guardados por referência fora do LRU de observações.
+
+    Pertence a quem guardou (ex.: a memória da conversa) e vive enquanto o dono
+    existir: o codificador só mantém uma referência fraca por sessão, então os
+    handles citados no histórico não expiram com o tráfego das tools.
+    """
+
+    def __init__(self):
+        self._texts: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, handle: str, chunks: List[str]) -> None:
+        with self._lock:
+            self._texts[handle] = chunks
+
+    def get(self, handle: str) -> Optional[List[str]]:
+        with self._lock:
+            return self._texts.get(handle)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._texts)
+
+
+class ObservationEncoder:
+    """
+    Reduz o tamanho das observações mantendo o que o LLM precisa.
+
+    Floats têm a parte fracionária arredondada; listas e dicionários grandes
+    ficam com os primeiros `top_k` itens e um marcador `_more` com o total
+    omitido e um handle; a tool `fetch_observation` devolve o restante sob
+    demanda. Se a observação ainda passa do orçamento, `top_k` é reduzido até
+    caber. O schema do dataset (resultados de `schema`/`describe` e chaves
+    como `columns` e `dtypes`) fica sempre completo: está em ordem de coluna,
+    e cortá-lo esconderia do agente as colunas que ele precisa escolher.
+
+    Os handles valem só na sessão que os criou; os das observações ficam num
+    LRU de `max_stashes` entradas e os guardados com `stash` num
+    `ReferenceStore` do chamador.
+    """
+
+    def __init__(self, max_tokens: int = OBSERVATION_MAX_TOKENS, top_k: int = OBSERVATION_TOP_K,
+                 digits: int = OBSERVATION_FLOAT_DIGITS, max_stashes: int = OBSERVATION_MAX_STASHES):
+        self.max_tokens = max_tokens
+        self.top_k = top_k
+        self.digits = digits
+        self.max_stashes = max_stashes
+        # (sessão, handle) -> dados omitidos
+        self._stashes: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+        self._references: "weakref.WeakValueDictionary[str, ReferenceStore]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.raw_tokens = 0
+        self.encoded_tokens = 0
+
+    # ---- Formatação ------------------------------------------------------
+
+    def _shape(self, data: Any, top_k: int, path: str, seed: str, stashes: Dict[str, Any],
+               keep_all: bool = False) -> Any:
+        """Arredonda e trunca recursivamente; partes truncadas são registradas em `stashes`."""
+        if isinstance(data, float):
+            return _round(data, self.digits)
+        if isinstance(data, dict):
+            items = list(data.items())
+            limit = len(items) if keep_all else top_k
+            shaped = {k: self._shape(v, top_k, f"{path}.{k}", seed, stashes, keep_all or k in _UNTRUNCATED_KEYS)
+                      for k, v in items[:limit]}
+            if len(items) > limit:
+                shaped["_more"] = self._marker(data, len(items) - limit, path, seed, stashes)
+            return shaped
+        if isinstance(data, list):
+            limit = len(data) if keep_all else top_k
+            shaped = [self._shape(v, top_k, f"{path}[{i}]", seed, stashes, keep_all)
+                      for i, v in enumerate(data[:limit])]
+            if len(data) > limit:
+                shaped.append({"_more": self._marker(data, len(data) - limit, path, seed, stashes)})
+            return shaped
+        return data
+
+    def _marker(self, data: Any, omitted: int, path: str, seed: str, stashes: Dict[str, Any]) -> Dict[str, Any]:
+        handle = hashlib.sha1(f"{seed}{path}".encode()).hexdigest()[:10]
+        stashes[handle] = data
+        return {"omitted": omitted, "handle": handle, "offset": len(data) - omitted}
+
+    def _collapse(self, data: Dict[str, Any], seed: str, stashes: Dict[str, Any]) -> Dict[str, Any]:
+        """Último recurso: mantém só os valores escalares; contêineres viram handles."""
+        collapsed = {}
+        for key, value in data.items():
+            if key in _UNTRUNCATED_KEYS:
+                collapsed[key] = self._shape(value, 1, f".{key}", seed, stashes, keep_all=True)
+            elif isinstance(value, (dict, list)):
+                collapsed[key] = {"_more": self._marker(value, len(value), f".{key}", seed, stashes)}
+            else:
+                collapsed[key] = self._shape(value, 1, f".{key}", seed, stashes)
+        return collapsed
+
+    def _fit(self, data: Any, seed: str, keep_all: bool = False) -> Tuple[str, Dict[str, Any]]:
+        """Serializa `data` dentro do orçamento, reduzindo top_k se necessário."""
+        if keep_all:
+            stashes: Dict[str, Any] = {}
+            return _dumps(self._shape(data, self.top_k, "", seed, stashes, keep_all=True)), stashes
+        top_k = self.top_k
+        while True:
+            stashes: Dict[str, Any] = {}
+            text = _dumps(self._shape(data, top_k, "", seed, stashes))
+            if count_tokens(text) <= self.max_tokens or top_k == 1:
+                break
+            top_k = max(1, top_k // 2)
+        if count_tokens(text) > self.max_tokens and isinstance(data, dict):
+            stashes = {}
+            text = _dumps(self._collapse(data, seed, stashes))
+        return text, stashes
+
+    def _fit_text(self, text: str, seed: str) -> Tuple[str, Dict[str, Any]]:
+        """Texto livre (ex.: conclusão em Markdown): corta no orçamento e guarda o resto em blocos."""
+        if count_tokens(text) <= self.max_tokens:
+            return text, {}
+        chunks = [text[i:i + _TEXT_CHUNK_CHARS] for i in range(0, len(text), _TEXT_CHUNK_CHARS)]
+        stashes: Dict[str, Any] = {}
+        marker = self._marker(chunks, len(chunks) - 1, "", seed, stashes)
+        head = chunks[0]
+        while count_tokens(head) > self.max_tokens:
+            head = head[:len(head) // 2]
+        return f"{head}\n[... {marker['omitted']} blocos omitidos: {FETCH_TOOL_NAME} handle={marker['handle']}, offset={marker['offset']}]", stashes
+
+    # ---- API -------------------------------------------------------------
+
+    def encode(self, name: str, result: str) -> str:
+        """
+        Compacta o resultado de uma tool para o prompt do agente.
+
+        Args:
+            name: Nome da tool
+            result: String retornada pela tool (JSON ou texto)
+
+        Returns:
+            Observação compactada
+        """
+        if not isinstance(result, str) or not result:
+            return result
+        seed = hashlib.sha1(f"{name}:{result}".encode()).hexdigest()
+        try:
+            data = json.loads(result)
+        except ValueError:
+            data = None
+        if isinstance(data, (dict, list)):
+            text, stashes = self._fit(data, seed, keep_all=name in _UNTRUNCATED_TOOLS)
+        else:
+            text, stashes = self._fit_text(result, seed)
+
+        raw_tokens, encoded_tokens = count_tokens(result), count_tokens(text)
+        session = get_current_session()
+        with self._lock:
+            for handle, value in stashes.items():
+                self._stashes[(session, handle)] = value
+                self._stashes.move_to_end((session, handle))
+            while len(self._stashes) > self.max_stashes:
+                self._stashes.popitem(last=False)
+            self.calls += 1
+            self.raw_tokens += raw_tokens
+            self.encoded_tokens += encoded_tokens
+        if encoded_tokens < raw_tokens:
+            logger.info(f"Observation {name}: {raw_tokens} -> {encoded_tokens} tokens "
+                        f"(saved {self.raw_tokens - self.encoded_tokens} so far)")
+        return text
+
+    def stash(self, name: str, text: str, store: ReferenceStore) -> str:
+        """
+        Guarda um texto (em blocos) para ser lido depois com `fetch_observation`.
+
+        O texto fica em `store`, fora do LRU das observações, e é lido na
+        sessão atual enquanto `store` existir.
+
+        Args:
+            name: Origem do texto (entra no handle)
+            text: Texto a guardar
+            store: Armazenamento do chamador
+
+        Returns:
+            Handle do texto
+        """
+        seed = hashlib.sha1(f"{name}:{text}".encode()).hexdigest()
+        chunks = [text[i:i + _TEXT_CHUNK_CHARS] for i in range(0, len(text), _TEXT_CHUNK_CHARS)]
+        stashes: Dict[str, Any] = {}
+        handle = self._marker(chunks, len(chunks), "", seed, stashes)["handle"]
+        store.put(handle, chunks)
+        with self._lock:
+            self._references[get_current_session()] = store
+        return handle
+
+    def fetch(self, handle: str, offset: int = 0, limit: Optional[int] = None) -> str:
+        """
+        Devolve itens omitidos de uma observação.
+
+        Args:
+            handle: Handle informado no marcador `_more`
+            offset: Posição do primeiro item
+            limit: Número de itens (padrão top_k)
+
+        Returns:
+            JSON com os itens pedidos (também dentro do orçamento)
+        """
+        session = get_current_session()
+        with self._lock:
+            data = self._stashes.get((session, handle))
+            store = self._references.get(session)
+        if data is None and store is not None:
+            data = store.get(handle)
+        if data is None:
+            return _dumps({"error": f"unknown or expired handle: {handle}"})
+        limit = limit or self.top_k
+        if isinstance(data, dict):
+            items = dict(list(data.items())[offset:offset + limit])
+        else:
+            items = data[offset:offset + limit]
+        if items and all(isinstance(item, str) for item in items) and not isinstance(data, dict):
+            return self.encode(FETCH_TOOL_NAME, "".join(items))
+        page = {"handle": handle, "offset": offset, "total": len(data), "items": items}
+        return self.encode(FETCH_TOOL_NAME, _dumps(page))
+
+    def stats(self) -> Dict[str, Any]:
+        """Tokens antes/depois da codificação, acumulados no processo."""
+        with self._lock:
+            saved = self.raw_tokens - self.encoded_tokens
+            return {
+                "calls": self.calls,
+                "raw_tokens": self.raw_tokens,
+                "encoded_tokens": self.encoded_tokens,
+                "saved_tokens": saved,
+                "saved_ratio": round(saved / self.raw_tokens, 3) if self.raw_tokens else 0.0,
+            }
+
+
+observation_encoder = ObservationEncoder()
+
+
+def fetch_observation_tool(params: str) -> str:
+    """Params: handle=abc123, offset=10, limit=10"""
+    params_dict = parse_tool_params(params)
+    handle = get_param(params_dict, "handle", None)
+    if not handle:
+        return _dumps({"error": "handle parameter required"})
+    return observation_encoder.fetch(handle, get_param(params_dict, "offset", 0, int),
+                                     get_param(params_dict, "limit", None, int))
+
+
+def encoded_tool_func(name: str, func: Callable[[str], str]) -> Callable[[str], str]:
+    """Envolve a função de uma tool com o codificador de observações."""
+    def wrapper(params: str = "") -> str:
+        return observation_encoder.encode(name, func(params))
+    return wrapper
+
+
+def with_observation_encoder(tools: List[Tool]) -> List[Tool]:
+    """
+    Retorna cópias das tools com observações compactadas, mais a tool de paginação.
+
+    Com OBSERVATION_ENCODER=0 as tools são devolvidas sem alteração.
+
+    Args:
+        tools: Lista de Tools do agente
+
+    Returns:
+        Nova lista de Tools
+    """
+    if not OBSERVATION_ENCODER:
+        return list(tools)
+    encoded = [
+        Tool(name=t.name, func=encoded_tool_func(t.name, t.func), description=t.description)
+        for t in tools
+    ]
+    encoded.append(Tool(
+        name=FETCH_TOOL_NAME,
+        func=fetch_observation_tool,
+        description="Busca itens omitidos de um resultado anterior (marcador _more). "
+                    "Params: handle=abc123, offset=10, limit=10",
+    ))
+    return encoded
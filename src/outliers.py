@@ -0,0 +1,89 @@
+# src/outliers.py
+# Índice de outliers de todas as colunas numéricas, construído numa única passada vetorizada
+
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import logger
+
+# Linhas por bloco na varredura (limita a matriz float64 temporária)
+OUTLIER_SCAN_ROWS = int(os.getenv("OUTLIER_SCAN_ROWS", "250000"))
+ZSCORE_THRESHOLD = 3.0
+METHODS = ("iqr", "zscore")
+
+
+@dataclass
+class OutlierIndex:
+    """
+    Posições (iloc) das linhas fora dos limites, por coluna.
+
+    Guarda só os índices das linhas sinalizadas (int32 ordenados), não cópias
+    dos dados; contagens, amostras e consultas entre colunas saem daqui.
+    """
+    method: str
+    bounds: Dict[str, Tuple[float, float]]
+    positions: Dict[str, np.ndarray]
+    flagged_rows: np.ndarray
+    flags_per_row: np.ndarray
+
+    def count(self, column: str) -> int:
+        return int(self.positions[column].size)
+
+    def counts(self) -> Dict[str, int]:
+        """Número de outliers por coluna, da maior contagem para a menor."""
+        counts = {col: int(pos.size) for col, pos in self.positions.items()}
+        return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+    def rows_flagged_in(self, min_columns: int) -> np.ndarray:
+        """Posições das linhas sinalizadas em pelo menos `min_columns` colunas."""
+        return self.flagged_rows[self.flags_per_row >= min_columns]
+
+
+def build_outlier_index(numeric: pd.DataFrame, lower: pd.Series, upper: pd.Series,
+                        method: str, chunk_rows: int = OUTLIER_SCAN_ROWS) -> OutlierIndex:
+    """
+    Compara todas as colunas com seus limites de uma vez, em blocos de linhas.
+
+    Args:
+        numeric: Colunas numéricas do dataset
+        lower: Limite inferior por coluna
+        upper: Limite superior por coluna
+        method: Nome do método (só informativo)
+        chunk_rows: Linhas por bloco
+
+    Returns:
+        OutlierIndex
+    """
+    columns = list(numeric.columns)
+    low = lower[columns].to_numpy(dtype=np.float64)
+    high = upper[columns].to_numpy(dtype=np.float64)
+    dtype = np.int32 if len(numeric) < np.iinfo(np.int32).max else np.int64
+    hits: List[List[np.ndarray]] = [[] for _ in columns]
+    for start in range(0, len(numeric), chunk_rows):
+        block = numeric.iloc[start:start + chunk_rows].to_numpy(dtype=np.float64, na_value=np.nan)
+        # NaN compara como False: ausentes nunca são outliers
+        rows, cols = np.nonzero((block < low) | (block > high))
+        order = np.argsort(cols, kind="stable")
+        rows, cols = rows[order] + start, cols[order]
+        splits = np.searchsorted(cols, np.arange(1, len(columns)))
+        for i, part in enumerate(np.split(rows.astype(dtype), splits)):
+            if part.size:
+                hits[i].append(part)
+
+    positions = {col: (np.concatenate(parts) if parts else np.empty(0, dtype=dtype))
+                 for col, parts in zip(columns, hits)}
+    every = np.concatenate(list(positions.values())) if positions else np.empty(0, dtype=dtype)
+    flagged_rows, flags_per_row = np.unique(every, return_counts=True)
+    logger.info(f"Outlier index ({method}) built: {len(columns)} columns, "
+                f"{flagged_rows.size} flagged rows of {len(numeric)}")
+    return OutlierIndex(
+        method=method,
+        bounds={col: (float(lo), float(hi)) for col, lo, hi in zip(columns, low, high)},
+        positions=positions,
+        flagged_rows=flagged_rows.astype(dtype),
+        flags_per_row=flags_per_row.astype(np.int32),
+    )
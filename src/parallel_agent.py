@@ -0,0 +1,149 @@
+# src/parallel_agent.py
+# Agente com tool calling nativo: várias tools por passo, executadas em paralelo
+
+import os
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.tools import Tool
+
+from utils import logger
+
+AGENT_MAX_PARALLEL_TOOLS = int(os.getenv("AGENT_MAX_PARALLEL_TOOLS", "4"))
+
+PARALLEL_SYSTEM_PROMPT = """Você é um Engenheiro de Dados especializado em Análise Exploratória (EDA).
+
+REGRAS CRÍTICAS:
+1. Você DEVE SEMPRE usar as ferramentas (tools) disponíveis para responder perguntas sobre dados.
+2. NUNCA responda diretamente sem usar uma tool primeiro.
+3. Quando a pergunta exigir várias análises independentes (ex.: histograma, boxplot e
+   correlação), chame TODAS as tools necessárias de uma vez, no mesmo passo.
+4. Passe os parâmetros no argumento "params", no formato "chave=valor, chave2=valor2".
+5. Se você não souber qual tool usar, use "dataset_info" para ver as colunas disponíveis.
+6. Para perguntas sobre conversas anteriores, use o histórico da conversa.
+7. Depois de receber os resultados, responda em português, formatado para o usuário."""
+
+
+def _tool_schema(tool: Tool) -> Dict[str, Any]:
+    """Schema de função (formato OpenAI) com um único argumento string 'params'."""
+    return {
+        "type": "function",
+        "function": {
+            "name": tool.name,
+            "description": tool.description,
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "params": {
+                        "type": "string",
+                        "description": "Parâmetros no formato 'chave=valor, chave2=valor2' (vazio se não houver)",
+                    }
+                },
+                "required": [],
+            },
+        },
+    }
+
+
+class ParallelToolAgent:
+    """
+    Executor de agente que aceita várias chamadas de tool por resposta do LLM.
+
+    Todas as tools pedidas em um passo rodam concorrentemente em um pool de
+    threads (propagando o contexto da sessão) e as observações voltam juntas
+    ao modelo. Expõe `run` e `memory` como o AgentExecutor legado, então
+    `ask_agent` funciona com qualquer um dos dois.
+    """
+
+    def __init__(self, llm, tools: List[Tool], memory=None, system_prompt: str = PARALLEL_SYSTEM_PROMPT,
+                 max_iterations: int = 8, max_execution_time: float = 120,
+                 max_workers: int = AGENT_MAX_PARALLEL_TOOLS):
+        self.llm = llm
+        self.tools = {tool.name: tool for tool in tools}
+        self.llm_with_tools = llm.bind_tools([_tool_schema(tool) for tool in tools])
+        self.memory = memory
+        self.system_prompt = system_prompt
+        self.max_iterations = max_iterations
+        self.max_execution_time = max_execution_time
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-tool")
+
+    def _history(self) -> List[BaseMessage]:
+        if self.memory is None:
+            return []
+        history = self.memory.load_memory_variables({}).get(self.memory.memory_key, [])
+        return list(history) if isinstance(history, list) else []
+
+    def _call_tool(self, name: str, params: str, callbacks=None) -> str:
+        tool = self.tools.get(name)
+        if tool is None:
+            return f"Tool '{name}' não existe. Tools disponíveis: {', '.join(self.tools)}"
+        try:
+            # tool.run dispara on_tool_start/on_tool_end nos callbacks (streaming na UI)
+            return str(tool.run(params, callbacks=callbacks))
+        except Exception as e:
+            logger.error(f"Error running tool {name}: {e}")
+            return f"Erro ao executar {name}: {e}"
+
+    def _run_tool_calls(self, tool_calls: List[Dict[str, Any]], callbacks=None) -> List[ToolMessage]:
+        """Executa as tool calls de um passo em paralelo, preservando a ordem."""
+        futures = []
+        for call in tool_calls:
+            params = (call.get("args") or {}).get("params", "") or ""
+            # Cada tarefa roda numa cópia do contexto (sessão do dataset, tracing)
+            ctx = contextvars.copy_context()
+            futures.append(self._pool.submit(ctx.run, self._call_tool, call["name"], params, callbacks))
+            logger.info(f"Tool call dispatched: {call['name']}({params})")
+
+        messages = []
+        for call, future in zip(tool_calls, futures):
+            messages.append(ToolMessage(content=future.result(), tool_call_id=call["id"], name=call["name"]))
+        return messages
+
+    def invoke(self, question: str, callbacks=None) -> str:
+        """
+        Responde a pergunta, permitindo várias tools concorrentes por passo.
+
+        Args:
+            question: Pergunta em linguagem natural
+            callbacks: Callbacks do LangChain repassados às chamadas do LLM e das tools
+
+        Returns:
+            Resposta final do agente
+        """
+        config = {"callbacks": callbacks} if callbacks else None
+        messages: List[BaseMessage] = [SystemMessage(content=self.system_prompt)]
+        messages += self._history()
+        messages.append(HumanMessage(content=question))
+
+        start = time.monotonic()
+        answer: Optional[str] = None
+        for step in range(self.max_iterations):
+            ai: AIMessage = self.llm_with_tools.invoke(messages, config=config)
+            messages.append(ai)
+            if not ai.tool_calls:
+                answer = ai.content if isinstance(ai.content, str) else str(ai.content)
+                break
+
+            logger.info(f"Agent step {step + 1}: {len(ai.tool_calls)} tool call(s) in parallel")
+            messages += self._run_tool_calls(ai.tool_calls, callbacks=callbacks)
+
+            if time.monotonic() - start > self.max_execution_time:
+                logger.warning("Parallel agent reached max_execution_time")
+                break
+
+        if answer is None:
+            # Limite atingido: pede uma resposta final com o que já foi observado
+            messages.append(HumanMessage(content="Responda agora com base nos resultados já obtidos."))
+            final = self.llm.invoke(messages, config=config)
+            answer = final.content if isinstance(final.content, str) else str(final.content)
+
+        if self.memory is not None:
+            self.memory.save_context({"input": question}, {"output": answer})
+        return answer
+
+    def run(self, question: str, callbacks=None) -> str:
+        """Alias compatível com AgentExecutor.run."""
+        return self.invoke(question, callbacks=callbacks)
@@ -0,0 +1,95 @@
+# src/plot_aggregation.py
+# Renderização por agregação: custo de desenho constante, independente do número de linhas
+
+import os
+from typing import Tuple
+
+import numpy as np
+
+# Acima deste número de pontos, scatter/séries temporais são agregados antes de desenhar
+PLOT_AGGREGATE_THRESHOLD = int(os.getenv("PLOT_AGGREGATE_THRESHOLD", "50000"))
+# Grade em "pixels" de dados (a figura 10x6 a 150 dpi tem ~1500x900 px)
+PLOT_GRID_WIDTH = int(os.getenv("PLOT_GRID_WIDTH", "600"))
+PLOT_GRID_HEIGHT = int(os.getenv("PLOT_GRID_HEIGHT", "400"))
+
+
+def density_grid(x, y, width: int = PLOT_GRID_WIDTH,
+                 height: int = PLOT_GRID_HEIGHT) -> Tuple[np.ndarray, Tuple[float, float, float, float]]:
+    """
+    Agrega pontos (x, y) numa grade fixa de contagens (histograma 2D vetorizado).
+
+    Equivale a `np.histogram2d` com bins uniformes, mas calcula a célula de
+    cada ponto diretamente e conta com `np.bincount` (várias vezes mais rápido).
+
+    Args:
+        x: Valores do eixo x
+        y: Valores do eixo y
+        width: Colunas da grade
+        height: Linhas da grade
+
+    Returns:
+        Tupla (contagens com shape (height, width), extent (xmin, xmax, ymin, ymax))
+        pronta para `ax.imshow(counts, origin="lower", extent=extent)`
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if x.size == 0:
+        return np.zeros((height, width)), (0.0, 1.0, 0.0, 1.0)
+
+    xmin, xmax = float(x.min()), float(x.max())
+    ymin, ymax = float(y.min()), float(y.max())
+    # Eixos degenerados (coluna constante) ganham uma largura mínima
+    if xmin == xmax:
+        xmin, xmax = xmin - 0.5, xmax + 0.5
+    if ymin == ymax:
+        ymin, ymax = ymin - 0.5, ymax + 0.5
+
+    # Índice da célula de cada ponto + bincount: uma passada linear sobre os dados
+    ix = np.minimum(((x - xmin) * (width / (xmax - xmin))).astype(np.int64), width - 1)
+    iy = np.minimum(((y - ymin) * (height / (ymax - ymin))).astype(np.int64), height - 1)
+    counts = np.bincount(iy * width + ix, minlength=width * height).reshape(height, width)
+    return counts, (xmin, xmax, ymin, ymax)
+
+
+def minmax_decimate(x, y, columns: int = PLOT_GRID_WIDTH) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduz uma série (x ordenado) a no máximo 2 pontos por coluna de pixel.
+
+    Em cada coluna mantém o mínimo e o máximo de y, na ordem em que ocorrem;
+    a linha desenhada preserva picos e vales da série completa.
+
+    Args:
+        x: Valores do eixo x em ordem crescente (numéricos ou datetime64)
+        y: Valores do eixo y
+        columns: Número de colunas de pixel
+
+    Returns:
+        Tupla (x, y) decimada
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if x.size <= 2 * columns:
+        return x, y
+
+    is_datetime = np.issubdtype(x.dtype, np.datetime64)
+    xs = x.astype("int64").astype(np.float64) if is_datetime else x.astype(np.float64)
+
+    # Coluna de pixel de cada ponto (x já ordenado => colunas não decrescentes)
+    span = xs[-1] - xs[0] or 1.0
+    bucket = np.minimum(((xs - xs[0]) / span * columns).astype(np.int64), columns - 1)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    segment = np.cumsum(np.r_[False, bucket[1:] != bucket[:-1]])
+
+    # Mínimo/máximo por coluna com reduceat e a primeira posição que os atinge
+    idx = []
+    for fill, reduce in ((np.inf, np.minimum), (-np.inf, np.maximum)):
+        values = np.where(np.isnan(y), fill, y)
+        extreme = reduce.reduceat(values, starts)
+        hits = np.flatnonzero(values == extreme[segment])
+        _, first = np.unique(segment[hits], return_index=True)
+        idx.append(hits[first])
+
+    idx = np.unique(np.concatenate(idx))
+    return x[idx], y[idx]
@@ -0,0 +1,155 @@
+# src/plot_renderer.py
+# Renderização assíncrona de gráficos em um pool de processos dedicado
+
+import os
+import pickle
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+from utils import logger
+
+PLOT_RENDER_ASYNC = os.getenv("PLOT_RENDER_ASYNC", "1") == "1"
+PLOT_RENDER_WORKERS = int(os.getenv("PLOT_RENDER_WORKERS", "2"))
+PLOT_RENDER_TIMEOUT = float(os.getenv("PLOT_RENDER_TIMEOUT", "60"))
+PLOT_DPI = 150
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Gráficos ainda em renderização: caminho -> Future
+_pending: Dict[str, Future] = {}
+_pending_lock = threading.Lock()
+
+
+def render_figure(fig_bytes: bytes, path: str) -> str:
+    """
+    Desenha uma figura serializada e grava o PNG (executado no processo renderizador).
+
+    A escrita é atômica (arquivo temporário + rename): quem vê o arquivo em
+    `path` sempre vê o PNG completo.
+
+    Args:
+        fig_bytes: Figura (API orientada a objetos) serializada com pickle
+        path: Caminho final do PNG
+
+    Returns:
+        O próprio caminho
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+
+    fig = pickle.loads(fig_bytes)
+    # Sufixo fora de *.png: a limpeza de gráficos antigos não vê arquivos parciais
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fig.tight_layout()
+    fig.savefig(tmp_path, format="png", dpi=PLOT_DPI, bbox_inches="tight")
+    os.replace(tmp_path, path)
+    return path
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: os workers não herdam threads/locks do servidor Streamlit
+            _pool = ProcessPoolExecutor(
+                max_workers=PLOT_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Plot renderer pool started with {PLOT_RENDER_WORKERS} workers")
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _render_inline(fig_bytes: bytes, path: str) -> Future:
+    future: Future = Future()
+    try:
+        future.set_result(render_figure(fig_bytes, path))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _on_done(path: str, future: Future) -> None:
+    with _pending_lock:
+        _pending.pop(path, None)
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Plot rendering failed for {path}: {error}")
+        # Sem PNG, o caminho não pode continuar servindo como cache
+        from plot_store import plot_store
+        plot_store.unregister(path)
+    else:
+        logger.info(f"Plot saved: {path}")
+
+
+def submit_figure(fig, path: str) -> Future:
+    """
+    Agenda a renderização de uma figura e retorna imediatamente.
+
+    A tool pode devolver `path` na hora; o arquivo aparece quando o
+    renderizador terminar (use `wait_for_plot` antes de exibi-lo). Se o
+    pool estiver desativado ou indisponível, renderiza na thread atual.
+
+    Args:
+        fig: matplotlib.figure.Figure já montada
+        path: Caminho final do PNG
+
+    Returns:
+        Future com o caminho do PNG
+    """
+    fig_bytes = pickle.dumps(fig)
+    if not PLOT_RENDER_ASYNC:
+        future = _render_inline(fig_bytes, path)
+        _on_done(path, future)
+        return future
+
+    try:
+        future = _get_pool().submit(render_figure, fig_bytes, path)
+    except Exception as e:
+        # Pool quebrado (ex.: worker morto): recria na próxima vez e renderiza aqui
+        logger.warning(f"Plot renderer pool unavailable ({e}), rendering inline")
+        _reset_pool()
+        future = _render_inline(fig_bytes, path)
+        _on_done(path, future)
+        return future
+
+    with _pending_lock:
+        _pending[path] = future
+    future.add_done_callback(lambda f: _on_done(path, f))
+    return future
+
+
+def is_pending(path: str) -> bool:
+    """True se o gráfico ainda está sendo renderizado."""
+    with _pending_lock:
+        return path in _pending
+
+
+def wait_for_plot(path: str, timeout: float = PLOT_RENDER_TIMEOUT) -> bool:
+    """
+    Aguarda a renderização de um gráfico.
+
+    Args:
+        path: Caminho retornado pela tool
+        timeout: Tempo máximo de espera em segundos
+
+    Returns:
+        True se o PNG existe ao final da espera
+    """
+    with _pending_lock:
+        future = _pending.get(path)
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Plot {path} not available: {e}")
+    return os.path.exists(path)
@@ -0,0 +1,203 @@
+# src/plot_store.py
+# Índice em memória dos gráficos gerados: cotas por sessão e limpeza em lote em segundo plano
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from plot_renderer import is_pending
+from utils import logger
+
+PLOT_DIR = "plots"
+PLOT_SESSION_MAX_FILES = int(os.getenv("PLOT_SESSION_MAX_FILES", "30"))
+PLOT_MAX_FILES = int(os.getenv("PLOT_MAX_FILES", "200"))
+PLOT_MAX_AGE_HOURS = float(os.getenv("PLOT_MAX_AGE_HOURS", "48"))
+PLOT_EVICT_INTERVAL = float(os.getenv("PLOT_EVICT_INTERVAL", "30"))
+
+
+@dataclass
+class PlotRecord:
+    """Um PNG em disco e as sessões que o exibiram."""
+    path: str
+    last_used: float = field(default_factory=time.time)
+    sessions: Set[str] = field(default_factory=set)
+
+
+class PlotStore:
+    """
+    Índice dos PNGs de `plot_dir`, em ordem LRU.
+
+    O diretório é varrido uma única vez (na criação); depois disso registrar,
+    reutilizar e listar gráficos são operações em memória. Cada sessão mantém
+    no máximo `session_max_files` gráficos; os que nenhuma sessão referencia
+    continuam como cache (reuso pelo hash de conteúdo) até o limite global
+    ou a idade máxima. A remoção de arquivos roda em lote numa thread de
+    fundo, fora do caminho das tools.
+    """
+
+    def __init__(self, plot_dir: str = PLOT_DIR, session_max_files: int = PLOT_SESSION_MAX_FILES,
+                 max_files: int = PLOT_MAX_FILES, max_age_hours: float = PLOT_MAX_AGE_HOURS,
+                 evict_interval: float = PLOT_EVICT_INTERVAL):
+        self.plot_dir = plot_dir
+        self.session_max_files = session_max_files
+        self.max_files = max_files
+        self.max_age = max_age_hours * 3600
+        self.evict_interval = evict_interval
+        self._index: "OrderedDict[str, PlotRecord]" = OrderedDict()
+        self._by_session: Dict[str, "OrderedDict[str, None]"] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._scan()
+
+    def _scan(self) -> None:
+        """Indexa os PNGs já existentes (ex.: após restart), do mais antigo ao mais novo."""
+        os.makedirs(self.plot_dir, exist_ok=True)
+        found = []
+        with os.scandir(self.plot_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".png") and entry.is_file():
+                    found.append((entry.stat().st_mtime, os.path.join(self.plot_dir, entry.name)))
+        for mtime, path in sorted(found):
+            self._index[path] = PlotRecord(path=path, last_used=mtime)
+        if found:
+            logger.info(f"Plot store indexed {len(found)} existing plots")
+
+    def register(self, path: str, session_id: str) -> None:
+        """Registra um gráfico (novo ou reutilizado) como usado pela sessão."""
+        with self._lock:
+            record = self._index.get(path)
+            if record is None:
+                record = PlotRecord(path=path)
+                self._index[path] = record
+            record.last_used = time.time()
+            record.sessions.add(session_id)
+            self._index.move_to_end(path)
+
+            plots = self._by_session.setdefault(session_id, OrderedDict())
+            plots[path] = None
+            plots.move_to_end(path)
+            over_quota = len(plots) > self.session_max_files or len(self._index) > self.max_files
+        self._ensure_worker()
+        if over_quota:
+            self._wakeup.set()
+
+    def touch(self, path: str, session_id: str) -> bool:
+        """
+        Marca um gráfico do índice como reutilizado pela sessão.
+
+        Entradas cujo PNG sumiu (removido externamente ou renderização que
+        falhou) saem do índice em vez de virar acerto.
+
+        Returns:
+            True se o gráfico está no índice e em disco ou em renderização
+        """
+        with self._lock:
+            if path not in self._index:
+                return False
+        if not (os.path.exists(path) or is_pending(path)):
+            self.unregister(path)
+            return False
+        self.register(path, session_id)
+        return True
+
+    def unregister(self, path: str) -> None:
+        """Remove um gráfico do índice e das sessões (o arquivo não é tocado)."""
+        with self._lock:
+            record = self._index.pop(path, None)
+            if record is None:
+                return
+            for session_id in record.sessions:
+                self._by_session.get(session_id, {}).pop(path, None)
+
+    def session_plots(self, session_id: str, limit: Optional[int] = None) -> List[str]:
+        """Gráficos da sessão, do mais recente ao mais antigo."""
+        with self._lock:
+            plots = list(reversed(self._by_session.get(session_id, {})))
+        return plots[:limit] if limit else plots
+
+    def release_session(self, session_id: str) -> None:
+        """Remove as referências da sessão; seus gráficos viram cache comum."""
+        with self._lock:
+            for path in self._by_session.pop(session_id, {}):
+                record = self._index.get(path)
+                if record is not None:
+                    record.sessions.discard(session_id)
+
+    def _collect_evictions(self) -> List[str]:
+        """Decide (sob o lock) quais arquivos remover; a remoção acontece fora dele."""
+        now = time.time()
+        # Cotas por sessão: a sessão solta as referências mais antigas
+        for session_id, plots in self._by_session.items():
+            while len(plots) > self.session_max_files:
+                path, _ = plots.popitem(last=False)
+                record = self._index.get(path)
+                if record is not None:
+                    record.sessions.discard(session_id)
+
+        victims = []
+        excess = len(self._index) - self.max_files
+        for path, record in list(self._index.items()):
+            if is_pending(path):
+                continue
+            expired = now - record.last_used > self.max_age
+            if expired or (excess > 0 and not record.sessions):
+                victims.append(path)
+                excess -= 1
+                del self._index[path]
+                for session_id in record.sessions:
+                    self._by_session.get(session_id, {}).pop(path, None)
+        return victims
+
+    def evict(self) -> int:
+        """Executa uma rodada de limpeza em lote. Retorna o número de arquivos removidos."""
+        with self._lock:
+            victims = self._collect_evictions()
+        removed = 0
+        for path in victims:
+            # O mesmo nome (hash de conteúdo) pode ter sido registrado de novo desde a coleta
+            with self._lock:
+                if path in self._index or is_pending(path):
+                    continue
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error(f"Failed to remove plot {path}: {e}")
+        if removed:
+            logger.info(f"Plot store evicted {removed} plots ({len(self._index)} indexed)")
+        return removed
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="plot-evictor", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.evict_interval)
+            self._wakeup.clear()
+            try:
+                self.evict()
+            except Exception as e:
+                logger.error(f"Plot eviction failed: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "plots": len(self._index),
+                "sessions": len(self._by_session),
+                "unreferenced": sum(1 for r in self._index.values() if not r.sessions),
+            }
+
+
+# Índice compartilhado pelo processo (todas as sessões do Streamlit)
+plot_store = PlotStore()
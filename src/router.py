@@ -0,0 +1,190 @@
+# src/router.py
+# Roteador determinístico: perguntas simples vão direto para uma tool, sem o loop ReAct
+
+import os
+import re
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from utils import logger
+
+AGENT_ROUTER = os.getenv("AGENT_ROUTER", "1") == "1"
+# 1 = o LLM apenas redige a resposta a partir do resultado da tool (uma chamada)
+ROUTER_PHRASE_WITH_LLM = os.getenv("ROUTER_PHRASE_WITH_LLM", "0") == "1"
+# Perguntas mais longas que isso quase sempre pedem raciocínio: vão para o agente
+ROUTER_MAX_WORDS = int(os.getenv("ROUTER_MAX_WORDS", "14"))
+
+# Intenções reconhecidas: (tool, padrão, exigência de colunas)
+#   "column"  - exatamente uma coluna
+#   "columns" - uma ou mais colunas
+#   "xy"      - exatamente duas colunas
+#   None      - nenhuma coluna necessária
+_INTENTS: List[Tuple[str, str, Optional[str]]] = [
+    ("histogram", r"\bhistogram(a|as)?\b", "column"),
+    ("boxplot", r"\bbox\s*-?\s*plots?\b", "columns"),
+    ("scatter", r"\bscatter\b|\bdispers[aã]o\b", "xy"),
+    ("correlation", r"\bcorrela[cç](?:[aã]o|[oõ]es)\b|\bcorrelation\b", None),
+    ("outliers", r"\boutliers?\b|\bvalores? (?:at[ií]picos?|extremos?)\b", "column"),
+    ("frequency", r"\bfrequ[eê]n(?:cia|tes?)\b|\bmais comuns?\b", "column"),
+    ("central_tendency", r"\bm[eé]dia\b|\bmediana\b|\bmoda\b|\bmean\b|\bmedian\b|\btend[eê]ncia central\b", "column"),
+    ("variability", r"\bvari[aâ]ncia\b|\bdesvio[- ]padr[aã]o\b|\bvariabilidade\b|\bstd\b", "column"),
+    ("range", r"\bm[ií]n(?:imo)?\b|\bm[aá]x(?:imo)?\b|\bamplitude\b|\brange\b|\bintervalo de valores\b", "column"),
+    ("missing", r"\b(?:valores? )?(?:ausentes?|faltantes?|nulos?)\b|\bmissing\b", None),
+    ("class_balance", r"\bbalanceamento\b|\bdesbalancead[oa]\b|\bdistribui[cç][aã]o d[ae]s? classes?\b|\bclass balance\b", None),
+    ("describe", r"\bdescribe\b|\bestat[ií]sticas descritivas\b", None),
+    ("schema", r"\bschema\b|\besquema\b|\btipos? d[ae]s? colunas\b|\bquais (?:s[aã]o )?as colunas\b", None),
+    ("dataset_info", r"\bdataset[_ ]info\b|\binforma[cç][oõ]es (?:gerais )?do dataset\b", None),
+]
+_COMPILED = [(name, re.compile(pattern, re.IGNORECASE), need) for name, pattern, need in _INTENTS]
+
+# Pedidos compostos, comparativos ou explicativos ficam com o agente
+_NEEDS_REASONING = re.compile(
+    r"\bpor ?qu[eê]\b|\bexpli(?:que|car|ca)\b|\bcompar|\bpor\b|\bversus\b|\bvs\.?\b|\bagrupad|"
+    r"\bconclus|\bhist[oó]rico\b|\banterior|\bwhy\b|\bexplain\b|\bgroup",
+    re.IGNORECASE,
+)
+
+_BINS = re.compile(r"(\d+)\s*(?:bins|barras|faixas|intervalos)\b", re.IGNORECASE)
+_TOP = re.compile(r"\btop\s*(\d+)\b|\b(\d+)\s+(?:valores|mais)\b", re.IGNORECASE)
+_ZSCORE = re.compile(r"\bz[- ]?score\b", re.IGNORECASE)
+_SPEARMAN = re.compile(r"\bspearman\b|\bpostos?\b", re.IGNORECASE)
+
+
+@dataclass
+class Route:
+    """Tool e parâmetros escolhidos para uma pergunta."""
+    tool: str
+    params: str
+
+
+def _find_columns(question: str, columns: Iterable[Any]) -> List[str]:
+    """Colunas citadas na pergunta, na ordem em que aparecem (nomes mais longos primeiro)."""
+    found: List[Tuple[int, str]] = []
+    taken: List[Tuple[int, int]] = []
+    for col in sorted((str(c) for c in columns), key=len, reverse=True):
+        pattern = re.compile(r"(?<![\w])" + re.escape(col) + r"(?![\w])", re.IGNORECASE)
+        for match in pattern.finditer(question):
+            span = match.span()
+            if any(span[0] < end and start < span[1] for start, end in taken):
+                continue
+            taken.append(span)
+            found.append((span[0], col))
+            break
+    return [col for _, col in sorted(found)]
+
+
+def match_intents(question: str) -> List[str]:
+    """Nomes das tools cujas intenções aparecem na pergunta (na ordem de `_INTENTS`)."""
+    return [name for name, pattern, _ in _COMPILED if pattern.search(question)]
+
+
+def route_question(question: str, columns: Iterable[Any]) -> Optional[Route]:
+    """
+    Tenta mapear a pergunta diretamente para uma tool.
+
+    Só roteia quando há exatamente uma intenção reconhecida, as colunas
+    exigidas pela tool foram identificadas sem ambiguidade e a pergunta não
+    pede raciocínio (comparações, explicações, agrupamentos, histórico).
+
+    Args:
+        question: Pergunta em linguagem natural
+        columns: Colunas do dataset carregado
+
+    Returns:
+        Route com a tool e os parâmetros, ou None para usar o agente
+    """
+    if not AGENT_ROUTER or not question or not question.strip():
+        return None
+    if len(question.split()) > ROUTER_MAX_WORDS or _NEEDS_REASONING.search(question):
+        return None
+
+    intents = match_intents(question)
+    if len(intents) != 1:
+        return None
+    tool = intents[0]
+    need = next(need for name, _, need in _INTENTS if name == tool)
+
+    cols = _find_columns(question, columns)
+    params: Dict[str, Any] = {}
+    if need == "column":
+        if len(cols) != 1:
+            return None
+        params["column"] = cols[0]
+    elif need == "columns":
+        if not cols:
+            return None
+        if len(cols) == 1:
+            params["column"] = cols[0]
+        else:
+            params["columns"] = "|".join(cols)
+    elif need == "xy":
+        if len(cols) != 2:
+            return None
+        params["x"], params["y"] = cols
+
+    if tool == "histogram":
+        bins = _BINS.search(question)
+        if bins:
+            params["bins"] = bins.group(1)
+    elif tool == "frequency":
+        top = _TOP.search(question)
+        if top:
+            params["top"] = top.group(1) or top.group(2)
+    elif tool == "outliers" and _ZSCORE.search(question):
+        params["method"] = "zscore"
+    elif tool == "correlation":
+        if len(cols) >= 2:
+            params["columns"] = "|".join(cols)
+        if _SPEARMAN.search(question):
+            params["method"] = "spearman"
+
+    route = Route(tool=tool, params=", ".join(f"{k}={v}" for k, v in params.items()))
+    logger.info(f"Router matched: {route.tool}({route.params})")
+    return route
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, float):
+        return f"{value:,.4g}" if abs(value) < 1e6 else f"{value:,.2f}"
+    return str(value)
+
+
+def format_tool_answer(route: Route, result: str) -> Optional[str]:
+    """
+    Formata o resultado de uma tool como resposta em Markdown, sem LLM.
+
+    Args:
+        route: Rota executada
+        result: String retornada pela tool (JSON)
+
+    Returns:
+        Resposta formatada, ou None se a tool falhou (o agente assume)
+    """
+    try:
+        data = json.loads(result)
+    except (TypeError, ValueError):
+        return result if result else None
+    if isinstance(data, dict) and "error" in data:
+        return None
+
+    title = f"**{route.tool}**" + (f" ({route.params})" if route.params else "")
+    if isinstance(data, dict) and data.get("plot_path"):
+        message = data.get("message") or "Gráfico gerado."
+        return f"{title}: {message}\n\nGráfico salvo em `{data['plot_path']}`."
+
+    if isinstance(data, dict) and all(not isinstance(v, (dict, list)) for v in data.values()):
+        lines = [f"- **{key}**: {_format_value(value)}" for key, value in data.items()]
+        return f"{title}\n\n" + "\n".join(lines)
+
+    return f"{title}\n\n```json\n{json.dumps(data, indent=2, ensure_ascii=False, default=str)}\n```"
+
+
+def phrase_prompt(question: str, route: Route, result: str) -> str:
+    """Prompt curto para o LLM redigir a resposta a partir do resultado da tool."""
+    return f"""Responda à pergunta do usuário em português, de forma clara e objetiva,
+usando apenas o resultado da ferramenta abaixo. Formate em Markdown.
+
+Pergunta: {question}
+Ferramenta: {route.tool}({route.params})
+Resultado: {result[:4000]}"""
@@ -0,0 +1,281 @@
+# src/streaming.py
+# Ingestão em chunks para CSVs maiores que a RAM: estatísticas em uma única passada
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from utils import logger
+
+STREAMING_THRESHOLD_MB = float(os.getenv("STREAMING_THRESHOLD_MB", "1024"))
+STREAMING_CHUNK_ROWS = int(os.getenv("STREAMING_CHUNK_ROWS", "200000"))
+SKETCH_K = int(os.getenv("SKETCH_K", "2048"))
+
+# Limite de valores distintos rastreados por coluna para calcular a moda
+_MODE_MAX_DISTINCT = 10000
+_MAX_SUMMARIES = 4
+
+
+class QuantileSketch:
+    """
+    Sketch de quantis mergeável no estilo KLL (compactadores por nível).
+
+    Cada nível guarda no máximo `k` itens com peso 2**nivel; quando enche,
+    o buffer é ordenado e metade dos itens (offset aleatório) sobe de nível.
+    O erro de rank é O(log(n/k)/k) e a memória é O(k log(n/k)).
+    """
+
+    def __init__(self, k: int = SKETCH_K, seed: int = 42):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values: np.ndarray) -> None:
+        """Adiciona um lote de valores (NaN já removidos)."""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        self.n += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Incorpora outro sketch (ex.: construído em outro chunk/processo)."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self.k:
+                items = np.sort(items)
+                # Número par de itens compactados; sobra fica no nível
+                keep = items.size % 2
+                offset = int(self._rng.integers(0, 2))
+                promoted = items[keep:][offset::2]
+                self.levels[level] = items[:keep]
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantiles(self, qs) -> np.ndarray:
+        """Retorna os quantis aproximados para uma lista de probabilidades."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(level_items.size, 2.0 ** level) for level, level_items in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind="mergesort")
+        items, weights = items[order], weights[order]
+        cum = np.cumsum(weights)
+        # Mesmo critério do pandas (interpolação linear) sobre ranks ponderados
+        positions = (cum - weights / 2) / cum[-1]
+        return np.interp(qs, positions, items)
+
+    @property
+    def size(self) -> int:
+        return int(sum(items.size for items in self.levels))
+
+
+class ColumnSummary:
+    """
+    Resumo mergeável de uma coluna: contagens, momentos, min/max, quantis e moda.
+
+    Média e variância usam a combinação paralela de Chan et al., então
+    resumos de chunks diferentes podem ser unidos sem perda de precisão.
+    """
+
+    def __init__(self, name: str, numeric: bool):
+        self.name = name
+        self.numeric = numeric
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch() if numeric else None
+        self.value_counts: Optional[Dict[Any, int]] = {}
+
+    def update(self, series: pd.Series) -> None:
+        """Atualiza o resumo com um chunk da coluna."""
+        self.nulls += int(series.isna().sum())
+        if self.numeric:
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            if values.size:
+                self._merge_moments(values.size, float(values.mean()), float(((values - values.mean()) ** 2).sum()))
+                self.min = min(self.min, float(values.min()))
+                self.max = max(self.max, float(values.max()))
+                self.sketch.update(values)
+        else:
+            self.count += int(series.notna().sum())
+        self._update_counts(series.dropna())
+
+    def _merge_moments(self, n_b: int, mean_b: float, m2_b: float) -> None:
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta ** 2 * n_a * n_b / n
+        self.count = n
+
+    def _update_counts(self, series: pd.Series) -> None:
+        if self.value_counts is None:
+            return
+        counts = series.value_counts(sort=False)
+        # Alta cardinalidade: moda não é rastreável em memória limitada
+        if len(counts) > _MODE_MAX_DISTINCT:
+            self.value_counts = None
+            return
+        for value, n in counts.items():
+            self.value_counts[value] = self.value_counts.get(value, 0) + int(n)
+        if len(self.value_counts) > _MODE_MAX_DISTINCT:
+            self.value_counts = None
+
+    def merge(self, other: "ColumnSummary") -> None:
+        """Une o resumo de outro chunk/arquivo na mesma coluna."""
+        self.nulls += other.nulls
+        if self.numeric and other.count:
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.sketch.merge(other.sketch)
+        elif not self.numeric:
+            self.count += other.count
+        if self.value_counts is not None and other.value_counts is not None:
+            for value, n in other.value_counts.items():
+                self.value_counts[value] = self.value_counts.get(value, 0) + n
+            if len(self.value_counts) > _MODE_MAX_DISTINCT:
+                self.value_counts = None
+        else:
+            self.value_counts = None
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else float("nan")
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def quantile(self, q: float) -> float:
+        return float(self.sketch.quantiles([q])[0])
+
+    @property
+    def mode(self) -> Optional[Any]:
+        if not self.value_counts:
+            return None
+        return max(self.value_counts.items(), key=lambda item: item[1])[0]
+
+
+class StreamingSummary:
+    """Estatísticas por coluna de um CSV, construídas sem materializar o DataFrame."""
+
+    def __init__(self, columns: Dict[str, ColumnSummary], dtypes: Dict[str, str], rows: int):
+        self.columns = columns
+        self.dtypes = dtypes
+        self.rows = rows
+
+    @classmethod
+    def from_csv(cls, path: str, chunksize: int = STREAMING_CHUNK_ROWS) -> "StreamingSummary":
+        """
+        Lê o CSV em chunks e acumula os resumos em uma única passada.
+
+        Args:
+            path: Caminho do CSV
+            chunksize: Linhas por chunk
+
+        Returns:
+            StreamingSummary com os resumos de todas as colunas
+        """
+        columns: Dict[str, ColumnSummary] = {}
+        dtypes: Dict[str, str] = {}
+        rows = 0
+        for i, chunk in enumerate(pd.read_csv(path, chunksize=chunksize)):
+            if not columns:
+                # Tipos decididos pelo primeiro chunk; os seguintes são coagidos
+                for col in chunk.columns:
+                    numeric = is_numeric_dtype(chunk[col])
+                    columns[col] = ColumnSummary(col, numeric)
+                    dtypes[col] = str(chunk[col].dtype)
+            for col, summary in columns.items():
+                summary.update(chunk[col])
+            rows += len(chunk)
+            logger.info(f"Streaming ingest: chunk {i + 1}, {rows} rows so far")
+        return cls(columns, dtypes, rows)
+
+    def numeric_columns(self) -> List[str]:
+        return [col for col, summary in self.columns.items() if summary.numeric]
+
+    def describe(self) -> Dict[str, Dict[str, float]]:
+        """Equivalente a df.describe().to_dict() (quantis aproximados)."""
+        result = {}
+        for col in self.numeric_columns():
+            s = self.columns[col]
+            q25, q50, q75 = s.sketch.quantiles([0.25, 0.5, 0.75])
+            result[col] = {
+                "count": float(s.count),
+                "mean": s.mean,
+                "std": s.std,
+                "min": s.min,
+                "25%": float(q25),
+                "50%": float(q50),
+                "75%": float(q75),
+                "max": s.max,
+            }
+        return result
+
+    def missing(self) -> Dict[str, int]:
+        """Equivalente a df.isnull().sum() filtrado para colunas com ausentes."""
+        return {col: s.nulls for col, s in self.columns.items() if s.nulls > 0}
+
+
+_summaries: "OrderedDict[str, StreamingSummary]" = OrderedDict()
+_summaries_lock = threading.Lock()
+
+
+def should_stream(path: str) -> bool:
+    """Decide pelo tamanho do arquivo se a ingestão deve ser em chunks."""
+    return os.path.getsize(path) > STREAMING_THRESHOLD_MB * 1024**2
+
+
+def get_or_build_summary(path: str, fingerprint: str) -> StreamingSummary:
+    """
+    Retorna o resumo em cache para o fingerprint ou constrói via streaming.
+
+    Args:
+        path: Caminho do CSV
+        fingerprint: Fingerprint do conteúdo do arquivo
+
+    Returns:
+        StreamingSummary do arquivo
+    """
+    with _summaries_lock:
+        summary = _summaries.get(fingerprint)
+        if summary is not None:
+            _summaries.move_to_end(fingerprint)
+            logger.info(f"Streaming summary cache hit: {path}")
+            return summary
+
+    summary = StreamingSummary.from_csv(path)
+    with _summaries_lock:
+        _summaries[fingerprint] = summary
+        while len(_summaries) > _MAX_SUMMARIES:
+            _summaries.popitem(last=False)
+    logger.info(f"Streaming summary built: {summary.rows} rows, {len(summary.columns)} columns")
+    return summary
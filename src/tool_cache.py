@@ -0,0 +1,159 @@
+# src/tool_cache.py
+# Cache de resultados das tools: (fingerprint do dataset, tool, parâmetros normalizados)
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.tools import Tool
+
+from plot_renderer import is_pending
+from tools import get_fingerprint
+from utils import parse_tool_params, logger
+
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "256"))
+
+
+def normalize_params(params: str) -> Tuple[Tuple[str, str], ...]:
+    """
+    Normaliza a entrada de uma tool para uso como chave de cache.
+
+    "column=Amount, bins=50", "bins=50,column=Amount" e " column = Amount ,bins=50"
+    geram a mesma chave. Entradas sem '=' (ex.: "Amount") viram um parâmetro
+    posicional.
+
+    Args:
+        params: String de parâmetros recebida do agente
+
+    Returns:
+        Tupla ordenada de pares (chave, valor)
+    """
+    params = (params or "").strip().strip("'\"")
+    if not params:
+        return ()
+    if "=" not in params:
+        return (("", params),)
+    return tuple(sorted(parse_tool_params(params).items()))
+
+
+class ToolResultCache:
+    """Cache LRU, thread-safe, dos resultados (strings) das tools."""
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None or not _plot_still_exists(result):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: tuple, result: str) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _plot_still_exists(result: str) -> bool:
+    """Resultados com gráfico só são válidos enquanto o PNG existir."""
+    if '"plot_path"' not in result:
+        return True
+    try:
+        path = json.loads(result).get("plot_path")
+    except (ValueError, AttributeError):
+        return True
+    return not path or os.path.exists(path) or is_pending(path)
+
+
+def _is_cacheable(result) -> bool:
+    """Erros não são cacheados (ex.: coluna digitada errada pelo LLM)."""
+    if not isinstance(result, str):
+        return False
+    # Falhas devolvidas como texto livre ("Erro ao ...")
+    if result.lstrip().startswith("Erro"):
+        return False
+    if '"error"' not in result:
+        return True
+    # JSON com qualquer formatação (ex.: indent=2 em schema/dataset_info)
+    try:
+        data = json.loads(result)
+    except ValueError:
+        return True
+    return not (isinstance(data, dict) and "error" in data)
+
+
+tool_cache = ToolResultCache()
+
+
+def cached_tool_func(name: str, func: Callable[[str], str], ignore_input: bool = False) -> Callable[[str], str]:
+    """
+    Envolve a função de uma tool com o cache de resultados.
+
+    Args:
+        name: Nome da tool
+        func: Função original (recebe a string de parâmetros)
+        ignore_input: True para tools que ignoram a entrada (chave sem parâmetros)
+
+    Returns:
+        Função com a mesma assinatura, servindo do cache quando possível
+    """
+    def wrapper(params: str = "") -> str:
+        fingerprint = get_fingerprint()
+        if fingerprint is None:
+            return func(params)
+
+        key = (fingerprint, name, () if ignore_input else normalize_params(params))
+        result = tool_cache.get(key)
+        if result is not None:
+            logger.info(f"Tool cache hit: {name}({params}) (hits={tool_cache.hits}, misses={tool_cache.misses})")
+            return result
+
+        result = func(params)
+        if _is_cacheable(result):
+            tool_cache.put(key, result)
+        return result
+
+    return wrapper
+
+
+def with_result_cache(tools: List[Tool], ignore_input: Iterable[str] = ()) -> List[Tool]:
+    """
+    Retorna cópias das tools com o cache de resultados aplicado.
+
+    Args:
+        tools: Lista de Tools do agente
+        ignore_input: Nomes das tools que ignoram a string de entrada
+
+    Returns:
+        Nova lista de Tools
+    """
+    ignore_input = set(ignore_input)
+    return [
+        Tool(
+            name=t.name,
+            func=cached_tool_func(t.name, t.func, ignore_input=t.name in ignore_input),
+            description=t.description,
+        )
+        for t in tools
+    ]
@@ -1,43 +1,121 @@
 # src/tools.py
 import os
 import json
-import threading
+import hashlib
 import pandas as pd
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from pandas.api.types import is_numeric_dtype
 from langchain_core.tools import tool
 import numpy as np
 from typing import Optional
 from datetime import datetime
 
-from utils import parse_tool_params, logger, cleanup_old_plots
+from utils import parse_tool_params, logger
+from dataset_profile import DatasetProfile
+from dataset_store import dataset_store, get_current_session
+from plot_renderer import submit_figure
+from plot_store import PLOT_DIR, plot_store
 
-PLOT_DIR = "plots"
-os.makedirs(PLOT_DIR, exist_ok=True)
+# Versão do desenho dos gráficos: incremente ao mudar estilos para invalidar o cache de PNGs
+PLOT_STYLE_VERSION = 2
 
-# ThreadLocal storage para DataFrame
-_thread_local = threading.local()
+def set_dataframe(df: pd.DataFrame, fingerprint: Optional[str] = None) -> None:
+    """Define o DataFrame da sessão atual no store do processo.
 
-def set_dataframe(df: pd.DataFrame) -> None:
-    """Define o DataFrame para a thread/sessão atual."""
-    _thread_local.df = df
+    Args:
+        df: DataFrame carregado
+        fingerprint: Identificador do conteúdo; sessões com o mesmo
+            fingerprint compartilham o frame (e seu perfil estatístico)
+    """
+    dataset_store.attach(get_current_session(), df=df, fingerprint=fingerprint)
     logger.info(f"DataFrame loaded: {df.shape[0]} rows, {df.shape[1]} columns")
 
+def _current_entry():
+    return dataset_store.get(get_current_session())
+
 def get_dataframe() -> Optional[pd.DataFrame]:
-    """Obtém o DataFrame da thread/sessão atual."""
-    return getattr(_thread_local, 'df', None)
-
-def _save_plot(fig, prefix="plot"):
-    """Salva gráfico e faz limpeza de arquivos antigos."""
-    cleanup_old_plots(PLOT_DIR, max_files=30, max_age_hours=48)
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
-    path = os.path.join(PLOT_DIR, f"{prefix}-{ts}.png")
-    fig.tight_layout()
-    fig.savefig(path, dpi=150, bbox_inches="tight")
-    plt.close(fig)
-    logger.info(f"Plot saved: {path}")
+    """Obtém o DataFrame da sessão atual (seguro em qualquer thread)."""
+    entry = _current_entry()
+    return entry.df if entry is not None else None
+
+def get_profile() -> Optional[DatasetProfile]:
+    """Obtém o perfil estatístico memoizado do DataFrame atual."""
+    entry = _current_entry()
+    return entry.profile if entry is not None else None
+
+def get_fingerprint() -> Optional[str]:
+    """Obtém o fingerprint do dataset atual (None se desconhecido)."""
+    entry = _current_entry()
+    return entry.fingerprint if entry is not None else None
+
+def set_summary(summary, fingerprint: Optional[str] = None) -> None:
+    """Define o resumo em streaming (CSV grande, sem DataFrame em memória)."""
+    dataset_store.attach(get_current_session(), summary=summary, fingerprint=fingerprint)
+    logger.info(f"Streaming summary loaded: {summary.rows} rows, {len(summary.columns)} columns")
+
+def get_summary():
+    """Obtém o StreamingSummary da sessão atual, se houver."""
+    entry = _current_entry()
+    return entry.summary if entry is not None else None
+
+def _new_figure(figsize):
+    """Cria figura pela API orientada a objetos, fora do estado global do pyplot.
+
+    Figuras independentes podem ser desenhadas em threads diferentes
+    (ex.: tools executadas em paralelo pelo agente).
+    """
+    fig = Figure(figsize=figsize)
+    ax = fig.subplots()
+    return fig, ax
+
+def _plot_key(kind: str, columns, spec: Optional[dict] = None) -> str:
+    """Chave de conteúdo de um gráfico: hash dos dados das colunas + especificação.
+
+    Args:
+        kind: Tipo do gráfico (hist, boxplot, scatter, ...)
+        columns: Colunas cujos dados entram no gráfico
+        spec: Parâmetros que mudam o desenho (bins, amostra, agregação...)
+    """
+    profile = get_profile()
+    payload = {
+        "version": PLOT_STYLE_VERSION,
+        "kind": kind,
+        "columns": list(columns),
+        "data": [profile.column_hash(col) for col in columns],
+        "spec": spec or {},
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def _cached_plot(prefix: str, key: str) -> Optional[str]:
+    """Retorna o PNG já renderizado para a chave, ou None se precisar renderizar.
+
+    A consulta é feita no índice do plot_store, que confirma que o PNG
+    existe (ou ainda está em renderização); um acerto move o gráfico para o
+    fim da fila LRU e o associa à sessão atual.
+    """
+    path = os.path.join(PLOT_DIR, f"{prefix}-{key}.png")
+    if not plot_store.touch(path, get_current_session()):
+        return None
+    logger.info(f"Plot cache hit: {path}")
+    return path
+
+def _save_plot(fig, prefix="plot", key: Optional[str] = None):
+    """Agenda a gravação do gráfico e o registra na sessão atual.
+
+    A renderização (tight_layout + PNG a 150 dpi) roda no pool de processos
+    de plot_renderer; o caminho retorna na hora e o arquivo aparece quando
+    o renderizador terminar (ver plot_renderer.wait_for_plot). Com `key`
+    (ver _plot_key) o nome do arquivo é determinístico e pode ser reutilizado
+    por _cached_plot; sem ela, usa um timestamp. A limpeza de arquivos
+    antigos roda em lote no plot_store, fora do caminho da tool.
+    """
+    suffix = key or datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(PLOT_DIR, f"{prefix}-{suffix}.png")
+    # Registrado antes de renderizar: a limpeza nunca vê o PNG novo fora do índice
+    plot_store.register(path, get_current_session())
+    submit_figure(fig, path)
     return path
 
 @tool
@@ -66,6 +144,7 @@ def dataset_info_tool(dummy: str) -> str:
         return json.dumps({"error": "No dataframe loaded."})
     
     try:
+        profile = get_profile()
         # Informações básicas
         info = {
             "shape": {
@@ -74,29 +153,27 @@ def dataset_info_tool(dummy: str) -> str:
             },
             "columns": df.columns.tolist(),
             "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-            "memory_usage_mb": round(df.memory_usage(deep=True).sum() / 1024**2, 2),
+            "memory_usage_mb": profile.memory_usage_mb(),
+            # Relatório antes/depois da otimização de tipos na ingestão
+            "memory_report": df.attrs.get("memory_report"),
             
             # Estatísticas de valores ausentes
             "missing_values": {
                 col: {
-                    "count": int(df[col].isna().sum()),
-                    "percentage": round(df[col].isna().sum() / len(df) * 100, 2)
+                    "count": count,
+                    "percentage": round(count / len(df) * 100, 2)
                 }
-                for col in df.columns if df[col].isna().sum() > 0
+                for col, count in profile.missing().items()
             },
             
             # Tipos de colunas
-            "column_types": {
-                "numeric": df.select_dtypes(include=[np.number]).columns.tolist(),
-                "categorical": df.select_dtypes(include=['object', 'category']).columns.tolist(),
-                "datetime": df.select_dtypes(include=['datetime64']).columns.tolist()
-            },
+            "column_types": profile.column_types(),
             
             # Amostra dos dados
             "sample": df.head(5).to_dict(orient="records"),
             
             # Duplicatas
-            "duplicates": int(df.duplicated().sum())
+            "duplicates": profile.duplicates()
         }
         
         logger.info(f"Dataset info retrieved: {info['shape']}")
@@ -110,11 +187,13 @@ def missing_tool(dummy: str) -> str:
     """Return columns with missing values."""
     df = get_dataframe()
     if df is None:
+        summary = get_summary()
+        if summary is not None:
+            return json.dumps(summary.missing())
         return json.dumps({"error": "No dataframe loaded."})
     
     try:
-        missing = df.isnull().sum()
-        missing = missing[missing > 0].to_dict()
+        missing = get_profile().missing()
         logger.info(f"Missing values: {len(missing)} columns")
         return json.dumps(missing)
     except Exception as e:
@@ -126,10 +205,14 @@ def describe_tool(dummy: str) -> str:
     """Return descriptive statistics (only numeric columns)."""
     df = get_dataframe()
     if df is None:
+        summary = get_summary()
+        if summary is not None:
+            # Quantis aproximados (sketch) no modo streaming
+            return json.dumps(summary.describe())
         return json.dumps({"error": "No dataframe loaded."})
     
     try:
-        desc = df.describe().to_dict()
+        desc = get_profile().describe()
         logger.info("Descriptive statistics retrieved")
         return json.dumps(desc)
     except Exception as e:
@@ -172,26 +255,30 @@ def histogram_tool(params: str) -> str:
         if len(data) == 0:
             return json.dumps({"error": "No data available after removing NaN"})
         
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.hist(data, bins=bins, edgecolor='black', alpha=0.7)
-        ax.set_xlabel(column, fontsize=12)
-        ax.set_ylabel("Frequência", fontsize=12)
-        ax.set_title(f"Histograma - {column}", fontsize=14, fontweight='bold')
-        ax.grid(axis='y', alpha=0.3)
-        
-        path = _save_plot(fig, prefix=f"hist-{column}")
+        key = _plot_key("hist", [column], {"bins": bins})
+        path = _cached_plot(f"hist-{column}", key)
+        if path is None:
+            fig, ax = _new_figure(figsize=(10, 6))
+            ax.hist(data, bins=bins, edgecolor='black', alpha=0.7)
+            ax.set_xlabel(column, fontsize=12)
+            ax.set_ylabel("Frequência", fontsize=12)
+            ax.set_title(f"Histograma - {column}", fontsize=14, fontweight='bold')
+            ax.grid(axis='y', alpha=0.3)
+
+            path = _save_plot(fig, prefix=f"hist-{column}", key=key)
         
+        profile = get_profile()
         result = {
             "message": f"Histogram created for '{column}'",
             "plot_path": path,
             "bins": bins,
             "count": int(len(data)),
             "stats": {
-                "mean": float(data.mean()),
-                "median": float(data.median()),
-                "std": float(data.std()),
-                "min": float(data.min()),
-                "max": float(data.max())
+                "mean": float(profile.means()[column]),
+                "median": profile.median(column),
+                "std": float(profile.stds()[column]),
+                "min": float(profile.mins()[column]),
+                "max": float(profile.maxs()[column])
             }
         }
         
@@ -7,17 +7,70 @@ import pandas as pd
 import numpy as np
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 from pandas.api.types import is_numeric_dtype
 from langchain_core.tools import tool
 from datetime import datetime
-from sklearn.cluster import KMeans
 import seaborn as sns
 
-from utils import parse_tool_params, logger
+from utils import parse_tool_params, get_param, validate_column_exists, safe_json_convert, logger
 
 # Importar funções compartilhadas de tools.py
-from tools import get_dataframe, _save_plot
+from tools import get_dataframe, get_profile, get_summary, _new_figure, _save_plot, _plot_key, _cached_plot
+from plot_aggregation import PLOT_AGGREGATE_THRESHOLD, density_grid, minmax_decimate
+from clustering import MODES as CLUSTER_MODES, clustering_engine
+from correlation import CORR_MATRIX_MAX_COLUMNS, CORR_TOP_PAIRS, METHODS as CORR_METHODS
+from grouping import GROUP_CROSSTAB_MAX_KEYS, GROUP_TIME_POINTS, aggregate, bin_key, crosstab, group_counts
+
+
+def _plot_series(ax, series: pd.Series) -> None:
+    """Desenha uma série como linha, decimando por min/max quando é longa demais."""
+    index = series.index
+    decimable = is_numeric_dtype(index) or pd.api.types.is_datetime64_any_dtype(index)
+    if len(series) > PLOT_AGGREGATE_THRESHOLD and decimable:
+        series = series.sort_index()
+        xs, ys = minmax_decimate(series.index.to_numpy(), series.to_numpy())
+        logger.info(f"Series decimated: {len(series)} -> {len(xs)} points")
+        ax.plot(xs, ys, color='steelblue', linewidth=1)
+    else:
+        series.plot(ax=ax, color='steelblue', linewidth=2)
+
+
+def _box_stats(series: pd.Series, bounds: pd.Series, profile):
+    """Estatísticas do boxplot (formato de Axes.bxp) a partir dos quartis do perfil.
+
+    Evita que o matplotlib ordene cada coluna de novo; só os whiskers e os
+    outliers exigem uma comparação vetorizada sobre os dados.
+
+    Returns:
+        Tupla (dict para Axes.bxp, número de outliers)
+    """
+    col = series.name
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    values = values[~np.isnan(values)]
+    lower, upper = bounds["lower"], bounds["upper"]
+    inside = values[(values >= lower) & (values <= upper)]
+    fliers = values[(values < lower) | (values > upper)]
+    stats = {
+        "label": col,
+        "mean": float(profile.means()[col]),
+        "med": profile.median(col),
+        "q1": float(bounds["q1"]),
+        "q3": float(bounds["q3"]),
+        "whislo": float(inside.min()) if inside.size else float(bounds["q1"]),
+        "whishi": float(inside.max()) if inside.size else float(bounds["q3"]),
+        "fliers": fliers,
+    }
+    return stats, int(fliers.size)
+
+
+def _summary_column(summary, column: str):
+    """Retorna o ColumnSummary numérico de uma coluna no modo streaming ou um erro JSON."""
+    if column not in summary.columns:
+        return None, json.dumps({"error": "column not found"})
+    col_summary = summary.columns[column]
+    if not col_summary.numeric:
+        return None, json.dumps({"error": "column not numeric"})
+    return col_summary, None
 
 @tool
 def boxplot_tool(params: str) -> str:
@@ -51,64 +104,61 @@ def boxplot_tool(params: str) -> str:
         if missing:
             return json.dumps({"error": f"Columns not found: {missing}"})
         
-        non_numeric = [col for col in columns if not is_numeric_dtype(df[col])]
+        # Mesmo critério do perfil (bool não conta como numérica)
+        profile = get_profile()
+        numeric = profile.numeric_columns()
+        non_numeric = [col for col in columns if col not in numeric]
         if non_numeric:
             return json.dumps({"error": f"Non-numeric columns: {non_numeric}"})
         
-        data_to_plot = []
-        valid_columns = []
+        counts = profile.counts()
+        valid_columns = [col for col in columns if counts[col] > 0]
         
-        for col in columns:
-            data = df[col].dropna()
-            if len(data) > 0:
-                data_to_plot.append(data)
-                valid_columns.append(col)
-        
-        if not data_to_plot:
+        if not valid_columns:
             return json.dumps({"error": "No valid data"})
+
+        # Quartis e limites de Tukey vêm do perfil (uma passada para todas as colunas)
+        bounds = profile.iqr_bounds()
+        box_stats = [_box_stats(df[col], bounds[col], profile) for col in valid_columns]
         
         # Tamanho dinâmico
         num_cols = len(valid_columns)
-        fig_width = max(12, num_cols * 1.5)
-        fig, ax = plt.subplots(figsize=(fig_width, 8))
-        
-        bp = ax.boxplot(data_to_plot, labels=valid_columns, patch_artist=True, 
+        key = _plot_key("boxplot", valid_columns)
+        path = _cached_plot(f"boxplot-{num_cols}vars", key)
+        if path is None:
+            fig_width = max(12, num_cols * 1.5)
+            fig, ax = _new_figure(figsize=(fig_width, 8))
+
+            bp = ax.bxp([stats for stats, _ in box_stats], patch_artist=True,
                         showmeans=True, meanline=True)
-        
-        # Cores alternadas
-        colors = ['lightblue', 'lightgreen', 'lightcoral', 'lightyellow']
-        for i, patch in enumerate(bp['boxes']):
-            patch.set_facecolor(colors[i % len(colors)])
-            patch.set_alpha(0.7)
-        
-        for median in bp['medians']:
-            median.set_color('red')
-            median.set_linewidth(2)
-        
-        for mean in bp['means']:
-            mean.set_color('blue')
-            mean.set_linewidth(2)
-        
-        ax.set_title(f"Boxplot - {num_cols} variáveis", fontsize=14, fontweight='bold')
-        ax.set_ylabel("Values", fontsize=12)
-        ax.grid(axis='y', alpha=0.3)
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        
-        path = _save_plot(fig, prefix=f"boxplot-{num_cols}vars")
+
+            # Cores alternadas
+            colors = ['lightblue', 'lightgreen', 'lightcoral', 'lightyellow']
+            for i, patch in enumerate(bp['boxes']):
+                patch.set_facecolor(colors[i % len(colors)])
+                patch.set_alpha(0.7)
+
+            for median in bp['medians']:
+                median.set_color('red')
+                median.set_linewidth(2)
+
+            for mean in bp['means']:
+                mean.set_color('blue')
+                mean.set_linewidth(2)
+
+            ax.set_title(f"Boxplot - {num_cols} variáveis", fontsize=14, fontweight='bold')
+            ax.set_ylabel("Values", fontsize=12)
+            ax.grid(axis='y', alpha=0.3)
+            ax.set_xticklabels(valid_columns, rotation=45, ha='right')
+
+            path = _save_plot(fig, prefix=f"boxplot-{num_cols}vars", key=key)
         
         # Estatísticas de outliers
         outlier_stats = {}
-        for col in valid_columns:
-            q1 = df[col].quantile(0.25)
-            q3 = df[col].quantile(0.75)
-            iqr = q3 - q1
-            lower = q1 - 1.5 * iqr
-            upper = q3 + 1.5 * iqr
-            outliers = df[(df[col] < lower) | (df[col] > upper)][col]
+        for col, (_, n_outliers) in zip(valid_columns, box_stats):
             outlier_stats[col] = {
-                "count": int(len(outliers)),
-                "percentage": round(len(outliers) / len(df) * 100, 2)
+                "count": n_outliers,
+                "percentage": round(n_outliers / len(df) * 100, 2)
             }
         
         logger.info(f"Boxplot created for {num_cols} variables")
@@ -148,52 +198,88 @@ def scatter_tool(params: str) -> str:
         if sample and sample < len(data):
             data = data.sample(sample, random_state=42)
         
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.scatter(data[x], data[y], s=15, alpha=0.5, color='steelblue', edgecolors='navy', linewidth=0.3)
-        ax.set_xlabel(x, fontsize=12)
-        ax.set_ylabel(y, fontsize=12)
-        ax.set_title(f"{x} vs {y}", fontsize=14, fontweight='bold')
-        ax.grid(alpha=0.3)
-        
-        path = _save_plot(fig, prefix=f"scatter-{x}-{y}")
-        logger.info(f"Scatter plot created: {x} vs {y}, n={len(data)}")
-        return json.dumps({"message":"scatter created","plot_path":path, "n": len(data)})
+        # Muitos pontos: agrega numa grade fixa e desenha como imagem (custo constante)
+        mode = "density" if len(data) > PLOT_AGGREGATE_THRESHOLD else "points"
+        key = _plot_key("scatter", [x, y], {"sample": sample, "mode": mode})
+        path = _cached_plot(f"scatter-{x}-{y}", key)
+        if path is None:
+            fig, ax = _new_figure(figsize=(10, 6))
+            if mode == "density":
+                counts, extent = density_grid(data[x].to_numpy(), data[y].to_numpy())
+                image = ax.imshow(np.ma.masked_equal(np.log1p(counts), 0), origin='lower', extent=extent,
+                                  aspect='auto', cmap='viridis', interpolation='nearest')
+                fig.colorbar(image, ax=ax, label="log(1 + contagem)")
+            else:
+                ax.scatter(data[x], data[y], s=15, alpha=0.5, color='steelblue', edgecolors='navy', linewidth=0.3)
+            ax.set_xlabel(x, fontsize=12)
+            ax.set_ylabel(y, fontsize=12)
+            ax.set_title(f"{x} vs {y}", fontsize=14, fontweight='bold')
+            ax.grid(alpha=0.3)
+
+            path = _save_plot(fig, prefix=f"scatter-{x}-{y}", key=key)
+        # Coeficiente da matriz de correlação compartilhada (dataset completo)
+        pearson = get_profile().correlations().pair(x, y)
+        logger.info(f"Scatter plot created: {x} vs {y}, n={len(data)}, mode={mode}")
+        return json.dumps({"message":"scatter created","plot_path":path, "n": len(data), "mode": mode,
+                           "pearson": None if pearson is None else round(pearson, 4)})
     except Exception as e:
         logger.error(f"Error in scatter_tool: {e}")
         return json.dumps({"error": str(e)})
 
 @tool
-def correlation_tool(dummy: str) -> str:
-    """Calcula matriz de correlação entre variáveis numéricas e gera mapa de calor."""
+def correlation_tool(params: str) -> str:
+    """
+    Calcula correlações entre variáveis numéricas e gera mapa de calor.
+    Com muitas colunas, devolve só os pares mais fortes (a matriz fica no gráfico).
+    params: "columns=V1|V2|Amount, method=pearson|spearman, top=10"
+    """
     df = get_dataframe()
     if df is None:
         return json.dumps({"error":"No dataframe loaded"})
     
     try:
-        numeric = df.select_dtypes(include=[np.number])
-        if numeric.empty:
-            return json.dumps({"error": "No numeric columns found"})
+        params_dict = parse_tool_params(params)
+        columns = get_param(params_dict, "columns", None)
+        method = get_param(params_dict, "method", "pearson")
+        top = get_param(params_dict, "top", CORR_TOP_PAIRS, int)
         
-        corr = numeric.corr()
+        if method not in CORR_METHODS:
+            return json.dumps({"error": f"method must be one of {list(CORR_METHODS)}"})
         
-        # Heatmap com seaborn
-        fig, ax = plt.subplots(figsize=(10, 8))
-        sns.heatmap(corr, annot=True, fmt='.2f', cmap='coolwarm', 
-                    square=True, linewidths=0.5, ax=ax, 
-                    cbar_kws={"shrink": 0.8})
-        ax.set_title("Correlation Matrix", fontsize=14, fontweight='bold')
-        plt.tight_layout()
+        engine = get_profile().correlations()
+        columns = [c.strip() for c in columns.split("|") if c.strip()] if columns else engine.columns
+        if not columns:
+            return json.dumps({"error": "No numeric columns found"})
+        
+        corr = engine.matrix(columns, method)
+        
+        # Heatmap com seaborn; anotações só enquanto os números cabem nas células
+        key = _plot_key("corr", columns, {"method": method})
+        path = _cached_plot("corr", key)
+        if path is None:
+            fig, ax = _new_figure(figsize=(10, 8))
+            annotate = len(columns) <= CORR_MATRIX_MAX_COLUMNS
+            sns.heatmap(corr, annot=annotate, fmt='.2f', cmap='coolwarm', vmin=-1, vmax=1,
+                        square=True, linewidths=0.5 if annotate else 0, ax=ax,
+                        cbar_kws={"shrink": 0.8})
+            ax.set_title(f"Correlation Matrix ({method})", fontsize=14, fontweight='bold')
+
+            path = _save_plot(fig, prefix="corr", key=key)
         
-        path = _save_plot(fig, prefix="corr")
-        logger.info(f"Correlation matrix created for {len(corr.columns)} columns")
-        return json.dumps({"corr": corr.to_json(), "plot_path": path})
+        result = {"method": method, "columns": len(columns),
+                  "top_pairs": engine.top_pairs(columns, method, top), "plot_path": path}
+        if len(columns) <= CORR_MATRIX_MAX_COLUMNS:
+            result["corr"] = json.loads(corr.round(4).to_json())
+        logger.info(f"Correlation matrix created for {len(columns)} columns ({method})")
+        return json.dumps(result)
     except Exception as e:
         logger.error(f"Error in correlation_tool: {e}")
         return json.dumps({"error": str(e)})
 
 @tool
 def outliers_tool(params: str) -> str:
-    """Detecta outliers usando método IQR ou Z-score. Params: column=Amount, method=iqr"""
+    """Detecta outliers usando método IQR ou Z-score. Sem column, resume todas as colunas numéricas.
+    Params: column=Amount, method=iqr, min_columns=2"""
     df = get_dataframe()
     if df is None:
         return json.dumps({"error":"No dataframe loaded"})
@@ -201,73 +287,93 @@ def outliers_tool(params: str) -> str:
     try:
         params_dict = parse_tool_params(params)
         column = get_param(params_dict, "column", None)
-        method = get_param(params_dict, "method", "iqr")
-        
-        if not column:
-            return json.dumps({"error": "column parameter required"})
-        
-        exists, error_msg = validate_column_exists(df, column)
-        if not exists:
-            return json.dumps({"error": error_msg})
-        
-        if not is_numeric_dtype(df[column]):
-            return json.dumps({"error":"column not numeric"})
-        
-        s = df[column].dropna()
-        
-        if method == "iqr":
-            q1 = s.quantile(0.25)
-            q3 = s.quantile(0.75)
-            iqr = q3 - q1
-            low = q1 - 1.5*iqr
-            high = q3 + 1.5*iqr
-            out = df[(df[column] < low) | (df[column] > high)][[column]].to_dict(orient="records")
-            logger.info(f"IQR outliers detected in {column}: {len(out)} outliers")
-            return json.dumps({"method":"iqr","count":len(out),"outliers": out[:100]})  # Limit output
-        else:
-            # zscore
-            z = (s - s.mean())/s.std()
-            out_idx = z[abs(z) > 3].index
-            out = df.loc[out_idx, [column]].to_dict(orient="records")
-            logger.info(f"Z-score outliers detected in {column}: {len(out)} outliers")
-            return json.dumps({"method":"zscore","count":len(out),"outliers": out[:100]})
+        method = "iqr" if get_param(params_dict, "method", "iqr") == "iqr" else "zscore"
+        min_columns = get_param(params_dict, "min_columns", 2, int)
+        
+        if column:
+            exists, error_msg = validate_column_exists(df, column)
+            if not exists:
+                return json.dumps({"error": error_msg})
+            
+            # Mesmo critério do índice de outliers (bool não conta como numérica)
+            if column not in get_profile().numeric_columns():
+                return json.dumps({"error":"column not numeric"})
+        
+        # Uma varredura de todas as colunas, memoizada no perfil do dataset
+        index = get_profile().outlier_index(method)
+        
+        if column:
+            positions = index.positions[column]
+            out = [{column: value} for value in df[column].iloc[positions[:100]].tolist()]  # Limit output
+            logger.info(f"{method} outliers detected in {column}: {len(positions)} outliers")
+            return json.dumps({"method": method, "count": int(positions.size), "outliers": out})
+        
+        multi = index.rows_flagged_in(min_columns)
+        logger.info(f"{method} outliers summarized for {len(index.positions)} columns")
+        return json.dumps({
+            "method": method,
+            "counts": index.counts(),
+            "flagged_rows": int(index.flagged_rows.size),
+            "min_columns": min_columns,
+            "rows_in_min_columns": int(multi.size),
+            "sample_rows": multi[:20].tolist(),
+        })
     except Exception as e:
         logger.error(f"Error in outliers_tool: {e}")
         return json.dumps({"error": str(e)})
 
 @tool
 def clustering_tool(params: str) -> str:
-    """Executa clustering K-means nos dados. Params: method=kmeans, n_clusters=3, columns=col1|col2|col3"""
+    """
+    Executa clustering K-means nos dados.
+    Params: n_clusters=3 (ou auto), columns=col1|col2|col3, method=auto|full|sample|minibatch, scale=true
+    """
     df = get_dataframe()
     if df is None:
         return json.dumps({"error":"No dataframe loaded"})
     
     try:
         params_dict = parse_tool_params(params)
-        method = get_param(params_dict, "method", "kmeans")
-        n_clusters = get_param(params_dict, "n_clusters", 3, int)
+        method = get_param(params_dict, "method", "auto")
+        method = "auto" if method == "kmeans" else method
+        n_clusters = params_dict.get("n_clusters", "3")
+        k = None if str(n_clusters).lower() == "auto" else int(n_clusters)
+        scale = get_param(params_dict, "scale", True, bool)
         cols = params_dict.get("columns", "").split("|") if "columns" in params_dict else None
         
+        if method not in CLUSTER_MODES:
+            return json.dumps({"error": f"method must be one of {list(CLUSTER_MODES)}"})
+        
+        profile = get_profile()
         if not cols:
-            numeric = df.select_dtypes(include=[np.number]).columns.tolist()
+            numeric = profile.numeric_columns()
             cols = numeric[:min(6, len(numeric))]
         
-        data = df[cols].dropna()
-        if data.empty:
-            return json.dumps({"error":"no numeric data for clustering"})
-        
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit(data.values)
-        centers = kmeans.cluster_centers_.tolist()
-        counts = {int(i): int((kmeans.labels_==i).sum()) for i in range(n_clusters)}
-        
-        logger.info(f"K-means clustering: {n_clusters} clusters on {len(cols)} columns")
-        return json.dumps({
-            "method":"kmeans",
-            "n_clusters":n_clusters,
-            "centers":centers,
-            "counts":counts,
-            "columns":cols
-        })
+        missing = [col for col in cols if col not in df.columns or not is_numeric_dtype(df[col])]
+        if missing or not cols:
+            return json.dumps({"error": f"no numeric data for clustering: {missing}"})
+        
+        data_key = tuple(profile.column_hash(col) for col in cols)
+        result, cached = clustering_engine.cluster(df, cols, k=k, mode=method, standardize=scale,
+                                                   data_key=data_key)
+        
+        logger.info(f"K-means clustering: {result.k} clusters on {len(cols)} columns (cached={cached})")
+        response = {
+            "method": "kmeans",
+            "mode": result.mode,
+            "n_clusters": result.k,
+            "centers": result.centers(),
+            "counts": result.counts,
+            "columns": cols,
+            "scaled": scale,
+            "inertia": result.inertia,
+            "fit_rows": result.fit_rows,
+        }
+        if result.silhouette is not None:
+            response["silhouette"] = result.silhouette
+        if result.sweep:
+            response["k_sweep"] = result.sweep
+        return json.dumps(response)
     except Exception as e:
         logger.error(f"Error in clustering_tool: {e}")
         return json.dumps({"error": str(e)})
@@ -294,26 +400,40 @@ def time_trend_tool(params: str) -> str:
         if target and target not in df.columns:
             return json.dumps({"error": f"{target} not in dataframe"})
 
+        # Chaves contínuas (timestamps, segundos) viram no máximo GROUP_TIME_POINTS grupos
+        spec = {"points": GROUP_TIME_POINTS}
         if target:
-            grouped = df.groupby(column)[target].agg(freq)
-            fig, ax = plt.subplots(figsize=(12, 6))
-            grouped.plot(ax=ax, color='steelblue', linewidth=2)
-            ax.set_title(f"Time trend of {target} grouped by {freq}", fontsize=14, fontweight='bold')
-            ax.set_xlabel(column, fontsize=12)
-            ax.set_ylabel(target, fontsize=12)
-            ax.grid(alpha=0.3)
-            path = _save_plot(fig, prefix="time-trend")
+            key = _plot_key("time-trend", [column, target], {"freq": freq, **spec})
+            path = _cached_plot("time-trend", key)
+            groups = None
+            if path is None:
+                binned = bin_key(df[column], GROUP_TIME_POINTS)
+                grouped = aggregate(binned, df[target], freq)
+                groups = {"groups": len(grouped), "binning": binned.how}
+                fig, ax = _new_figure(figsize=(12, 6))
+                _plot_series(ax, grouped)
+                ax.set_title(f"Time trend of {target} grouped by {freq}", fontsize=14, fontweight='bold')
+                ax.set_xlabel(column, fontsize=12)
+                ax.set_ylabel(target, fontsize=12)
+                ax.grid(alpha=0.3)
+                path = _save_plot(fig, prefix="time-trend", key=key)
             logger.info(f"Time trend plot created: {target} by {column}")
-            return json.dumps({"message": "Time trend generated", "plot_path": path})
+            return json.dumps({"message": "Time trend generated", "plot_path": path, **(groups or {})})
         else:
-            counts = df[column].value_counts().sort_index()
-            fig, ax = plt.subplots(figsize=(12, 6))
-            counts.plot(ax=ax, color='steelblue', linewidth=2)
-            ax.set_title(f"Frequency over time for {column}", fontsize=14, fontweight='bold')
-            ax.grid(alpha=0.3)
-            path = _save_plot(fig, prefix="time-trend")
+            key = _plot_key("time-frequency", [column], spec)
+            path = _cached_plot("time-trend", key)
+            groups = None
+            if path is None:
+                binned = bin_key(df[column], GROUP_TIME_POINTS)
+                counts = group_counts(binned)
+                groups = {"groups": len(counts), "binning": binned.how}
+                fig, ax = _new_figure(figsize=(12, 6))
+                _plot_series(ax, counts)
+                ax.set_title(f"Frequency over time for {column}", fontsize=14, fontweight='bold')
+                ax.grid(alpha=0.3)
+                path = _save_plot(fig, prefix="time-trend", key=key)
             logger.info(f"Time frequency plot created for {column}")
-            return json.dumps({"message": "Time frequency generated", "plot_path": path})
+            return json.dumps({"message": "Time frequency generated", "plot_path": path, **(groups or {})})
     except Exception as e:
         logger.error(f"Error in time_trend_tool: {e}")
         return json.dumps({"error": str(e)})
@@ -349,11 +469,23 @@ def frequency_tool(params: str) -> str:
         logger.error(f"Error in frequency_tool: {e}")
         return json.dumps({"error": str(e)})
 
+def _crosstab_key(df: pd.DataFrame, column: str, bins: int):
+    """Chave da tabela cruzada; numéricas contínuas usam as bordas de quantis do perfil."""
+    series = df[column]
+    if is_numeric_dtype(series) and series.nunique() > bins:
+        profile = get_profile()
+        if column in profile.numeric_columns():
+            edges = profile.quantiles(np.linspace(0, 1, bins + 1))[column].to_numpy()
+            return bin_key(series, bins, method="quantile", quantiles=edges)
+    return bin_key(series, bins, method="quantile")
+
 @tool
 def crosstab_tool(params: str) -> str:
     """
     Cria tabela cruzada entre duas colunas.
-    params: "col1=Class, col2=Amount"
+    Colunas contínuas são agrupadas em faixas de quantis e categóricas com
+    muitos valores em top-N + "outros"; tabelas grandes viram os pares mais frequentes.
+    params: "col1=Class, col2=Amount, bins=10"
     """
     df = get_dataframe()
     if df is None:
@@ -363,6 +495,7 @@ def crosstab_tool(params: str) -> str:
         params_dict = parse_tool_params(params)
         col1 = get_param(params_dict, "col1", None)
         col2 = get_param(params_dict, "col2", None)
+        bins = get_param(params_dict, "bins", GROUP_CROSSTAB_MAX_KEYS, int)
         
         if not col1 or not col2:
             return json.dumps({"error": "col1 and col2 parameters required"})
@@ -370,9 +503,11 @@ def crosstab_tool(params: str) -> str:
         if col1 not in df.columns or col2 not in df.columns:
             return json.dumps({"error":"col1 or col2 not found"})
         
-        ct = pd.crosstab(df[col1], df[col2])
-        logger.info(f"Crosstab created: {col1} x {col2}")
-        return ct.to_json()
+        keys = [_crosstab_key(df, col, bins) for col in (col1, col2)]
+        result = crosstab(*keys)
+        result["binning"] = {col1: keys[0].how, col2: keys[1].how}
+        logger.info(f"Crosstab created: {col1} x {col2} ({result['cells']} cells)")
+        return json.dumps(result)
     except Exception as e:
         logger.error(f"Error in crosstab_tool: {e}")
         return json.dumps({"error": str(e)})
@@ -384,7 +519,8 @@ def central_tendency_tool(params: str) -> str:
     params: "column=Amount"
     """
     df = get_dataframe()
-    if df is None:
+    summary = get_summary() if df is None else None
+    if df is None and summary is None:
         return json.dumps({"error":"No dataframe loaded"})
     
     try:
@@ -394,16 +530,28 @@ def central_tendency_tool(params: str) -> str:
         if not column:
             return json.dumps({"error": "column parameter required"})
         
+        if summary is not None:
+            col_summary, error = _summary_column(summary, column)
+            if error:
+                return error
+            return json.dumps({
+                "mean": col_summary.mean,
+                "median": col_summary.quantile(0.5),
+                "mode": safe_json_convert(col_summary.mode),
+                "approximate": True
+            })
+        
         if column not in df.columns:
             return json.dumps({"error":"column not found"})
         
-        series = df[column].dropna()
-        mode = series.mode().iloc[0] if not series.mode().empty else None
+        profile = get_profile()
+        if column not in profile.numeric_columns():
+            return json.dumps({"error":"column not numeric"})
         
         result = {
-            "mean": float(series.mean()),
-            "median": float(series.median()),
-            "mode": safe_json_convert(mode)
+            "mean": float(profile.means()[column]),
+            "median": profile.median(column),
+            "mode": safe_json_convert(profile.mode(column))
         }
         
         logger.info(f"Central tendency calculated for {column}")
@@ -419,7 +567,8 @@ def variability_tool(params: str) -> str:
     das variaveis numéricas do dataset.
     """
     df = get_dataframe()
-    if df is None:
+    summary = get_summary() if df is None else None
+    if df is None and summary is None:
         return json.dumps({"error":"No dataframe loaded"})
     
     try:
@@ -429,14 +578,29 @@ def variability_tool(params: str) -> str:
         if not column:
             return json.dumps({"error": "column parameter required"})
         
+        if summary is not None:
+            col_summary, error = _summary_column(summary, column)
+            if error:
+                return error
+            return json.dumps({
+                "variance": col_summary.variance,
+                "std_dev": col_summary.std,
+                "cv": col_summary.std / col_summary.mean if col_summary.mean != 0 else None
+            })
+        
         if column not in df.columns:
             return json.dumps({"error":"column not found"})
         
-        series = df[column].dropna()
+        profile = get_profile()
+        if column not in profile.numeric_columns():
+            return json.dumps({"error":"column not numeric"})
+        
+        mean = float(profile.means()[column])
+        std = float(profile.stds()[column])
         result = {
-            "variance": float(series.var()),
-            "std_dev": float(series.std()),
-            "cv": float(series.std() / series.mean()) if series.mean() != 0 else None
+            "variance": float(profile.variances()[column]),
+            "std_dev": std,
+            "cv": std / mean if mean != 0 else None
         }
         
         logger.info(f"Variability calculated for {column}")
@@ -452,7 +616,8 @@ def range_tool(params: str) -> str:
     params: "column=Amount"
     """
     df = get_dataframe()
-    if df is None:
+    summary = get_summary() if df is None else None
+    if df is None and summary is None:
         return json.dumps({"error":"No dataframe loaded"})
     
     try:
@@ -462,11 +627,20 @@ def range_tool(params: str) -> str:
         if not column:
             return json.dumps({"error": "column parameter required"})
         
+        if summary is not None:
+            col_summary, error = _summary_column(summary, column)
+            if error:
+                return error
+            return json.dumps({"min": col_summary.min, "max": col_summary.max})
+        
         if column not in df.columns:
             return json.dumps({"error":"column not found"})
         
-        series = df[column].dropna()
-        result = {"min": float(series.min()), "max": float(series.max())}
+        profile = get_profile()
+        if column not in profile.numeric_columns():
+            return json.dumps({"error":"column not numeric"})
+        
+        result = {"min": float(profile.mins()[column]), "max": float(profile.maxs()[column])}
         
         logger.info(f"Range calculated for {column}")
         return json.dumps(result)
@@ -506,12 +680,13 @@ def conclusion_tool(dummy: str) -> str:
     
     try:
         # Análise automática básica
+        profile = get_profile()
         num_rows = len(df)
         num_cols = len(df.columns)
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = profile.numeric_columns()
         
-        missing_summary = {col: df[col].isna().sum() for col in df.columns if df[col].isna().sum() > 0}
-        duplicates = df.duplicated().sum()
+        missing_summary = profile.missing()
+        duplicates = profile.duplicates()
         
         conclusion = f"""
 ## 📊 Conclusão Automática da Análise
@@ -525,18 +700,18 @@ def conclusion_tool(dummy: str) -> str:
 ### Principais Observações
 """
         
-        # Outliers em colunas numéricas
-        for col in numeric_cols[:3]:  # Primeiras 3 colunas numéricas
-            q1 = df[col].quantile(0.25)
-            q3 = df[col].quantile(0.75)
-            iqr = q3 - q1
-            outliers = df[(df[col] < q1 - 1.5*iqr) | (df[col] > q3 + 1.5*iqr)]
-            if len(outliers) > 0:
-                conclusion += f"\n- **{col}**: {len(outliers)} outliers detectados ({round(len(outliers)/num_rows*100, 2)}%)"
+        # Outliers: colunas com mais ocorrências, a partir do índice do perfil
+        index = profile.outlier_index("iqr")
+        for col, count in list(index.counts().items())[:3]:
+            if count > 0:
+                conclusion += f"\n- **{col}**: {count} outliers detectados ({round(count/num_rows*100, 2)}%)"
+        multi = index.rows_flagged_in(2).size
+        if multi:
+            conclusion += f"\n- **{multi}** linhas ({round(multi/num_rows*100, 2)}%) são outliers em 2 ou mais colunas"
         
         logger.info("Auto conclusion generated")
         return conclusion
         
     except Exception as e:
         logger.error(f"Error in conclusion_tool: {e}")
-        return f"Erro ao gerar conclusão: {str(e)}"
+        return json.dumps({"error": f"Erro ao gerar conclusão: {str(e)}"})
@@ -2,8 +2,6 @@
 import os
 import logging
 from typing import Dict, Any, Optional
-from datetime import datetime
-from glob import glob
 
 # Configurar logging
 logging.basicConfig(
@@ -71,40 +69,6 @@ def get_param(params_dict: Dict[str, Any], key: str, default: Any = None, param_
         return default
 
 
-def cleanup_old_plots(plot_dir: str = "plots", max_files: int = 20, max_age_hours: int = 24):
-    """
-    Remove gráficos antigos para economizar espaço.
-    
-    Args:
-        plot_dir: Diretório dos gráficos
-        max_files: Número máximo de arquivos a manter
-        max_age_hours: Idade máxima em horas para manter arquivos
-    """
-    try:
-        plots = glob(os.path.join(plot_dir, "*.png"))
-        if not plots:
-            return
-        
-        # Ordenar por tempo de modificação (mais recente primeiro)
-        plots.sort(key=os.path.getmtime, reverse=True)
-        
-        current_time = datetime.now().timestamp()
-        
-        for i, plot in enumerate(plots):
-            # Remover se exceder max_files ou for muito antigo
-            file_age_hours = (current_time - os.path.getmtime(plot)) / 3600
-            
-            if i >= max_files or file_age_hours > max_age_hours:
-                try:
-                    os.remove(plot)
-                    logger.info(f"Removed old plot: {plot}")
-                except Exception as e:
-                    logger.error(f"Failed to remove plot {plot}: {e}")
-    
-    except Exception as e:
-        logger.error(f"Error cleaning up plots: {e}")
-
-
 def validate_column_exists(df, column: str, columns_list: list = None) -> tuple[bool, str]:
     """
     Valida se uma coluna existe no DataFrame.
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Módulos de src/ são importados sem pacote (ex.: `from utils import logger`)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,57 @@
+from langchain_core.documents import Document
+
+from answer_cache import SemanticAnswerCache, question_intent, question_params
+
+
+class FakeVectorstore:
+    """Devolve todas as entradas com a mesma relevância alta (pior caso dos embeddings)."""
+
+    def __init__(self):
+        self.docs = []
+
+    def add_texts(self, texts, metadatas):
+        self.docs.extend(Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas))
+
+    def similarity_search_with_relevance_scores(self, query, k=4, filter=None):
+        matches = [d for d in self.docs if all(d.metadata.get(key) == v for key, v in (filter or {}).items())]
+        return [(d, 0.95) for d in matches[:k]]
+
+
+COLUMNS = ["Time", "V1", "V2", "V10", "Amount", "Class"]
+
+
+def test_question_params():
+    assert question_params("Faça um clustering com k=3.", COLUMNS) == (("3",), ())
+    assert question_params("média de V10 e Amount", COLUMNS) == ((), ("Amount", "V10"))
+    assert question_params("top 10 valores de V1 acima de 0,5", COLUMNS) == (("0.5", "10"), ("V1",))
+
+
+def test_lookup_requires_same_parameters():
+    cache = SemanticAnswerCache(FakeVectorstore(), min_score=0.92)
+    cache.store("Faça um clustering com k=3", "resposta k=3", "fp")
+    cache.store("Mostre o histograma de V1", "histograma V1", "fp")
+
+    assert cache.lookup("Faça um clustering com k=3", "fp", COLUMNS) == "resposta k=3"
+    assert cache.lookup("Faça um clustering com k=5", "fp", COLUMNS) is None
+    assert cache.lookup("Faça um clustering com k=8", "fp", COLUMNS) is None
+    assert cache.lookup("Mostre o histograma de V1", "fp", COLUMNS) == "histograma V1"
+    assert cache.lookup("Mostre o histograma de V2", "fp", COLUMNS) is None
+    assert cache.lookup("Faça um clustering com k=3", "outro", COLUMNS) is None
+
+
+def test_question_intent():
+    assert question_intent("Qual a média de Amount?") == ("central_tendency", "mean")
+    assert question_intent("Qual a mediana de Amount?") == ("central_tendency", "median")
+    assert question_intent("Quais os outliers de Amount?") == ("outliers",)
+
+
+def test_lookup_requires_same_intent():
+    cache = SemanticAnswerCache(FakeVectorstore(), min_score=0.92)
+    cache.store("Qual a média de Amount?", "média 88.35", "fp")
+    cache.store("Quais os outliers de V1?", "outliers V1", "fp")
+
+    assert cache.lookup("Qual a média de Amount?", "fp", COLUMNS) == "média 88.35"
+    assert cache.lookup("Qual a mediana de Amount?", "fp", COLUMNS) is None
+    assert cache.lookup("Qual o máximo de Amount?", "fp", COLUMNS) is None
+    assert cache.lookup("Qual o desvio padrão de Amount?", "fp", COLUMNS) is None
+    assert cache.lookup("Mostre o histograma de V1", "fp", COLUMNS) is None
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+from grouping import OTHER_LABEL, bin_key, crosstab
+
+
+def test_bin_key_high_cardinality_categorical():
+    # Mesmo dtype que optimize_dtypes cria (unique ratio <= 0.5)
+    series = pd.Series([f"loja{i % 40}" for i in range(200)] + [None] * 10, dtype="category")
+
+    key = bin_key(series, max_groups=10)
+
+    assert key.how == "top:9"
+    assert OTHER_LABEL in key.labels
+    assert len(key.labels) == 10
+    assert (key.codes[-10:] == -1).all()
+    assert (key.codes[:200] >= 0).all()
+
+
+def test_crosstab_on_categorical_columns():
+    rng = np.random.default_rng(0)
+    a = pd.Series(rng.choice([f"c{i}" for i in range(60)], size=1000)).astype("category")
+    b = pd.Series(rng.choice(["x", "y", "z"], size=1000)).astype("category")
+
+    result = crosstab(bin_key(a, max_groups=10), bin_key(b, max_groups=10))
+
+    assert result["cells"] <= 30
+    assert result["nonzero_cells"] > 0
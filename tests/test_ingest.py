@@ -0,0 +1,14 @@
+import pandas as pd
+
+from ingest import optimize_dtypes
+
+
+def test_dates_followed_by_text_are_not_coerced():
+    values = [f"2024-01-{i % 28 + 1:02d}" for i in range(150)] + ["pendente"] * 150
+    df = pd.DataFrame({"status": values, "data": ["2024-01-05", None] * 150})
+
+    out, _ = optimize_dtypes(df)
+
+    assert out["status"].astype(str).tolist() == values
+    assert str(out["data"].dtype).startswith("datetime64")
+    assert out["data"].isna().sum() == 150
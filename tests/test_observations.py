@@ -0,0 +1,63 @@
+import json
+
+from dataset_store import session_scope
+from observations import ObservationEncoder, ReferenceStore
+
+
+def test_floats_keep_integers_and_magnitudes():
+    encoder = ObservationEncoder(max_tokens=10_000)
+    result = {"Amount": {"count": 284807.0, "max": 25691.16, "mean": 88.349619},
+              "Time": {"max": 172792.0, "tiny": 0.0000123456}}
+
+    data = json.loads(encoder.encode("other", json.dumps(result)))
+
+    assert data["Amount"]["count"] == 284807
+    assert data["Amount"]["max"] == 25691.16
+    assert data["Amount"]["mean"] == 88.3496
+    assert data["Time"]["max"] == 172792
+    assert data["Time"]["tiny"] == 1.235e-05
+
+
+def test_schema_is_never_truncated():
+    encoder = ObservationEncoder(max_tokens=200, top_k=10)
+    columns = ["Time"] + [f"V{i}" for i in range(1, 29)] + ["Amount", "Class"]
+    info = {
+        "columns": columns,
+        "dtypes": {col: "float32" for col in columns},
+        "sample": [{col: 1.5 for col in columns} for _ in range(5)],
+    }
+    describe = {col: {"count": 284807.0, "max": 25691.16} for col in columns}
+
+    encoded_info = json.loads(encoder.encode("dataset_info", json.dumps(info)))
+    encoded_describe = json.loads(encoder.encode("describe", json.dumps(describe)))
+
+    assert encoded_info["columns"] == columns
+    assert list(encoded_info["dtypes"]) == columns
+    assert list(encoded_describe) == columns
+    assert encoded_describe["Amount"]["max"] == 25691.16
+
+
+def test_large_lists_are_truncated_with_handle():
+    encoder = ObservationEncoder(max_tokens=10_000, top_k=5)
+
+    data = json.loads(encoder.encode("outliers", json.dumps({"outliers": list(range(50))})))
+
+    assert data["outliers"][:5] == [0, 1, 2, 3, 4]
+    marker = data["outliers"][-1]["_more"]
+    assert marker["omitted"] == 45
+    page = json.loads(encoder.fetch(marker["handle"], offset=marker["offset"]))
+    assert page["items"] == list(range(5, 10))
+
+
+def test_stashed_references_outlive_observation_lru_and_stay_in_session():
+    encoder = ObservationEncoder(max_tokens=10_000, top_k=5, max_stashes=2)
+    store = ReferenceStore()
+    text = "x" * 1500
+
+    handle = encoder.stash("memory", text, store)
+    for i in range(5):
+        encoder.encode("outliers", json.dumps({"outliers": list(range(i, 50))}))
+
+    assert encoder.fetch(handle) == text
+    with session_scope("outra"):
+        assert "error" in json.loads(encoder.fetch(handle))